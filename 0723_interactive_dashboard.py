@@ -1,17 +1,34 @@
-from dash import Dash, dcc, html, Input, Output, State, callback_context
+from dash import Dash, dcc, html, Input, Output, State, Patch, callback_context, no_update
 
 from dash.dependencies import ALL
 
+import json
+
 import numpy as np
 
 import pandas as pd
 
-import plotly.express as px
-
 import plotly.graph_objs as go
 
 from dash.exceptions import PreventUpdate
 
+from instrumentation import instrument_app, timed
+
+from compact_data import compact_frame
+
+from figures import create_heatmap, create_scatter_plot
+from crossfilter import BinIndex, create_histogram_figure, histogram_selection_patch, selection_mask
+
+from splom import create_splom, thumbnail_stats
+
+from session_store import SessionStore, no_update_outputs
+
+from export import register_export_route, session_selection
+
+from result_cache import ResultCache, selection_key
+
+from vth_summary import DEVICE_CURVE_LIMIT, create_device_figure, create_summary_figure, summarize_vth_vs_vg, wide_to_long
+
 
 external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
 
@@ -21,13 +38,20 @@ app = Dash(__name__, external_stylesheets=external_stylesheets)
 app.config.suppress_callback_exceptions = True
 
 
+# セッションごとの状態（開いている散布図・選択）はサーバー側に保持する
+
+session_store = SessionStore()
+
+
 # サンプルデータの作成
 
 np.random.seed(0)
 
 columns = [f"VTHE_{i}" for i in range(10, 28)] + [f"VTHW_{i}" for i in range(10, 28)]
 
-df = pd.DataFrame(np.random.rand(30, len(columns)), columns=columns)
+# 測定値は float32 で保持する（メモリ使用量を半分に）
+
+df = compact_frame(pd.DataFrame(np.random.rand(30, len(columns)), columns=columns))
 
 
 # ヒートマップを作成するためのデータフレーム
@@ -35,335 +59,456 @@ df = pd.DataFrame(np.random.rand(30, len(columns)), columns=columns)
 heatmap_df = df.corr()
 
 
-def wide_to_long(df):
+# 周辺ヒストグラム用のビン番号（起動時に一度だけ計算）
 
-    long_df = pd.DataFrame()
+bin_index = BinIndex(df)
 
-    for col in df.columns:
 
-        parts = col.split('_')
+# 選択ごとの (Type, Vg) 統計量のキャッシュ（選択を戻したときに再計算しない）
 
-        vth_type = parts[0]
+# キーは選択のダイジェスト。バイト数で上限を設け、df が差し替わると空になる
 
-        vg = float(parts[1])
+summary_cache = ResultCache()
 
-        temp_df = pd.DataFrame({
 
-            "VTH": df[col],
+def selection_summary(selectedpoints):
 
-            "Vg": vg,
+    build = lambda: summarize_vth_vs_vg(wide_to_long(df, rows=selectedpoints))
 
-            "Type": vth_type
+    return summary_cache.get(selection_key(selectedpoints), build, data=df)
 
-        })
 
-        long_df = pd.concat([long_df, temp_df])
+# measured_data.csvとtotal_result.csvを読み込み
 
-    return long_df.reset_index(drop=True)
+measured_df = compact_frame(pd.read_csv("measured_data.csv"))
 
+total_df = compact_frame(pd.read_csv("total_result.csv"))
 
-long_df = wide_to_long(df)
 
+layout = html.Div(
 
-# measured_data.csvとtotal_result.csvを読み込み
+    [
 
-measured_df = pd.read_csv("measured_data.csv")
+        html.Div(
 
-total_df = pd.read_csv("total_result.csv")
+            dcc.Graph(id="heatmap", config={"displayModeBar": False}),
 
+            className="six columns",
 
-app.layout = html.Div(
+        ),
 
-    [
+        html.Div(
 
-        html.Div(
+            id="scatter-plots-container",
 
-            dcc.Graph(id="heatmap", config={"displayModeBar": False}),
+            children=[],
 
-            className="six columns",
+            className="six columns",
 
-        ),
+        ),
 
-        html.Div(
+        dcc.Store(id='selection-version', data=0),  # 選択が変わったことだけを通知するストア（選択自体はサーバー側）
 
-            id="scatter-plots-container",
+        dcc.Dropdown(
 
-            children=[],
+            id="histogram-columns",
 
-            className="six columns",
+            options=[{"label": col, "value": col} for col in df.columns],
 
-        ),
+            value=list(df.columns[:8]),
 
-        dcc.Store(id='scatter-plots-store', data=[]),  # 散布図のIDを保持するためのストア
+            multi=True,
 
-        html.Button("Generate VTH vs Vg Graph", id="generate-graph", n_clicks=0),
+        ),
 
-        dcc.Graph(id="vth-vs-vg-graph", style={"display": "none"}),
+        dcc.Graph(id="marginal-histograms", config={"displayModeBar": False}),
 
-    ],
+        dcc.Dropdown(
 
-    className="row",
+            id="splom-columns",
 
-)
+            options=[{"label": col, "value": col} for col in df.columns],
+
+            value=list(df.columns[:6]),
+
+            multi=True,
+
+        ),
+
+        html.Div(id="splom-container"),  # 全ペアの密度サムネイル。クリックで散布図を開く
+
+        dcc.RadioItems(
 
+            id="vth-view-mode",
 
-# ヒートマップを作成する関数
+            options=[
 
-def create_heatmap():
+                {"label": "Auto", "value": "auto"},
 
-    fig = go.Figure(data=go.Heatmap(z=heatmap_df.values, x=heatmap_df.columns, y=heatmap_df.columns, colorscale="Viridis"))
+                {"label": "Device curves", "value": "devices"},
 
-    fig.update_layout(margin={"l": 20, "r": 20, "b": 20, "t": 20})
+                {"label": "Quantile bands", "value": "summary"},
 
-    return fig
+                {"label": "Box", "value": "box"},
 
+            ],
 
-# 散布図を作成する関数
+            value="auto",
 
-def create_scatter_plot(x_col, y_col, selectedpoints=None):
+            inline=True,
 
-    fig = px.scatter(df, x=x_col, y=y_col, text=df.index)
+        ),
 
-    fig.update_traces(
+        html.Button("Generate VTH vs Vg Graph", id="generate-graph", n_clicks=0),
 
-        selectedpoints=selectedpoints,
+        dcc.Graph(id="vth-vs-vg-graph", style={"display": "none"}),
 
-        customdata=df.index,
+    ],
 
-        mode="markers+text",
+    className="row",
 
-        marker={"color": "rgba(0, 116, 217, 0.7)", "size": 20},
+)
+
+
+# ページを開くたびにセッションIDを発行する（ブラウザが持つのはIDだけ）
 
-        unselected={
+def serve_layout():
 
-            "marker": {"opacity": 0.3},
+    session_id = session_store.new_session()
 
-            "textfont": {"color": "rgba(0, 0, 0, 0)"},
+    return html.Div([
 
-        },
+        layout,
 
-    )
+        dcc.Store(id='session-id', data=session_id),
 
-    fig.update_layout(
+        html.A("Export CSV", href=f"/export/{session_id}.csv", target="_blank"),
 
-        margin={"l": 20, "r": 0, "b": 15, "t": 5},
+        html.A("Export Parquet", href=f"/export/{session_id}.parquet", target="_blank", style={"marginLeft": "1em"}),
 
-        dragmode="select",
+    ])
 
-        hovermode=False,
 
-        newselection_mode="gradual",
+app.layout = serve_layout
 
-    )
 
-    return fig
+# 現在の選択行を CSV / Parquet でストリーミング出力する（/export/<session_id>.csv）
 
+register_export_route(app.server, session_selection(session_store, lambda: df))
+
+
+# 新しい散布図に描く選択（選択していなければ None: 全点を通常表示）
+def selected_points(session_id):
+    if session_store.get(session_id, "selection_mask") is None:
+        return None
+    return session_store.get(session_id, "selectedpoints")
 
 @app.callback(
 
-    Output("scatter-plots-container", "children"),
+    Output("scatter-plots-container", "children"),
 
-    Output("scatter-plots-store", "data"),
+    Output("selection-version", "data"),
 
-    [Input("heatmap", "clickData"),
+    [Input("heatmap", "clickData"),
 
-     Input({'type': 'scatter', 'index': ALL}, "selectedData")],
+     Input({'type': 'scatter', 'index': ALL}, "selectedData"),
 
-    State("scatter-plots-container", "children"),
+     Input({'type': 'splom-cell', 'index': ALL}, "n_clicks")],
 
-    State("scatter-plots-store", "data")
+    State("session-id", "data")
 
 )
 
-def update_scatter_plots_and_selection(clickData, selectedDataList, current_children, current_ids):
+@timed
+
+def update_scatter_plots_and_selection(clickData, selectedDataList, splomClicks, session_id):
+
+    ctx = callback_context
+
+
+    if not ctx.triggered:
+
+        raise PreventUpdate
+
 
-    ctx = callback_context
+    triggered_id = ctx.triggered[0]['prop_id']
 
 
-    if not ctx.triggered:
+    # セッションが破棄されていたら（TTL 切れ・メモリ上限）散布図を閉じ、空のセッションからやり直す
 
-        raise PreventUpdate
+    if session_id not in session_store:
 
+        session_store.new_session(session_id)
 
-    triggered_id = ctx.triggered[0]['prop_id']
+        return [], 0
 
 
-    if 'heatmap.clickData' in triggered_id:
+    # 開いている散布図と選択はセッションストアに保持し、ブラウザには差分(Patch)だけを返す
 
-        if clickData is None:
+    current_ids = session_store.get(session_id, "scatter_ids", [])
 
-            raise PreventUpdate
+    patched_children = Patch()
 
 
-        x_col = clickData['points'][0]['x']
+    if 'heatmap.clickData' in triggered_id or 'splom-cell' in triggered_id:
 
-        y_col = clickData['points'][0]['y']
+        if 'splom-cell' in triggered_id:
 
-        scatter_id = f"scatter-{x_col}-{y_col}"
+            # サムネイルのクリック（index は "x_col|y_col"）
 
-        
+            if not ctx.triggered[0]['value']:
 
-        if scatter_id not in current_ids:
+                raise PreventUpdate
 
-            new_graph = dcc.Graph(
+            x_col, y_col = json.loads(triggered_id.rsplit('.', 1)[0])['index'].split('|')
 
-                id={'type': 'scatter', 'index': scatter_id},
+        else:
 
-                figure=create_scatter_plot(x_col, y_col),
+            if clickData is None:
 
-                config={"displayModeBar": True},
+                raise PreventUpdate
 
-                style={"display": "inline-block", "width": "400px", "height": "300px"},
 
-            )
+            x_col = clickData['points'][0]['x']
 
-            current_children.append(new_graph)
+            y_col = clickData['points'][0]['y']
 
-            current_ids.append(scatter_id)
+        scatter_id = f"scatter-{x_col}-{y_col}"
 
-    else:
 
-        selectedpoints = df.index
+        if scatter_id in current_ids:
 
-        for selected_data in selectedDataList:
+            raise PreventUpdate
 
-            if selected_data and selected_data["points"]:
 
-                selectedpoints = np.intersect1d(
+        new_graph = dcc.Graph(
 
-                    selectedpoints, [p["customdata"] for p in selected_data["points"]]
+            id={'type': 'scatter', 'index': scatter_id},
 
-                )
+            figure=create_scatter_plot(df, x_col, y_col, selected_points(session_id)),
 
+            config={"displayModeBar": True},
 
-        updated_children = []
+            style={"display": "inline-block", "width": "400px", "height": "300px"},
 
-        for child in current_children:
+        )
 
-            if isinstance(child, dict) and "props" in child and "figure" in child["props"]:
+        patched_children.append(new_graph)
 
-                graph_id = child["props"]["id"]["index"]
+        session_store.set(session_id, "scatter_ids", current_ids + [scatter_id])
 
-                x_col, y_col = graph_id.split("-")[1:3]
+        return patched_children, no_update
 
-                fig = create_scatter_plot(x_col, y_col, selectedpoints)
 
-                child["props"]["figure"] = fig
+    mask = selection_mask(df.index, selectedDataList)
 
-            updated_children.append(child)
+    selectedpoints = df.index.to_numpy() if mask is None else df.index.to_numpy()[mask]
 
-        current_children = updated_children
+    session_store.set(session_id, "selection_mask", mask)
 
+    session_store.set(session_id, "selectedpoints", selectedpoints)
 
-    return current_children, current_ids
+
+    # 各散布図の selectedpoints だけを書き換える（選択解除では全行のリストではなく None を送る）
+
+    for i in range(len(current_ids)):
+
+        patched_children[i]["props"]["figure"]["data"][0]["selectedpoints"] = None if mask is None else selectedpoints.tolist()
+
+
+    version = session_store.get(session_id, "selection_version", 0) + 1
+
+    session_store.set(session_id, "selection_version", version)
+
+    return patched_children, version
 
 
 @app.callback(
 
-    Output("heatmap", "figure"),
+    Output("heatmap", "figure"),
 
-    Input("heatmap", "selectedData")
+    Input("heatmap", "selectedData")
 
 )
 
+@timed
+
 def update_heatmap(selectedData):
 
-    return create_heatmap()
+    return create_heatmap(heatmap_df)
 
 
 @app.callback(
 
-    Output("vth-vs-vg-graph", "figure"),
+    Output("vth-vs-vg-graph", "figure"),
+
+    Output("vth-vs-vg-graph", "style"),
 
-    Output("vth-vs-vg-graph", "style"),
+    Input("generate-graph", "n_clicks"),
 
-    Input("generate-graph", "n_clicks"),
+    State("session-id", "data"),
 
-    State({'type': 'scatter', 'index': ALL}, "selectedData"),
+    State("vth-view-mode", "value"),
 
 )
 
-def generate_vth_vs_vg_graph(n_clicks, selectedDataList):
+@timed
 
-    if n_clicks == 0:
+def generate_vth_vs_vg_graph(n_clicks, session_id, view_mode):
 
-        raise PreventUpdate
+    if n_clicks == 0:
 
-    
+        raise PreventUpdate
 
-    selectedpoints = df.index
+    if session_id not in session_store:
 
-    for selected_data in selectedDataList:
+        return no_update_outputs()
 
-        if selected_data and selected_data["points"]:
+    
 
-            selectedpoints = np.intersect1d(
+    selectedpoints = session_store.get(session_id, "selectedpoints", df.index.to_numpy())
 
-                selectedpoints, [p["customdata"] for p in selected_data["points"]]
 
-            )
+    if len(selectedpoints) == 0:
 
+        raise PreventUpdate
 
-    selected_df = df.loc[selectedpoints]
 
-    
+    # 選択が少ないときだけデバイスごとの曲線、多いときは (Type, Vg) ごとの統計量を表示
 
-    if selected_df.empty:
+    if view_mode == "devices" or (view_mode == "auto" and len(selectedpoints) <= DEVICE_CURVE_LIMIT):
 
-        raise PreventUpdate
+        fig = create_device_figure(wide_to_long(df, rows=selectedpoints))
 
+    else:
 
-    long_selected_df = wide_to_long(selected_df)
+        summary = selection_summary(selectedpoints)
 
-    
+        fig = create_summary_figure(summary, "box" if view_mode == "box" else "summary")
 
-    fig = px.scatter(long_selected_df, x="Vg", y="VTH", color="Type", symbol="Type")
+    
 
-    fig.update_traces(mode='lines+markers')
+    # Add measured data as circles
 
-    
+    fig.add_trace(go.Scatter(x=measured_df["Vg"], y=measured_df["VTH"],
 
-    # Add measured data as circles
+                             mode='markers',
 
-    fig.add_trace(go.Scatter(x=measured_df["Vg"], y=measured_df["VTH"],
+                             marker=dict(symbol='circle', size=10, color='red'),
 
-                             mode='markers',
+                             name='Measured Data'))
 
-                             marker=dict(symbol='circle', size=10, color='red'),
+    
 
-                             name='Measured Data'))
+    # Add total result data as lines
 
-    
+    for vth_type in total_df["Type"].unique():
 
-    # Add total result data as lines
+        filtered_df = total_df[total_df["Type"] == vth_type]
 
-    for vth_type in total_df["Type"].unique():
+        fig.add_trace(go.Scatter(x=filtered_df["Vg"], y=filtered_df["VTH"],
 
-        filtered_df = total_df[total_df["Type"] == vth_type]
+                                 mode='lines',
 
-        fig.add_trace(go.Scatter(x=filtered_df["Vg"], y=filtered_df["VTH"],
+                                 name=f'Total Result {vth_type}'))
 
-                                 mode='lines',
 
-                                 name=f'Total Result {vth_type}'))
+    fig.update_layout(
 
+        title="VTH vs Vg",
 
-    fig.update_layout(
+        xaxis_title="Vg (V)",
 
-        title="VTH vs Vg",
+        yaxis_title="VTH",
 
-        xaxis_title="Vg (V)",
+    )
 
-        yaxis_title="VTH",
+    
 
-    )
+    return fig, {"display": "block"}
 
-    
 
-    return fig, {"display": "block"}
+# 散布図行列のサムネイルを更新する
+
+@app.callback(
+
+    Output("splom-container", "children"),
+
+    Input("splom-columns", "value"),
+
+)
+
+@timed
+
+def update_splom(splom_columns):
+
+    return create_splom(bin_index, splom_columns or [])
+
+
+# 選択中の行の周辺ヒストグラムを更新する
+
+@app.callback(
+
+    Output("marginal-histograms", "figure"),
+
+    Input("histogram-columns", "value"),
+
+    Input("selection-version", "data"),
+
+    State("session-id", "data"),
+
+)
+
+@timed
+
+def update_marginal_histograms(histogram_columns, _, session_id):
+
+    if not histogram_columns:
+
+        raise PreventUpdate
+
+    if session_id not in session_store:
+
+        return no_update_outputs()
+
+
+    mask = session_store.get(session_id, "selection_mask")
+
+    # 列が変わっていなければ選択分の棒の高さだけを差し替える（サブプロットを作り直さない）
+
+    if list(callback_context.triggered_prop_ids) == ["selection-version.data"]:
+
+        return histogram_selection_patch(bin_index, histogram_columns, mask)
+
+    return create_histogram_figure(bin_index, histogram_columns, mask)
+
+
+# コールバックの処理時間・転送量・キャッシュヒット率・データ構造のメモリ量を計測する（/metrics, /metrics.json, /metrics/memory）
+
+metrics = instrument_app(
+
+    app,
+
+    caches={"selection_summary": summary_cache, "pair_thumbnail": thumbnail_stats},
+
+    structures={
+
+        "df": lambda: df,
+
+        "heatmap_df": lambda: heatmap_df,
+
+        "bin_index": lambda: bin_index,
+
+        "measured_df": lambda: measured_df,
+
+        "total_df": lambda: total_df,
+
+    },
+
+)
 
 
 if __name__ == "__main__":
 
-    app.run_server(debug=True)
+    app.run_server(debug=True)
 
@@ -1,44 +1,80 @@
+import argparse
+import threading
 import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
-from dash import Dash, dcc, html, Input, Output, State, callback_context
+from dash import Dash, dcc, html, Input, Output, State, Patch, callback_context, no_update
+from dash.dependencies import ALL
 from dash.exceptions import PreventUpdate
+from instrumentation import instrument_app, timed
+from live_tail import CsvTail, OnlineCorrelation, numeric_columns
+from vth_fit import fit_vth_curves
+from vth_summary import wide_to_long
+from compact_data import compact_frame, share_categories
+from column_filter import ColumnIndex, create_filter_bar, filter_inputs, filter_option_outputs, filter_options, sub_matrix
+from session_store import SessionStore, no_update_outputs
+from export import ALL_ROWS, register_export_route, selected_points_frame
 
 external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
 app = Dash(__name__, external_stylesheets=external_stylesheets)
 app.config.suppress_callback_exceptions = True
 
+# Per-session state (open plots, selected points) lives on the server; the browser only keeps the session id
+session_store = SessionStore()
+
+# Watch mode (--watch): poll total_result.csv for rows appended by running simulation batches
+WATCH_MODE = False
+WATCH_INTERVAL_MS = 5000
+
 # Load real data
-total_df = pd.read_csv("total_result.csv")
-measured_df = pd.read_csv("measured_data.csv")
-
-# Create heatmap data
-heatmap_df = total_df.corr()
-
-def parse_column_name(col):
-    parts = col.split('_')
-    vth_type = parts[0]
-    vg = float(parts[1].split('.')[0])
-    level = int(parts[1].split('.')[1])
-    return vth_type, vg, level
-
-def create_long_df(df):
-    data = []
-    for col in df.columns:
-        if col.startswith('VTH'):
-            vth_type, vg, level = parse_column_name(col)
-            data.append({
-                'VTH': df[col],
-                'Vg': vg,
-                'Type': vth_type,
-                'Level': level
-            })
-    return pd.DataFrame(data)
-
-long_df = create_long_df(total_df)
-
-app.layout = html.Div([
+total_tail = CsvTail("total_result.csv")
+
+# New rows plus their per-device VTH vs Vg fit coefficients (selectable in the heatmap), measurements as float32
+def read_total_rows():
+    rows = compact_frame(total_tail.read_new())
+    return rows.join(compact_frame(fit_vth_curves(rows)))
+
+measured_df = compact_frame(pd.read_csv("measured_data.csv"))
+
+# Appended batches are kept as they are read, so that a poll only costs the new rows.
+# The running statistics behind the heatmap start with the first batch that has rows, so a total_result.csv
+# that is empty (or only has its header) at start-up still gets its columns once rows arrive.
+# Every batch also goes to the open scatter plots as its own long rows (data version -> rows): a plot that
+# shows an earlier version is sent only the rows added since. The full plots are rebuilt after a restart.
+data_version = 0
+data_lock = threading.Lock()
+
+# (Type, Level) of each scatter trace, in trace order. Keys are only appended until the next restart, so a
+# trace number (curveNumber) means the same key in every scatter plot built or patched since.
+scatter_traces = []
+
+def add_long_batch(rows, version):
+    if rows.empty:
+        return
+    long_rows = wide_to_long(rows)
+    long_batches.append((version, long_rows))
+    keys = long_rows[["Type", "Level"]].drop_duplicates()
+    seen = set(scatter_traces)
+    scatter_traces.extend(sorted({(str(t), int(level)) for t, level in keys.itertuples(index=False)} - seen))
+
+# The data as of one batch (start-up, or total_result.csv truncated / replaced)
+def start_over(rows, version):
+    global total_batches, correlation, heatmap_df, column_index, long_batches, scatter_traces, restart_version
+    total_batches = [rows]
+    correlation = None
+    if not rows.empty:
+        correlation = OnlineCorrelation(numeric_columns(rows))
+        correlation.update(rows)
+    heatmap_df = pd.DataFrame() if correlation is None else correlation.corr()
+    column_index = ColumnIndex(heatmap_df.columns)  # Type / Vg / Level of each heatmap column, for the filter bar
+    long_batches, scatter_traces, restart_version = [], [], version
+    add_long_batch(rows, version)
+
+start_over(read_total_rows(), data_version)
+
+layout = html.Div([
     html.Div([
+        create_filter_bar(column_index),
         dcc.Graph(id="heatmap", config={"displayModeBar": False}),
     ], className="six columns"),
     html.Div([
@@ -47,19 +83,87 @@ app.layout = html.Div([
     html.Div([
         dcc.Graph(id="selected-data-plot")
     ], className="twelve columns"),
-    dcc.Store(id='scatter-plots-store', data=[]),
-    dcc.Store(id='selected-data-store'),
+    dcc.Store(id='scatter-plots-store', data=0),  # number of open plots (the plots themselves are in the session store)
+    dcc.Store(id='selected-data-store', data=0),  # selection version (the points are in the session store)
+    dcc.Store(id='data-version', data=data_version),
 ])
 
+# A new session id for every page load; the poll interval follows --watch
+def serve_layout():
+    session_id = session_store.new_session()
+    return html.Div([
+        layout,
+        dcc.Interval(id='tail-interval', interval=WATCH_INTERVAL_MS, disabled=not WATCH_MODE),
+        dcc.Store(id='session-id', data=session_id),
+        html.A("Export CSV", href=f"/export/{session_id}.csv", target="_blank"),
+        html.A("Export Parquet", href=f"/export/{session_id}.parquet", target="_blank", style={"marginLeft": "1em"}),
+    ])
+
+app.layout = serve_layout
+
+# The selected points with the measured VTH at the same Type / Vg / Level, as CSV / Parquet (/export/<session_id>.csv)
+def exported_points(session_id):
+    points = session_store.get(session_id, "selected_points")
+    if points is None or points.empty:
+        return None
+    return points, ALL_ROWS
+
+register_export_route(app.server, exported_points, join_frame=measured_df, join_on=["Type", "Vg", "Level"])
+
+@app.callback(
+    Output("data-version", "data"),
+    Input("tail-interval", "n_intervals"),
+    State("data-version", "data")
+)
+@timed
+def poll_total_result(_, client_version):
+    global total_batches, heatmap_df, data_version
+
+    with data_lock:
+        new_rows = read_total_rows()
+        if total_tail.restarted or (correlation is None and not new_rows.empty):
+            data_version += 1
+            start_over(new_rows, data_version)
+        elif not new_rows.empty:
+            # Only the new rows are reshaped and added to the statistics; categoricals share the earlier batches' dtypes
+            total_batches, new_rows = share_categories(total_batches, new_rows)
+            total_batches.append(new_rows)
+            correlation.update(new_rows)
+            heatmap_df = correlation.corr()
+            data_version += 1
+            add_long_batch(new_rows, data_version)
+        elif client_version == data_version:
+            raise PreventUpdate
+        else:
+            # Another client already picked up the new rows
+            return data_version
+        return data_version
+
+# The filter bar follows the columns of the data: a rewritten total_result.csv can bring other Types, Vg or Levels
+@app.callback(
+    *filter_option_outputs(),
+    Input("data-version", "data"),
+    State("filter-vg", "value"),
+    State("filter-vg", "min"),
+    State("filter-vg", "max")
+)
+@timed
+def update_filter_options(_, vg_value, vg_min, vg_max):
+    return filter_options(column_index, vg_value, [vg_min, vg_max])
+
+# Only the filtered columns, sliced from the running correlation matrix
 @app.callback(
     Output("heatmap", "figure"),
-    Input("heatmap", "id")
+    Input("data-version", "data"),
+    *filter_inputs()
 )
-def update_heatmap(_):
+@timed
+def update_heatmap(_, types, vg_range, levels, pattern):
+    corr_df = sub_matrix(heatmap_df, column_index, types, vg_range, levels, pattern)
     fig = go.Figure(data=go.Heatmap(
-        z=heatmap_df.values,
-        x=heatmap_df.columns,
-        y=heatmap_df.columns,
+        z=corr_df.values,
+        x=corr_df.columns,
+        y=corr_df.columns,
         colorscale="Viridis"
     ))
     fig.update_layout(
@@ -74,94 +178,148 @@ def update_heatmap(_):
     [Output("scatter-plots-container", "children"),
      Output("scatter-plots-store", "data")],
     [Input("heatmap", "clickData")],
-    [State("scatter-plots-store", "data")]
+    [State("session-id", "data")]
 )
-def update_scatter_plots(clickData, existing_plots):
+@timed
+def update_scatter_plots(clickData, session_id):
     if not clickData:
         raise PreventUpdate
+    # The session was dropped (idle past its TTL or evicted for memory): close the plots and start over
+    if session_id not in session_store:
+        session_store.new_session(session_id)
+        return [[], 0]
     
-    existing_plots = existing_plots or []
+    existing_plots = session_store.get(session_id, "scatter_plots", [])
     x_col = clickData['points'][0]['x']
     y_col = clickData['points'][0]['y']
     
     new_plot_id = f"scatter-plot-{len(existing_plots)}"
-    existing_plots.append({"id": new_plot_id, "x": x_col, "y": y_col})
+    existing_plots = existing_plots + [{"id": new_plot_id, "x": x_col, "y": y_col}]
+    session_store.set(session_id, "scatter_plots", existing_plots)
     
-    new_plot = html.Div([
+    # Only the new graph is sent; the plots already on the page stay as they are
+    children = Patch()
+    children.append(html.Div([
         dcc.Graph(id={"type": "scatter", "index": new_plot_id}),
-    ])
+    ]))
     
-    return [html.Div([new_plot] + [html.Div(id=plot['id']) for plot in existing_plots[:-1]]), existing_plots]
+    return [children, len(existing_plots)]
+
+# Vg / VTH lists of each (Type, Level) in long rows, in one grouping pass. Lists rather than arrays, so that
+# patches can extend them on the page.
+def trace_points(long_rows):
+    vg, vth = long_rows["Vg"].to_numpy(), long_rows["VTH"].to_numpy()
+    groups = long_rows.groupby(["Type", "Level"], observed=True).indices
+    return {(str(t), int(level)): (vg[positions].tolist(), vth[positions].tolist()) for (t, level), positions in groups.items()}
+
+def rows_since(version):
+    batches = [long_rows for batch_version, long_rows in long_batches if batch_version > version]
+    return trace_points(pd.concat(batches, ignore_index=True)) if batches else {}
+
+def scatter_trace(key, x, y):
+    vth_type, level = key
+    return go.Scatter(x=x, y=y, mode='markers', name=f'{vth_type} - Level {level}', marker=dict(size=8))
+
+def create_scatter_figure(plot_data):
+    points = rows_since(-1)
+    fig = go.Figure([scatter_trace(key, *points.get(key, ([], []))) for key in scatter_traces])
+    fig.update_layout(
+        title=f"{plot_data['x']} vs {plot_data['y']}",
+        xaxis_title="Vg",
+        yaxis_title=plot_data['y'],
+        height=400
+    )
+    return fig
+
+# The rows added since the plot's version, appended to its traces (and traces for new Type / Level keys)
+def scatter_patch(plot_data):
+    points = rows_since(plot_data["version"])
+    patch = Patch()
+    for i, key in enumerate(scatter_traces):
+        x, y = points.get(key, ([], []))
+        if i >= plot_data["traces"]:
+            patch["data"].append(scatter_trace(key, x, y).to_plotly_json())
+        elif x:
+            patch["data"][i]["x"].extend(x)
+            patch["data"][i]["y"].extend(y)
+    return patch
 
 @app.callback(
     Output({"type": "scatter", "index": ALL}, "figure"),
-    [Input("scatter-plots-store", "data")]
+    [Input("scatter-plots-store", "data"),
+     Input("data-version", "data")],
+    [State("session-id", "data")]
 )
-def update_scatter_figures(plots_data):
+@timed
+def update_scatter_figures(_, __, session_id):
+    if session_id not in session_store:
+        return no_update_outputs()
+    plots_data = session_store.get(session_id, "scatter_plots", [])
     if not plots_data:
         raise PreventUpdate
-    
-    figures = []
-    for plot_data in plots_data:
-        x_col = plot_data['x']
-        y_col = plot_data['y']
-        
-        fig = go.Figure()
-        
-        for vth_type in ['VTH_W', 'VTH_E']:
-            for level in long_df['Level'].unique():
-                df_filtered = long_df[(long_df['Type'] == vth_type) & (long_df['Level'] == level)]
-                fig.add_trace(go.Scatter(
-                    x=df_filtered['Vg'],
-                    y=df_filtered[y_col] if y_col in df_filtered.columns else df_filtered['VTH'],
-                    mode='markers',
-                    name=f'{vth_type} - Level {level}',
-                    marker=dict(size=8)
-                ))
-        
-        fig.update_layout(
-            title=f"{x_col} vs {y_col}",
-            xaxis_title="Vg",
-            yaxis_title=y_col,
-            height=400
-        )
-        figures.append(fig)
-    
+
+    # New plots (and every plot after a restart) are built in full, the others only get the new rows
+    with data_lock:
+        figures = []
+        for plot_data in plots_data:
+            version = plot_data.get("version")
+            if version is None or version < restart_version:
+                figures.append(create_scatter_figure(plot_data))
+            elif version == data_version:
+                figures.append(no_update)
+            else:
+                figures.append(scatter_patch(plot_data))
+        plots_data = [{**plot_data, "version": data_version, "traces": len(scatter_traces)} for plot_data in plots_data]
+    session_store.set(session_id, "scatter_plots", plots_data)
     return figures
 
 @app.callback(
     Output("selected-data-store", "data"),
-    [Input({"type": "scatter", "index": ALL}, "selectedData")]
+    [Input({"type": "scatter", "index": ALL}, "selectedData")],
+    [State("session-id", "data")]
 )
-def store_selected_data(selectedData):
+@timed
+def store_selected_data(selectedData, session_id):
     ctx = callback_context
     if not ctx.triggered:
         raise PreventUpdate
+    if session_id not in session_store:
+        return no_update_outputs()
     
     selected_points = []
     for points in selectedData:
         if points:
             selected_points.extend(points['points'])
     
-    return selected_points
+    # curveNumber is the trace number, so the points are resolved to Type / Vg / Level rows while the traces
+    # they were picked on are still the current ones
+    with data_lock:
+        selected_points = selected_points_frame(selected_points, scatter_traces, like=measured_df)
+    session_store.set(session_id, "selected_points", selected_points)
+    version = session_store.get(session_id, "selection_version", 0) + 1
+    session_store.set(session_id, "selection_version", version)
+    return version
 
 @app.callback(
     Output("selected-data-plot", "figure"),
-    Input("selected-data-store", "data")
+    Input("selected-data-store", "data"),
+    State("session-id", "data")
 )
-def update_selected_data_plot(selectedData):
-    if not selectedData:
+@timed
+def update_selected_data_plot(_, session_id):
+    if session_id not in session_store:
+        return no_update_outputs()
+    selectedData = session_store.get(session_id, "selected_points")
+    if selectedData is None or selectedData.empty:
         raise PreventUpdate
     
     fig = go.Figure()
     
-    for point in selectedData:
-        vth_type, vg, level = parse_column_name(point['curveNumber'])
-        
+    for vth_type, vg, level, vth in selectedData.itertuples(index=False):
         # Plot selected points from total_result.csv
         fig.add_trace(go.Scatter(
-            x=[point['x']],
-            y=[point['y']],
+            x=[vg],
+            y=[vth],
             mode='markers',
             name=f'{vth_type} - Level {level} (Selected)',
             marker=dict(size=10, symbol='star')
@@ -187,5 +345,17 @@ def update_selected_data_plot(selectedData):
     )
     return fig
 
+# Callback timings, payload sizes, cache hit rates and data memory on /metrics, /metrics.json and /metrics/memory
+metrics = instrument_app(app, structures={
+    "total_batches": lambda: total_batches,
+    "measured_df": lambda: measured_df,
+    "heatmap_df": lambda: heatmap_df,
+    "long_batches": lambda: long_batches,
+    "correlation": lambda: correlation,
+})
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--watch", action="store_true", help="poll total_result.csv for appended rows")
+    WATCH_MODE = parser.parse_args().watch
     app.run_server(debug=True)
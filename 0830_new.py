@@ -4,42 +4,45 @@ import plotly.graph_objs as go
 from dash import Dash, dcc, html, Input, Output, State, callback_context
 from dash.dependencies import ALL
 from dash.exceptions import PreventUpdate
+from instrumentation import instrument_app, timed
+from vth_fit import fit_vth_curves
+from vth_summary import wide_to_long
+from compact_data import compact_frame
+from column_filter import ColumnIndex, create_filter_bar, filter_inputs, sub_matrix
+from session_store import SessionStore
+from export import ALL_ROWS, register_export_route, selected_points_frame
 
 external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
 app = Dash(__name__, external_stylesheets=external_stylesheets)
 app.config.suppress_callback_exceptions = True
 
-# Load real data
-total_df = pd.read_csv("total_result.csv")
-measured_df = pd.read_csv("measured_data.csv")
+# The selected points are also kept on the server, per session, for the export route
+session_store = SessionStore()
+
+# Load real data (float32 measurements, categorical Type, small-int Level)
+total_df = compact_frame(pd.read_csv("total_result.csv"))
+measured_df = compact_frame(pd.read_csv("measured_data.csv"))
+
+# Per-device VTH vs Vg fit coefficients, computed once and selectable in the heatmap
+total_df = total_df.join(compact_frame(fit_vth_curves(total_df)))
 
 # Create heatmap data
 heatmap_df = total_df.corr()
 
-def parse_column_name(col):
-    parts = col.split('_')
-    vth_type = parts[0]
-    vg = float(parts[1].split('.')[0])
-    level = int(parts[1].split('.')[1])
-    return vth_type, vg, level
-
-def create_long_df(df):
-    data = []
-    for col in df.columns:
-        if col.startswith('VTH'):
-            vth_type, vg, level = parse_column_name(col)
-            data.append({
-                'VTH': df[col],
-                'Vg': vg,
-                'Type': vth_type,
-                'Level': level
-            })
-    return pd.DataFrame(data)
-
-long_df = create_long_df(total_df)
-
-app.layout = html.Div([
+# Type / Vg / Level of each heatmap column, for the filter bar
+column_index = ColumnIndex(heatmap_df.columns)
+
+# One row per device and VTH column
+long_df = wide_to_long(total_df)
+
+# Row positions of each (Type, Level) scatter trace, and the keys in trace order: a selected point's
+# curveNumber is its index in scatter_traces
+trace_rows = {(str(t), int(level)): rows for (t, level), rows in long_df.groupby(["Type", "Level"], observed=True).indices.items()}
+scatter_traces = sorted(trace_rows)
+
+layout = html.Div([
     html.Div([
+        create_filter_bar(column_index),
         dcc.Graph(id="heatmap", config={"displayModeBar": False}),
     ], className="six columns"),
     html.Div([
@@ -51,15 +54,39 @@ app.layout = html.Div([
     dcc.Store(id='selected-data-store'),
 ])
 
+# A new session id for every page load
+def serve_layout():
+    session_id = session_store.new_session()
+    return html.Div([
+        layout,
+        dcc.Store(id='session-id', data=session_id),
+        html.A("Export CSV", href=f"/export/{session_id}.csv", target="_blank"),
+        html.A("Export Parquet", href=f"/export/{session_id}.parquet", target="_blank", style={"marginLeft": "1em"}),
+    ])
+
+app.layout = serve_layout
+
+# The selected points with the measured VTH at the same Type / Vg / Level, as CSV / Parquet (/export/<session_id>.csv)
+def exported_points(session_id):
+    points = session_store.get(session_id, "selected_points")
+    if points is None or points.empty:
+        return None
+    return points, ALL_ROWS
+
+register_export_route(app.server, exported_points, join_frame=measured_df, join_on=["Type", "Vg", "Level"])
+
+# Only the filtered columns, sliced from the correlation matrix computed at start-up
 @app.callback(
     Output("heatmap", "figure"),
-    Input("heatmap", "id")
+    *filter_inputs()
 )
-def update_heatmap(_):
+@timed
+def update_heatmap(types, vg_range, levels, pattern):
+    corr_df = sub_matrix(heatmap_df, column_index, types, vg_range, levels, pattern)
     fig = go.Figure(data=go.Heatmap(
-        z=heatmap_df.values,
-        x=heatmap_df.columns,
-        y=heatmap_df.columns,
+        z=corr_df.values,
+        x=corr_df.columns,
+        y=corr_df.columns,
         colorscale="Viridis"
     ))
     fig.update_layout(
@@ -74,6 +101,7 @@ def update_heatmap(_):
     Output("scatter-plot", "figure"),
     Input("heatmap", "selectedData")
 )
+@timed
 def update_scatter(selectedData):
     if not selectedData:
         raise PreventUpdate
@@ -83,16 +111,15 @@ def update_scatter(selectedData):
     
     fig = go.Figure()
     
-    for vth_type in ['VTH_W', 'VTH_E']:
-        for level in long_df['Level'].unique():
-            df_filtered = long_df[(long_df['Type'] == vth_type) & (long_df['Level'] == level)]
-            fig.add_trace(go.Scatter(
-                x=df_filtered['Vg'],
-                y=df_filtered[x_col] if x_col in df_filtered.columns else df_filtered['VTH'],
-                mode='markers',
-                name=f'{vth_type} - Level {level}',
-                marker=dict(size=8)
-            ))
+    for vth_type, level in scatter_traces:
+        df_filtered = long_df.iloc[trace_rows[(vth_type, level)]]
+        fig.add_trace(go.Scatter(
+            x=df_filtered['Vg'],
+            y=df_filtered['VTH'],
+            mode='markers',
+            name=f'{vth_type} - Level {level}',
+            marker=dict(size=8)
+        ))
     
     fig.update_layout(
         title=f"{x_col} vs {y_col}",
@@ -104,30 +131,36 @@ def update_scatter(selectedData):
 
 @app.callback(
     Output("selected-data-store", "data"),
-    Input("scatter-plot", "selectedData")
+    Input("scatter-plot", "selectedData"),
+    State("session-id", "data")
 )
-def store_selected_data(selectedData):
+@timed
+def store_selected_data(selectedData, session_id):
     if not selectedData:
         raise PreventUpdate
-    return selectedData
+    # curveNumber is the trace number: the points become Type / Vg / Level / VTH rows
+    selected_points = selected_points_frame(selectedData['points'], scatter_traces, like=measured_df)
+    session_store.set(session_id, "selected_points", selected_points)
+    return selected_points.to_dict("records")
 
 @app.callback(
     Output("selected-data-plot", "figure"),
     Input("selected-data-store", "data")
 )
+@timed
 def update_selected_data_plot(selectedData):
     if not selectedData:
         raise PreventUpdate
     
     fig = go.Figure()
     
-    for point in selectedData['points']:
-        vth_type, vg, level = parse_column_name(point['curveNumber'])
+    for point in selectedData:
+        vth_type, vg, level = point['Type'], point['Vg'], point['Level']
         
         # Plot selected points from total_result.csv
         fig.add_trace(go.Scatter(
             x=[vg],
-            y=[point['y']],
+            y=[point['VTH']],
             mode='markers',
             name=f'{vth_type} - Level {level} (Selected)',
             marker=dict(size=10, symbol='star')
@@ -153,5 +186,13 @@ def update_selected_data_plot(selectedData):
     )
     return fig
 
+# Callback timings, payload sizes, cache hit rates and data memory on /metrics, /metrics.json and /metrics/memory
+metrics = instrument_app(app, structures={
+    "total_df": lambda: total_df,
+    "measured_df": lambda: measured_df,
+    "heatmap_df": lambda: heatmap_df,
+    "long_df": lambda: long_df,
+})
+
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,43 @@
+import dash
+from dash import Dash, dcc, html
+
+from data_layer import get_data_layer, session_store
+from export import register_export_route, session_selection
+from instrumentation import instrument_app
+
+# One process serves every view (pages/) over the same data layer, loaded once on first use:
+#   /          heatmap / cross-filter over total_result.csv
+#   /measured  measured vs simulated VTH
+#   /vtk       VTK viewer (hoge.vtp)
+external_stylesheets = ["https://codepen.io/chriddyp/pen/bWLwgP.css"]
+app = Dash(__name__, use_pages=True, external_stylesheets=external_stylesheets)
+app.config.suppress_callback_exceptions = True
+
+layer = get_data_layer()
+
+# A new session id for every page load; pages keep their selections in session_store under it
+def serve_layout():
+    return html.Div([
+        html.Div(
+            [dcc.Link(page["name"], href=page["relative_path"], style={"marginRight": "2em"})
+             for page in dash.page_registry.values()],
+            style={"padding": "10px"},
+        ),
+        dash.page_container,
+        dcc.Store(id="session-id", data=session_store.new_session()),
+    ])
+
+app.layout = serve_layout
+
+# Rows selected on the cross-filter page as CSV / Parquet (/export/<session_id>.csv)
+register_export_route(app.server, session_selection(session_store, lambda: layer.total_df))
+
+# Callback timings, payload sizes, cache hit rates and data memory on /metrics, /metrics.json and /metrics/memory
+metrics = instrument_app(
+    app,
+    caches={"selection": layer.selection_cache, "measured_vth": layer.measured_cache},
+    structures=layer.structures(),
+)
+
+if __name__ == "__main__":
+    app.run(debug=True)
@@ -0,0 +1,369 @@
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from dash.exceptions import PreventUpdate
+
+from column_schema import column_metadata, parse_column_name
+from compact_data import compact_frame
+from crossfilter import BinIndex
+from data_layer import STRUCTURES, DataLayer
+from data_source import CsvSource, SqliteSource
+from export import selected_points_frame
+from live_tail import OnlineCorrelation
+from outliers import OutlierMask
+from synthetic_data import make_col_frame, make_total_result, make_vthe_vthw_frame, write_database, write_dataset, write_vtp
+from vth_fit import batched_polyfit, fit_vth_curves, looped_polyfit
+from vth_summary import wide_to_long
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(ROOT, "benchmark_results")
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+# Import one of the dashboard scripts as a module (their file names are not valid module names)
+def load_script(filename, workdir):
+    name = "bench_" + os.path.splitext(filename)[0]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    with working_directory(workdir):
+        spec.loader.exec_module(module)
+    return module
+
+# 0721-0723 build their sample frame inline; swap in a synthetic frame of the requested size
+def rebind_sample_frame(module, df):
+    df = compact_frame(df)
+    module.df = df
+    module.heatmap_df = df.corr()
+    module.bin_index = BinIndex(df)
+    if hasattr(module, "summary_cache"):
+        module.summary_cache.clear()
+
+def set_triggered(prop_id, value=1):
+    context_value.set(AttributeDict(triggered_inputs=[{"prop_id": prop_id, "value": value}]))
+
+def selected_data(index, step=2):
+    return {"points": [{"customdata": int(i)} for i in index[::step]]}
+
+# Cold run, `repeat` warm runs, then one run under tracemalloc for the peak allocation
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"cold_seconds": times[0], "warm_seconds": statistics.median(times[1:]), "peak_bytes": peak}
+
+def prep_cases(rows, vg_points, levels):
+    vthe = make_vthe_vthw_frame(rows, vg_points)
+    total = make_total_result(rows, vg_points, levels)
+    numeric = total.columns
+
+    def online_corr():
+        correlation = OnlineCorrelation(numeric)
+        correlation.update(total)
+        return correlation.corr()
+
+    full = OnlineCorrelation(numeric)
+    full.update(total)
+    flagged = total[OutlierMask(total).rows]
+
+    # One (Type, Level) group of VTH columns, as fit_vth_curves solves it, also with 1% missing values
+    group = column_metadata(total.columns).groupby(["Type", "Level"]).get_group(("VTH_W", 1)).sort_values("Vg")
+    vg, vth = group["Vg"].to_numpy(), total[group["column"]].to_numpy(dtype=float)
+    vth_missing = np.where(np.random.default_rng(0).random(vth.shape) < 0.01, np.nan, vth)
+
+    cases = [
+        ("prep.wide_to_long", lambda: wide_to_long(vthe)),
+        ("prep.corr", lambda: total.corr()),
+        ("prep.online_corr", online_corr),
+        ("prep.outlier_mask", lambda: OutlierMask(total)),
+        ("prep.corr_without_outliers", lambda: full.without(flagged).corr()),
+        ("prep.fit_vth_curves", lambda: fit_vth_curves(total)),
+        ("prep.polyfit[looped]", lambda: looped_polyfit(vg, vth)),
+        ("prep.polyfit[batched]", lambda: batched_polyfit(vg, vth)),
+        ("prep.polyfit[batched_missing]", lambda: batched_polyfit(vg, vth_missing)),
+        ("prep.bin_index", lambda: BinIndex(total)),
+    ]
+    return cases
+
+# Every structure of the unified app's data layer, rebuilt from the CSVs or attached from a snapshot
+# (the cold run of snapshot_attach builds and writes the snapshot)
+def data_layer_cases(snapshot_dir):
+    def build(snapshot_dir):
+        layer = DataLayer(snapshot_dir=snapshot_dir)
+        return [getattr(layer, name) for name in STRUCTURES]
+
+    return [
+        ("data_layer.build", lambda: build(None)),
+        ("data_layer.snapshot_attach", lambda: build(snapshot_dir)),
+    ]
+
+# Whole table vs two columns of one lot, from the CSV and from the results database
+def source_cases(csv_path, database_path):
+    csv, sqlite = CsvSource(csv_path), SqliteSource(database_path, "total_result")
+    two_columns = list(csv.columns()[:2])
+    return [
+        ("source.csv.read_all", lambda: csv.read()),
+        ("source.csv.two_columns", lambda: csv.read(two_columns)),
+        ("source.sqlite.read_all", lambda: sqlite.read()),
+        ("source.sqlite.two_columns_one_lot", lambda: sqlite.read(two_columns, [("Lot", "==", "LOT00")])),
+    ]
+
+def crossfilter_cases(prefix, module, df):
+    columns = list(df.columns)
+    session_id = module.session_store.new_session()
+    module.session_store.set(session_id, "scatter_ids", [f"scatter-{columns[0]}-{columns[1]}"])
+    selection = [selected_data(df.index.to_numpy())]
+    click = {"points": [{"x": columns[0], "y": columns[1]}]}
+
+    def open_scatter():
+        set_triggered("heatmap.clickData")
+        return module.update_scatter_plots_and_selection(click, [], [], module.session_store.new_session())
+
+    def select():
+        set_triggered('{"index":"scatter","type":"scatter"}.selectedData')
+        return module.update_scatter_plots_and_selection(None, selection, [], session_id)
+
+    def histograms(prop_id):
+        set_triggered(prop_id)
+        return module.update_marginal_histograms(columns[:8], 1, session_id)
+
+    select()
+    cases = [
+        (f"{prefix}.update_heatmap", lambda: module.update_heatmap(None)),
+        (f"{prefix}.update_scatter_plots_and_selection[open]", open_scatter),
+        (f"{prefix}.update_scatter_plots_and_selection[select]", select),
+        (f"{prefix}.update_marginal_histograms[columns]", lambda: histograms("histogram-columns.value")),
+        (f"{prefix}.update_marginal_histograms[select]", lambda: histograms("selection-version.data")),
+        (f"{prefix}.update_splom", lambda: module.update_splom(columns[:6])),
+    ]
+    if hasattr(module, "generate_vth_vs_vg_graph"):
+        for mode in ("auto", "summary", "box"):
+            cases.append((f"{prefix}.generate_vth_vs_vg_graph[{mode}]",
+                          lambda mode=mode: module.generate_vth_vs_vg_graph(1, session_id, mode)))
+    return cases
+
+def measured_cases(prefix, module, workdir):
+    columns = [col for col in module.heatmap_df.columns if col.startswith("VTH")]
+    # Plotly selectedData points: curveNumber is the (Type, Level) trace, x the Vg
+    traces = {key: i for i, key in enumerate(module.scatter_traces)}
+    points = []
+    for i, col in enumerate(columns[:50]):
+        vth_type, vg, level = parse_column_name(col) or (None, None, None)
+        if (vth_type, level) in traces:
+            points.append({"curveNumber": traces[(vth_type, level)], "pointNumber": i, "pointIndex": i, "x": vg, "y": 0.5})
+    click = {"points": [{"x": columns[0], "y": columns[1]}]}
+    # 0830_2 also takes the data version before the filter bar values
+    heatmap_args = () if hasattr(module, "update_scatter") else (1,)
+    cases = [
+        (f"{prefix}.update_heatmap", lambda: module.update_heatmap(*heatmap_args, None, None, None, None)),
+        (f"{prefix}.update_heatmap[filtered]", lambda: module.update_heatmap(*heatmap_args, ["VTH_W"], None, [1], None)),
+    ]
+
+    session_id = module.session_store.new_session()
+    if hasattr(module, "update_scatter"):
+        selected = selected_points_frame(points, module.scatter_traces, like=module.measured_df).to_dict("records")
+        cases += [
+            (f"{prefix}.update_scatter", lambda: module.update_scatter(click)),
+            (f"{prefix}.store_selected_data", lambda: module.store_selected_data({"points": points}, session_id)),
+            (f"{prefix}.update_selected_data_plot", lambda: module.update_selected_data_plot(selected)),
+        ]
+        return cases
+
+    module.session_store.set(session_id, "scatter_plots", [{"id": "scatter-plot-0", "x": columns[0], "y": columns[1]}])
+    module.session_store.set(session_id, "selected_points", selected_points_frame(points, module.scatter_traces, like=module.measured_df))
+
+    # 1% more rows appended to total_result.csv, then one watch-mode poll
+    with open(os.path.join(workdir, "total_result.csv")) as f:
+        lines = f.readlines()[1:]
+    appended = "".join(lines[:max(len(lines) // 100, 1)])
+
+    def append_and_poll():
+        with open("total_result.csv", "a") as f:
+            f.write(appended)
+        return module.poll_total_result(1, -1)
+
+    # 0830_2 only patches plots that already show an earlier data version: start each run from a new plot
+    def rebuild_scatter():
+        module.session_store.set(session_id, "scatter_plots", [{"id": "scatter-plot-0", "x": columns[0], "y": columns[1]}])
+        return module.update_scatter_figures(1, 0, session_id)
+
+    def store_selection():
+        set_triggered('{"index":"scatter-plot-0","type":"scatter"}.selectedData')
+        return module.store_selected_data([{"points": points}], session_id)
+
+    cases += [
+        (f"{prefix}.update_scatter_plots", lambda: module.update_scatter_plots(click, module.session_store.new_session())),
+        (f"{prefix}.update_scatter_figures", rebuild_scatter),
+        (f"{prefix}.store_selected_data", store_selection),
+        (f"{prefix}.update_selected_data_plot", lambda: module.update_selected_data_plot(1, session_id)),
+        (f"{prefix}.poll_total_result", append_and_poll),
+    ]
+    if hasattr(module, "scatter_patch"):
+        # One poll, then only the appended rows sent to the open plot
+        def append_and_patch():
+            append_and_poll()
+            return module.update_scatter_figures(1, module.data_version, session_id)
+
+        cases.append((f"{prefix}.poll_total_result[scatter_patch]", append_and_patch))
+    return cases
+
+def vtk_cases(module):
+    from vtp_mesh import read_vtp
+    default = module.mesh.default_field
+    lower, upper = module.mesh.field_range(default)
+    middle = (lower + upper) / 2
+
+    def update_field(prop_id, *args):
+        set_triggered(prop_id)
+        return module.update_field(default, *args)
+
+    return [
+        ("prep.read_vtp", lambda: read_vtp("hoge.vtp")),
+        ("show_vtp.update_field", lambda: update_field("field-selector.value", [middle, upper], "none", 0)),
+        ("show_vtp.update_field[threshold]", lambda: update_field("threshold-slider.value", [middle, upper], "none", 0)),
+        ("show_vtp.update_field[clip]", lambda: update_field("clip-position.value", [lower, upper], "x", 50)),
+    ]
+
+def run_case(name, func, repeat, workdir):
+    with working_directory(workdir):
+        try:
+            return measure(func, repeat)
+        except PreventUpdate:
+            return {"error": "PreventUpdate"}
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+def run_size(rows, args, tmp):
+    wide_dir = write_dataset(os.path.join(tmp, f"wide-{rows}"), rows, args.vg, args.levels, layout="wide")
+    long_dir = write_dataset(os.path.join(tmp, f"long-{rows}"), rows, args.vg, args.levels, layout="long")
+    vtp_dir = None
+    if args.vtp_resolution:
+        vtp_dir = os.path.join(tmp, f"vtp-{rows}")
+        os.makedirs(vtp_dir, exist_ok=True)
+        write_vtp(os.path.join(vtp_dir, "hoge.vtp"), args.vtp_resolution)
+
+    suites = [(prep_cases(rows, args.vg, args.levels), tmp)]
+    suites.append((data_layer_cases(os.path.join(tmp, f"snapshots-{rows}")), wide_dir))
+    database = write_database(os.path.join(tmp, f"results-{rows}.db"), rows, args.vg, args.levels)
+    suites.append((source_cases(os.path.join(wide_dir, "total_result.csv"), database), tmp))
+
+    dashboards = [
+        ("0721_dashboard.py", tmp, lambda m: crossfilter_cases("0721", m, make_col_frame(rows))),
+        ("0722_dashboard.py", tmp, lambda m: crossfilter_cases("0722", m, make_vthe_vthw_frame(rows, args.vg))),
+        ("0723_interactive_dashboard.py", long_dir, lambda m: crossfilter_cases("0723", m, make_vthe_vthw_frame(rows, args.vg))),
+        ("0830_new.py", wide_dir, lambda m: measured_cases("0830_new", m, wide_dir)),
+        ("0830_2.py", wide_dir, lambda m: measured_cases("0830_2", m, wide_dir)),
+    ]
+    if vtp_dir:
+        dashboards.append(("show_vtp.py", vtp_dir, vtk_cases))
+
+    for filename, workdir, make_cases in dashboards:
+        try:
+            module = load_script(filename, workdir)
+        except Exception as e:
+            print(f"  skipping {filename}: {type(e).__name__}: {e}")
+            continue
+        if filename.startswith("072"):
+            frame = make_col_frame(rows) if filename.startswith("0721") else make_vthe_vthw_frame(rows, args.vg)
+            rebind_sample_frame(module, frame)
+        suites.append((make_cases(module), workdir))
+
+    results = []
+    for cases, workdir in suites:
+        for name, func in cases:
+            if args.only and not any(pattern in name for pattern in args.only):
+                continue
+            result = {"case": name, "rows": rows, **run_case(name, func, args.repeat, workdir)}
+            results.append(result)
+            print(format_result(result))
+    return results
+
+def format_result(result):
+    if "error" in result:
+        return f"  {result['case']:<55} {result['rows']:>9}  {result['error']}"
+    return (f"  {result['case']:<55} {result['rows']:>9}  cold {result['cold_seconds'] * 1000:9.1f} ms"
+            f"  warm {result['warm_seconds'] * 1000:9.1f} ms  peak {result['peak_bytes'] / 2**20:8.1f} MiB")
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+# Print warm-time ratios against an earlier results file (>1 means slower now)
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = {(r["case"], r["rows"]): r for r in json.load(f)["results"]}
+    print(f"\ncompared with {previous_path}")
+    for result in results:
+        before = previous.get((result["case"], result["rows"]))
+        if before is None or "error" in before or "error" in result:
+            continue
+        ratio = result["warm_seconds"] / before["warm_seconds"] if before["warm_seconds"] else float("inf")
+        print(f"  {result['case']:<55} {result['rows']:>9}  x{ratio:6.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dashboard data preparation and callbacks on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--vg", type=int, default=18, help="Vg points per type/level")
+    parser.add_argument("--levels", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3, help="warm runs per case")
+    parser.add_argument("--vtp-resolution", type=int, default=200, help="sphere resolution of the synthetic .vtp, 0 to skip")
+    parser.add_argument("--only", nargs="*", help="run only cases whose name contains one of these")
+    parser.add_argument("--output", help="results file (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            print(f"rows={rows}")
+            results += run_size(rows, args, tmp)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"environment": environment(), "args": vars(args), "results": results}, f, indent=2)
+    print(f"\nresults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import re
+
+import numpy as np
+import pandas as pd
+from dash import Input, Output, dcc, html
+
+from column_schema import is_vth_column, parse_column_name
+
+# Fit coefficient columns from vth_fit: FIT_<type>.<level>_<coefficient>
+FIT_COLUMN = re.compile(r"FIT_(?P<type>.+)\.(?P<level>\d+)_[^_]+$")
+
+# Type / Vg / Level of every heatmap column, parsed once so that a filter is a few vectorized comparisons.
+# Fit columns have a Type and Level but no Vg; other columns only match the name pattern.
+class ColumnIndex:
+    def __init__(self, columns):
+        self.columns = pd.Index(columns)
+        types, vgs, levels = [], [], []
+        for col in self.columns:
+            if is_vth_column(col):
+                vth_type, vg, level = parse_column_name(col)
+            elif (match := FIT_COLUMN.match(col)):
+                vth_type, vg, level = match["type"], np.nan, int(match["level"])
+            else:
+                vth_type, vg, level = None, np.nan, -1
+            types.append(vth_type)
+            vgs.append(vg)
+            levels.append(level)
+        self.types = np.array(types, dtype=object)
+        self.vgs = np.array(vgs, dtype=float)
+        self.levels = np.array(levels)
+
+    def type_options(self):
+        return sorted(t for t in set(self.types) if t is not None)
+
+    def level_options(self):
+        return sorted(int(level) for level in set(self.levels) if level >= 0)
+
+    def vg_bounds(self):
+        if np.isnan(self.vgs).all():
+            return 0.0, 0.0
+        return float(np.nanmin(self.vgs)), float(np.nanmax(self.vgs))
+
+    # Positions of the matching columns, in their original order. A Vg range only filters when it is
+    # narrower than the full range (columns without a Vg are dropped then). Invalid regexes match literally.
+    def select(self, types=None, vg_range=None, levels=None, pattern=None):
+        keep = np.ones(len(self.columns), dtype=bool)
+        if types:
+            keep &= np.isin(self.types, list(types))
+        if levels:
+            keep &= np.isin(self.levels, list(levels))
+        if vg_range is not None:
+            lower, upper = vg_range
+            vg_min, vg_max = self.vg_bounds()
+            if lower > vg_min or upper < vg_max:
+                keep &= (self.vgs >= lower) & (self.vgs <= upper)
+        if pattern:
+            try:
+                regex = re.compile(pattern, re.IGNORECASE)
+            except re.error:
+                regex = re.compile(re.escape(pattern), re.IGNORECASE)
+            keep &= np.fromiter((regex.search(col) is not None for col in self.columns), dtype=bool, count=len(keep))
+        return np.flatnonzero(keep)
+
+# Rows and columns of a cached correlation matrix for the selected columns, without recomputing it
+def sub_matrix(corr_df, index, types=None, vg_range=None, levels=None, pattern=None):
+    positions = index.select(types, vg_range, levels, pattern)
+    return corr_df.iloc[positions, positions]
+
+# Type / Vg range / Level / name pattern controls; component ids are prefixed so that several bars can coexist
+def create_filter_bar(index, prefix=""):
+    vg_min, vg_max = index.vg_bounds()
+    return html.Div([
+        html.Div([
+            html.Label("Type"),
+            dcc.Dropdown(id=f"{prefix}filter-type", options=index.type_options(), multi=True),
+        ], style={"width": "20%", "display": "inline-block", "verticalAlign": "top"}),
+        html.Div([
+            html.Label("Vg"),
+            dcc.RangeSlider(
+                id=f"{prefix}filter-vg", min=vg_min, max=vg_max, value=[vg_min, vg_max],
+                marks=None, tooltip={"placement": "bottom"},
+            ),
+        ], style={"width": "30%", "display": "inline-block", "verticalAlign": "top"}),
+        html.Div([
+            html.Label("Level"),
+            dcc.Dropdown(id=f"{prefix}filter-level", options=index.level_options(), multi=True),
+        ], style={"width": "20%", "display": "inline-block", "verticalAlign": "top"}),
+        html.Div([
+            html.Label("Name"),
+            dcc.Input(id=f"{prefix}filter-pattern", type="text", placeholder="regex", debounce=True),
+        ], style={"width": "25%", "display": "inline-block", "verticalAlign": "top"}),
+    ])
+
+# Values for filter_option_outputs when the columns change (live data): type options, Vg bounds and range,
+# level options. A Vg range that spanned the previous bounds is widened to the new ones, a narrower one is kept.
+def filter_options(index, vg_value=None, previous_bounds=None):
+    vg_min, vg_max = index.vg_bounds()
+    if vg_value is None or list(vg_value) == list(previous_bounds or ()):
+        vg_value = [vg_min, vg_max]
+    return index.type_options(), vg_min, vg_max, vg_value, index.level_options()
+
+def filter_option_outputs(prefix=""):
+    return [
+        Output(f"{prefix}filter-type", "options"),
+        Output(f"{prefix}filter-vg", "min"),
+        Output(f"{prefix}filter-vg", "max"),
+        Output(f"{prefix}filter-vg", "value"),
+        Output(f"{prefix}filter-level", "options"),
+    ]
+
+# Callback inputs of a filter bar, in the order sub_matrix takes them
+def filter_inputs(prefix=""):
+    return [
+        Input(f"{prefix}filter-type", "value"),
+        Input(f"{prefix}filter-vg", "value"),
+        Input(f"{prefix}filter-level", "value"),
+        Input(f"{prefix}filter-pattern", "value"),
+    ]
@@ -0,0 +1,34 @@
+import pandas as pd
+
+# Parse "VTH_<type>_<vg>.<level>" (or "VTHE_<vg>") column names into (type, vg, level).
+# None for anything else, including "VTH..." names that don't follow the pattern.
+def parse_column_name(col):
+    if not isinstance(col, str) or not col.startswith('VTH') or '_' not in col:
+        return None
+    vth_type, value = col.rsplit('_', 1)
+    vg, _, level = value.partition('.')
+    try:
+        return vth_type, float(vg), int(level) if level else 0
+    except ValueError:
+        return None
+
+def is_vth_column(col):
+    return parse_column_name(col) is not None
+
+# One row per VTH column with its parsed Type / Vg / Level
+def column_metadata(columns):
+    rows = [(col, *parse_column_name(col)) for col in columns if is_vth_column(col)]
+    return pd.DataFrame(rows, columns=['column', 'Type', 'Vg', 'Level'])
+
+# Order-independent description of a file's columns, used to check that files can be concatenated.
+# VTH columns are compared by their parsed (Type, Vg, Level) rather than by spelling.
+def schema_signature(columns):
+    other = tuple(sorted(col for col in columns if not is_vth_column(col)))
+    vth = frozenset(parse_column_name(col) for col in columns if is_vth_column(col))
+    return other, vth
+
+# Human readable difference between two schema signatures
+def describe_schema_difference(expected, actual):
+    missing = sorted(map(str, (set(expected[0]) - set(actual[0])) | (expected[1] - actual[1])))
+    extra = sorted(map(str, (set(actual[0]) - set(expected[0])) | (actual[1] - expected[1])))
+    return f"missing {missing}, unexpected {extra}"
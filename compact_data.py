@@ -0,0 +1,135 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from session_store import estimate_size
+
+MEASUREMENT_DTYPE = np.float32
+
+# Axis and key columns stay float64: they are joined and filtered on by value (measured_df["Vg"] == vg) and
+# shown as axis labels, where float32 would turn 0.1 into 0.10000000149
+KEY_COLUMNS = frozenset({"Vg", "Vd", "X", "Y"})
+
+# Strings with at most this share of distinct values become categoricals
+CATEGORY_RATIO = 0.5
+
+# Optional per-worker limit; the memory report flags structures once the total goes over it
+MEMORY_BUDGET_BYTES = int(float(os.environ.get("DASH_MEMORY_BUDGET_MB", "0")) * 2**20) or None
+
+def _compact_column(series, category_ratio):
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series.astype(MEASUREMENT_DTYPE)
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+        if series.nunique(dropna=True) <= max(len(series) * category_ratio, 1):
+            return series.astype("category")
+    return series
+
+# Measurement columns as float32 (except KEY_COLUMNS), integers downcast, repeated labels (Type, Lot, ...) as
+# categoricals. Level columns are small integers and end up as int8. The input frame is left untouched.
+def compact_frame(df, category_ratio=CATEGORY_RATIO, keep=KEY_COLUMNS):
+    columns = {
+        col: df[col] if col in keep and pd.api.types.is_float_dtype(df[col].dtype) else _compact_column(df[col], category_ratio)
+        for col in df.columns
+    }
+    return pd.DataFrame(columns, index=compact_index(df.index))
+
+# Batches compacted one at a time each get categoricals of their own values (or none), and concatenating those
+# falls back to object. Recodes the columns of new that are categorical in batches to the same dtypes (categories
+# already seen first, new ones appended); earlier batches are only recoded when new brings a category they lack.
+def share_categories(batches, new):
+    if not batches:
+        return batches, new
+    first = batches[0]
+    for col in new.columns:
+        dtype = first[col].dtype if col in first.columns else None
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        values = new[col]
+        seen = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else pd.Index(values.dropna().unique())
+        added = seen.difference(dtype.categories)
+        if len(added):
+            dtype = pd.CategoricalDtype(dtype.categories.append(added), ordered=dtype.ordered)
+            batches = [batch.assign(**{col: batch[col].astype(dtype)}) for batch in batches]
+        new = new.assign(**{col: new[col].astype(dtype)})
+    return batches, new
+
+# RangeIndex costs nothing; other integer indexes are downcast
+def compact_index(index):
+    if isinstance(index, pd.RangeIndex) or not pd.api.types.is_integer_dtype(index.dtype):
+        return index
+    return pd.Index(pd.to_numeric(index, downcast="integer"), name=index.name)
+
+# int32 device ids: integer labels are kept, anything else (e.g. "<lot>_<wafer>_<die>") is factorized
+def device_codes(index):
+    values = index.to_numpy()
+    if pd.api.types.is_integer_dtype(values.dtype) and (len(values) == 0 or np.abs(values).max() < 2**31):
+        return values.astype(np.int32, copy=False)
+    return pd.factorize(values)[0].astype(np.int32)
+
+# Size of one derived structure: frames, arrays and containers through estimate_size,
+# other objects (BinIndex, OnlineCorrelation, ...) by the arrays and frames they hold
+def structure_bytes(value):
+    if isinstance(value, (np.ndarray, pd.DataFrame, pd.Series, dict, list, tuple, set)):
+        return estimate_size(value)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + sum(structure_bytes(v) for v in vars(value).values())
+    return estimate_size(value)
+
+def _describe(value):
+    if isinstance(value, pd.DataFrame):
+        dtypes = value.dtypes.astype(str).value_counts()
+        return value.shape, ", ".join(f"{count} {dtype}" for dtype, count in dtypes.items())
+    if isinstance(value, (np.ndarray, pd.Series)):
+        return value.shape, str(value.dtype)
+    return None, type(value).__name__
+
+# One row per named structure with its shape, dtypes and estimated bytes, largest first.
+# structures: {name: object or zero-argument callable returning it}; None (not built yet) is skipped
+def memory_report(structures, budget_bytes=MEMORY_BUDGET_BYTES):
+    rows = []
+    for name, value in structures.items():
+        if callable(value) and not isinstance(value, (pd.DataFrame, pd.Series)):
+            value = value()
+        if value is None:  # not built yet
+            continue
+        shape, dtypes = _describe(value)
+        rows.append({"structure": name, "shape": shape, "dtypes": dtypes, "bytes": structure_bytes(value)})
+    report = pd.DataFrame(rows, columns=["structure", "shape", "dtypes", "bytes"])
+    report = report.sort_values("bytes", ascending=False, ignore_index=True)
+    report["cumulative_bytes"] = report["bytes"].cumsum()
+    report["over_budget"] = report["cumulative_bytes"] > budget_bytes if budget_bytes else False
+    return report
+
+def format_memory_report(report, budget_bytes=MEMORY_BUDGET_BYTES):
+    lines = []
+    for row in report.itertuples():
+        flag = "  OVER BUDGET" if row.over_budget else ""
+        lines.append(f"  {row.structure:<30} {str(row.shape):>16}  {row.bytes / 2**20:10.1f} MiB  {row.dtypes}{flag}")
+    total = report["bytes"].sum()
+    budget = f" of {budget_bytes / 2**20:.0f} MiB budget" if budget_bytes else ""
+    lines.append(f"  {'total':<30} {'':>16}  {total / 2**20:10.1f} MiB{budget}")
+    return "\n".join(lines)
+
+# Before/after memory of the CSV files the dashboards read
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory of the dashboard input files before and after compaction")
+    parser.add_argument("files", nargs="*", default=["total_result.csv", "measured_data.csv"])
+    parser.add_argument("--budget-mb", type=float, help="per-worker memory limit (default: $DASH_MEMORY_BUDGET_MB)")
+    args = parser.parse_args(argv)
+    budget = int(args.budget_mb * 2**20) if args.budget_mb else MEMORY_BUDGET_BYTES
+
+    raw = {os.path.basename(path): pd.read_csv(path) for path in args.files}
+    compact = {name: compact_frame(df) for name, df in raw.items()}
+    for title, structures in (("as read", raw), ("compact", compact)):
+        print(title)
+        print(format_memory_report(memory_report(structures, budget), budget))
+
+if __name__ == "__main__":
+    sys.exit(main())
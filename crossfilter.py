@@ -0,0 +1,101 @@
+import math
+
+import numpy as np
+import plotly.graph_objs as go
+from dash import Patch
+from plotly.subplots import make_subplots
+
+N_BINS = 30
+HISTOGRAMS_PER_ROW = 4
+
+# Bin number of every value of every numeric column, computed once at load time.
+# Recounting a histogram under a new selection is then a single bincount over a small int array.
+class BinIndex:
+    def __init__(self, df, bins=N_BINS):
+        numeric = df.select_dtypes("number")
+        values = numeric.to_numpy(dtype=float).T
+        lo = np.nanmin(values, axis=1, keepdims=True)
+        hi = np.nanmax(values, axis=1, keepdims=True)
+        width = np.where(hi > lo, (hi - lo) / bins, 1.0)
+
+        codes = np.clip(np.floor((values - lo) / width), 0, bins - 1)
+        codes[np.isnan(values)] = bins  # missing values go to an extra bin that is never drawn
+        self.codes = codes.astype(np.uint8 if bins < 255 else np.uint16)
+        self.edges = lo + width * np.arange(bins + 1)
+        self.positions = {col: i for i, col in enumerate(numeric.columns)}
+        self.bins = bins
+        self._totals = {}
+        self.thumbnails = {}  # (x column, y column) -> density thumbnail, filled by splom.pair_thumbnail
+
+    def __contains__(self, column):
+        return column in self.positions
+
+    # rows: integer row positions of the selection (np.flatnonzero(mask)); None counts every row.
+    # take() with positions is several times faster than boolean indexing on wide frames.
+    def counts(self, column, rows=None):
+        if rows is None:
+            if column not in self._totals:
+                self._totals[column] = self._count(self.codes[self.positions[column]])
+            return self._totals[column]
+        return self._count(self.codes[self.positions[column]].take(rows))
+
+    def _count(self, codes):
+        return np.bincount(codes, minlength=self.bins + 1)[:self.bins]
+
+    def centers(self, column):
+        edges = self.edges[self.positions[column]]
+        return (edges[:-1] + edges[1:]) / 2
+
+# Boolean row mask for the intersection of all non-empty box/lasso selections, or None when nothing is selected.
+# Points whose customdata is not in the index (e.g. from a figure of earlier data) select nothing.
+def selection_mask(index, selectedDataList):
+    mask = None
+    for selected_data in selectedDataList:
+        if selected_data and selected_data["points"]:
+            positions = index.get_indexer([p.get("customdata") for p in selected_data["points"]])
+            selected = np.zeros(len(index), dtype=bool)
+            selected[positions[positions >= 0]] = True  # -1: an id that is not (or no longer) in the index
+            mask = selected if mask is None else mask & selected
+    return mask
+
+SELECTION_COLOR = "rgba(0, 116, 217, 0.7)"
+
+def _selection_counts(bin_index, col, rows):
+    return bin_index.counts(col, rows) if rows is not None else np.zeros(bin_index.bins, dtype=np.int64)
+
+# All histograms in one figure: full distribution in grey, current selection on top.
+# Every column has both bars (trace 2*i and 2*i+1); the selection bar is hidden while nothing is selected,
+# so that a new selection only has to replace its heights (histogram_selection_patch).
+def create_histogram_figure(bin_index, columns, mask=None):
+    columns = [col for col in columns if col in bin_index]
+    n_rows = max(math.ceil(len(columns) / HISTOGRAMS_PER_ROW), 1)
+    fig = make_subplots(rows=n_rows, cols=HISTOGRAMS_PER_ROW, subplot_titles=columns)
+    rows = None if mask is None else np.flatnonzero(mask)
+    for i, col in enumerate(columns):
+        row, col_number = divmod(i, HISTOGRAMS_PER_ROW)
+        centers = bin_index.centers(col)
+        fig.add_trace(go.Bar(x=centers, y=bin_index.counts(col), marker_color="rgba(150, 150, 150, 0.5)"),
+                      row=row + 1, col=col_number + 1)
+        fig.add_trace(go.Bar(x=centers, y=_selection_counts(bin_index, col, rows), marker_color=SELECTION_COLOR,
+                             visible=rows is not None),
+                      row=row + 1, col=col_number + 1)
+    fig.update_layout(
+        barmode="overlay",
+        bargap=0,
+        showlegend=False,
+        height=200 * n_rows,
+        margin={"l": 20, "r": 20, "b": 20, "t": 40},
+    )
+    return fig
+
+# Partial update of a figure built by create_histogram_figure for the same columns: only the selection bars change.
+# Building the subplots again costs far more than the bincounts (about 0.2 s for 8 columns).
+def histogram_selection_patch(bin_index, columns, mask=None):
+    columns = [col for col in columns if col in bin_index]
+    rows = None if mask is None else np.flatnonzero(mask)
+    patch = Patch()
+    for i, col in enumerate(columns):
+        if rows is not None:
+            patch["data"][2 * i + 1]["y"] = bin_index.counts(col, rows)
+        patch["data"][2 * i + 1]["visible"] = rows is not None
+    return patch
@@ -0,0 +1,198 @@
+import os
+import threading
+
+from column_filter import ColumnIndex
+from column_schema import column_metadata
+from compact_data import compact_frame
+from crossfilter import BinIndex
+from data_source import get_source
+from dataset_loader import file_signature
+from live_tail import OnlineCorrelation, numeric_columns
+from outliers import OutlierMask
+from result_cache import ResultCache, selection_key
+from session_store import SessionStore
+from snapshot import SNAPSHOT_DIR, Snapshot, module_file
+from vth_fit import fit_vth_curves
+from vth_summary import summarize_vth_vs_vg, wide_to_long
+
+# Inputs of the unified app (app.py): CSV files, a directory or glob of per-lot CSVs for DASH_TOTAL_SOURCE,
+# or database tables such as "sqlite:///results.db?table=total_result" (see data_source.open_source).
+# DASH_TOTAL_LOT restricts the app to one lot; with a database only that lot's rows are read.
+# DASH_VTP_SOURCE is the mesh of the VTK viewer page.
+TOTAL_SOURCE = os.environ.get("DASH_TOTAL_SOURCE", "total_result.csv")
+MEASURED_SOURCE = os.environ.get("DASH_MEASURED_SOURCE", "measured_data.csv")
+VTP_SOURCE = os.environ.get("DASH_VTP_SOURCE", "hoge.vtp")
+TOTAL_LOT = os.environ.get("DASH_TOTAL_LOT") or None
+
+STRUCTURES = (
+    "total_df", "measured_df", "correlation", "heatmap_df", "inlier_heatmap_df", "bin_index", "outliers",
+    "column_meta", "column_index", "vth_summary",
+)
+
+# A snapshot is also invalidated when the code that builds it changes
+BUILD_MODULES = (
+    "data_layer", "column_filter", "column_schema", "compact_data", "crossfilter", "data_source", "dataset_loader",
+    "live_tail", "outliers", "vth_fit", "vth_summary",
+)
+
+# Data shared by every page of app.py. Each structure is built on first use and kept for the life of the
+# process, so nothing is read at import time (with the spawn start method LotDataset workers re-import app.py).
+# With a snapshot directory (DASH_SNAPSHOT_DIR, empty to disable) a structure built from the same sources by
+# an earlier run is memory-mapped from disk instead of rebuilt, and a newly built one is saved there.
+class DataLayer:
+    def __init__(self, total_source=TOTAL_SOURCE, measured_source=MEASURED_SOURCE, snapshot_dir=SNAPSHOT_DIR, lot=TOTAL_LOT,
+                 vtp_source=VTP_SOURCE):
+        self.total_source = total_source
+        self.measured_source = measured_source
+        self.vtp_source = vtp_source
+        self.lot = lot
+        self.total_filters = None if lot is None else [("Lot", "==", lot)]
+        if snapshot_dir and lot is not None:
+            snapshot_dir = os.path.join(snapshot_dir, f"lot-{lot}")
+        self.snapshot = Snapshot(snapshot_dir) if snapshot_dir else None
+        if self.snapshot is not None:
+            self.snapshot.remove_stale()
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name, build, sources=None):
+        with self._lock:
+            if name not in self._values:
+                if sources is None:
+                    sources = self.total.files()
+                self._values[name] = self._attach(name, build, sources)
+            return self._values[name]
+
+    def _attach(self, name, build, sources):
+        if self.snapshot is None or name not in STRUCTURES:
+            return build()
+        sources = [*sources, *(module_file(module) for module in BUILD_MODULES)]
+        value = self.snapshot.load(name, sources)
+        if value is None:
+            value = build()
+            self.snapshot.save(name, value, sources)
+        return value
+
+    # Shared per process with anything else reading the same source (one connection pool per database)
+    @property
+    def total(self):
+        return get_source(self.total_source, "total_result")
+
+    @property
+    def measured(self):
+        return get_source(self.measured_source, "measured_data")
+
+    def _load_total(self):
+        df = compact_frame(self.total.read(filters=self.total_filters))
+        # Per-device VTH vs Vg fit coefficients, selectable in the heatmaps like any other column
+        return df.join(compact_frame(fit_vth_curves(df)))
+
+    @property
+    def total_df(self):
+        return self._get("total_df", self._load_total)
+
+    @property
+    def measured_df(self):
+        return self._get("measured_df", lambda: compact_frame(self.measured.read()), self.measured.files())
+
+    @property
+    def column_meta(self):
+        return self._get("column_meta", lambda: column_metadata(self.total_df.columns))
+
+    # Mean / co-moment of every numeric column, kept so that correlations over subsets need no re-scan
+    @property
+    def correlation(self):
+        def build():
+            correlation = OnlineCorrelation(numeric_columns(self.total_df))
+            correlation.update(self.total_df)
+            return correlation
+        return self._get("correlation", build)
+
+    @property
+    def heatmap_df(self):
+        return self._get("heatmap_df", lambda: self.correlation.corr())
+
+    # Median / MAD flags of every value, computed once
+    @property
+    def outliers(self):
+        return self._get("outliers", lambda: OutlierMask(self.total_df))
+
+    # Correlation without the flagged devices: their contribution is subtracted from the cached statistics
+    @property
+    def inlier_heatmap_df(self):
+        return self._get("inlier_heatmap_df", lambda: self.correlation.without(self.total_df[self.outliers.rows]).corr())
+
+    # Type / Vg / Level of each heatmap column, for the filter bars
+    @property
+    def column_index(self):
+        return self._get("column_index", lambda: ColumnIndex(self.heatmap_df.columns))
+
+    @property
+    def bin_index(self):
+        return self._get("bin_index", lambda: BinIndex(self.total_df))
+
+    # (Type, Vg) statistics over every device, shown while nothing is selected
+    @property
+    def vth_summary(self):
+        return self._get("vth_summary", lambda: summarize_vth_vs_vg(wide_to_long(self.total_df)))
+
+    # Long tables and summaries of selections, shared by every page and session. Bounded by size, and tied to
+    # total_df: entries built from an earlier frame are dropped when it is reloaded.
+    @property
+    def selection_cache(self):
+        return self._get("selection_cache", ResultCache, sources=())
+
+    # Long table of the selected devices (row labels of total_df)
+    def selection_long(self, rows):
+        df = self.total_df
+        return self.selection_cache.get(("long", selection_key(rows)), lambda: wide_to_long(df, rows=rows), data=df)
+
+    # (Type, Vg) statistics of the selected devices (None: all of them), optionally of one Level only
+    def selection_summary(self, rows=None, level=None):
+        if rows is None and level is None:
+            return self.vth_summary
+        def build():
+            long_df = wide_to_long(self.total_df) if rows is None else self.selection_long(rows)
+            return summarize_vth_vs_vg(long_df if level is None else long_df[long_df["Level"] == level])
+        key = ("summary", None if rows is None else selection_key(rows), level)
+        return self.selection_cache.get(key, build, data=self.total_df)
+
+    # Measured VTH vs Vg of one Type / Level: only these two columns and rows are read from the source.
+    # Bounded like the selection cache; keyed by the source files' mtime / size, so rewritten files are read again.
+    @property
+    def measured_cache(self):
+        return self._get("measured_cache", ResultCache, sources=())
+
+    def measured_vth(self, vth_type, level):
+        source = self.measured
+        key = (vth_type, level, tuple(file_signature(path) for path in source.files()))
+        return self.measured_cache.get(key, lambda: source.read(["Vg", "VTH"], [("Type", "==", vth_type), ("Level", "==", level)]))
+
+    # Mesh, filters and layout of the VTK viewer; vtk is only imported on first use
+    @property
+    def vtp(self):
+        def load():
+            from vtp_mesh import VtpMesh
+            return VtpMesh(self.vtp_source)
+        return self._get("vtp", load, sources=())
+
+    def loaded(self, name):
+        return self._values.get(name)
+
+    # For instrument_app(structures=...): reports only what has been built
+    def structures(self):
+        return {name: (lambda name=name: self.loaded(name)) for name in STRUCTURES}
+
+# Per-session state (selections) of every page
+session_store = SessionStore()
+
+_layer = None
+_layer_lock = threading.Lock()
+
+def get_data_layer():
+    global _layer
+    with _layer_lock:
+        if _layer is None:
+            _layer = DataLayer()
+        return _layer
+
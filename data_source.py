@@ -0,0 +1,306 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from dataset_loader import LotDataset, expand_source, lot_wafer_key
+
+try:
+    import duckdb
+except ImportError:  # DuckDB sources are optional
+    duckdb = None
+
+POOL_SIZE = int(os.environ.get("DASH_SOURCE_POOL_SIZE", "4"))
+
+# Predicates are (column, op, value) tuples, combined with AND
+OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in", "not in")
+SQL_OPERATORS = {"==": "=", "!=": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">=", "in": "IN", "not in": "NOT IN"}
+
+def _check_filters(filters):
+    for column, op, _ in filters or ():
+        if op not in OPERATORS:
+            raise ValueError(f"unsupported operator {op!r} for column {column!r}")
+
+# Rows of df matching every predicate; the fallback for sources that cannot evaluate them themselves
+def apply_filters(df, filters):
+    if not filters:
+        return df
+    keep = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        values = df[column]
+        if op == "in":
+            keep &= values.isin(list(value))
+        elif op == "not in":
+            keep &= ~values.isin(list(value))
+        else:
+            keep &= {
+                "==": values.__eq__, "!=": values.__ne__, "<": values.__lt__,
+                "<=": values.__le__, ">": values.__gt__, ">=": values.__ge__,
+            }[op](value)
+    return df[keep.to_numpy()]
+
+# Where the dashboards read a table from. read() returns only the requested columns (all by default) of the
+# rows matching the predicates; files() lists what the data comes from, for snapshot validation.
+class DataSource(ABC):
+    @abstractmethod
+    def files(self):
+        ...
+
+    @abstractmethod
+    def columns(self):
+        ...
+
+    @abstractmethod
+    def read(self, columns=None, filters=None):
+        ...
+
+    # For async callbacks: the read runs in a worker thread (with a pooled connection), the event loop keeps serving
+    async def read_async(self, columns=None, filters=None):
+        return await asyncio.to_thread(self.read, columns, filters)
+
+    def close(self):
+        pass
+
+# Columns a LotDataset takes from the file names rather than their contents
+KEY_COLUMNS = ("Lot", "Wafer")
+
+# A CSV file, or a directory / glob of per-lot CSVs (LotDataset). A single file is read with usecols,
+# predicates are evaluated after parsing; it has no Lot / Wafer unless they are columns of the file, so a
+# column it does not have is rejected up front (KeyError, as SqlSource does). For a dataset, predicates on Lot / Wafer are first evaluated
+# against the file names (lot_wafer_key), so files of other lots are not parsed at all. Files whose names
+# have no key may hold any lot, so they are always parsed.
+class CsvSource(DataSource):
+    def __init__(self, path):
+        self.path = path
+        self.dataset = None if os.path.isfile(path) else LotDataset(path)
+
+    def files(self):
+        return [self.path] if self.dataset is None else expand_source(self.path)
+
+    def columns(self):
+        if self.dataset is None:
+            return pd.read_csv(self.path, nrows=0).columns.tolist()
+        return self.dataset.reload(self.files()[:1]).columns.tolist()
+
+    # Files of the dataset whose Lot / Wafer can match the predicates
+    def _matching_files(self, filters):
+        paths = self.files()
+        key_filters = [predicate for predicate in filters or () if predicate[0] in KEY_COLUMNS]
+        if not key_filters:
+            return paths
+        keys = {path: lot_wafer_key(path) for path in paths}
+        keyed = [path for path in paths if keys[path] is not None]
+        frame = pd.DataFrame([keys[path] for path in keyed], columns=list(KEY_COLUMNS))
+        matching = {keyed[i] for i in apply_filters(frame, key_filters).index}
+        return [path for path in paths if keys[path] is None or path in matching]
+
+    def read(self, columns=None, filters=None):
+        _check_filters(filters)
+        needed = None if columns is None else list(dict.fromkeys([*columns, *(column for column, _, _ in filters or ())]))
+        if self.dataset is None:
+            available = set(self.columns())
+            for column in [*(columns or ()), *(column for column, _, _ in filters or ())]:
+                if column not in available:
+                    raise KeyError(f"{self.path} has no column {column!r}")
+            df = pd.read_csv(self.path, usecols=needed)
+        else:
+            paths = self._matching_files(filters)
+            # No file of the requested lots: no rows, with the columns of the dataset
+            df = self.dataset.reload(paths) if paths else self.dataset.reload(self.files()[:1]).iloc[:0]
+            df = df if needed is None else df[needed]
+        df = apply_filters(df, filters)
+        return df if columns is None else df[list(columns)]
+
+# numpy scalars (e.g. a Level from a DataFrame) are not accepted as query parameters
+def _param(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+# Up to size connections, opened on demand and shared by every thread (callbacks of all sessions).
+# close() closes the idle connections at once and the checked-out ones when they are released.
+class ConnectionPool:
+    _CLOSED = None  # queued by close(): wakes the threads waiting for a connection
+
+    def __init__(self, connect, size=POOL_SIZE):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _take(self, block):
+        connection = self._idle.get(block=block)
+        if connection is self._CLOSED:
+            self._idle.put(self._CLOSED)
+            raise RuntimeError("the connection pool is closed")
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self._take(block=False)
+        except queue.Empty:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("the connection pool is closed")
+                opened = self._opened < self.size
+                if opened:
+                    self._opened += 1
+            if opened:
+                try:
+                    connection = self.connect()
+                except BaseException:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                connection = self._take(block=True)
+        try:
+            yield connection
+        finally:
+            self._release(connection)
+
+    def _release(self, connection):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(connection)
+                return
+            self._opened -= 1
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            while True:
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                connection.close()
+                self._opened -= 1
+            self._idle.put(self._CLOSED)
+
+# A table of a database file, read with SELECT <columns> FROM <table> WHERE <predicates>.
+# Column names are checked against the table before they are quoted into the statement; values are parameters.
+class SqlSource(DataSource):
+    def __init__(self, path, table, pool_size=POOL_SIZE):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.table = table
+        self.pool = ConnectionPool(self._connect, pool_size)
+        self._columns = None
+
+    @abstractmethod
+    def _connect(self):
+        ...
+
+    @abstractmethod
+    def _fetch(self, connection, sql, params):
+        ...
+
+    @staticmethod
+    def _quote(name):
+        return '"' + name.replace('"', '""') + '"'
+
+    def files(self):
+        return [self.path]
+
+    def columns(self):
+        if self._columns is None:
+            with self.pool.connection() as connection:
+                cursor = connection.execute(f"SELECT * FROM {self._quote(self.table)} LIMIT 0")
+                self._columns = [description[0] for description in cursor.description]
+        return self._columns
+
+    def _checked(self, column):
+        if column not in self.columns():
+            raise KeyError(f"{self.table} has no column {column!r}")
+        return self._quote(column)
+
+    def query(self, columns=None, filters=None):
+        _check_filters(filters)
+        projection = "*" if columns is None else ", ".join(self._checked(column) for column in columns)
+        sql = f"SELECT {projection} FROM {self._quote(self.table)}"
+        conditions, params = [], []
+        for column, op, value in filters or ():
+            if op in ("in", "not in"):
+                value = list(value)
+                if not value:
+                    conditions.append("1 = 0" if op == "in" else "1 = 1")
+                    continue
+                conditions.append(f"{self._checked(column)} {SQL_OPERATORS[op]} ({', '.join('?' * len(value))})")
+                params.extend(map(_param, value))
+            else:
+                conditions.append(f"{self._checked(column)} {SQL_OPERATORS[op]} ?")
+                params.append(_param(value))
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql, params
+
+    def read(self, columns=None, filters=None):
+        sql, params = self.query(columns, filters)
+        with self.pool.connection() as connection:
+            return self._fetch(connection, sql, params)
+
+    def close(self):
+        self.pool.close()
+
+class SqliteSource(SqlSource):
+    # Read-only; check_same_thread is off because pooled connections move between callback threads
+    def _connect(self):
+        uri = "file:" + os.path.abspath(self.path) + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    def _fetch(self, connection, sql, params):
+        return pd.read_sql_query(sql, connection, params=params)
+
+class DuckDbSource(SqlSource):
+    def __init__(self, path, table, pool_size=POOL_SIZE):
+        if duckdb is None:
+            raise ImportError("duckdb is required for duckdb:// sources")
+        super().__init__(path, table, pool_size)
+
+    def _connect(self):
+        return duckdb.connect(self.path, read_only=True)
+
+    def _fetch(self, connection, sql, params):
+        return connection.execute(sql, params).df()
+
+# URI scheme -> DataSource class taking (path, table); register_source adds another backend
+SOURCE_TYPES = {"sqlite": SqliteSource, "duckdb": DuckDbSource}
+
+def register_source(scheme, source_type):
+    SOURCE_TYPES[scheme] = source_type
+
+# "sqlite:///results.db?table=total_result" (relative path; sqlite:////abs/results.db for an absolute one),
+# "duckdb:///results.duckdb?table=total_result", or a CSV path / directory / glob.
+# The table defaults to the given name (the CSV file name it replaces, e.g. "total_result").
+def open_source(uri, default_table=None):
+    parts = urlsplit(uri)
+    if parts.scheme not in SOURCE_TYPES:
+        return CsvSource(uri)
+    table = parse_qs(parts.query).get("table", [default_table])[0]
+    if table is None:
+        raise ValueError(f"{uri}: no table given")
+    return SOURCE_TYPES[parts.scheme](parts.netloc + parts.path[1:], table)
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+# One source (and so one connection pool) per URI for the whole process
+def get_source(uri, default_table=None):
+    key = (uri, default_table)
+    with _sources_lock:
+        if key not in _sources:
+            _sources[key] = open_source(uri, default_table)
+        return _sources[key]
@@ -0,0 +1,125 @@
+import glob
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from column_schema import describe_schema_difference, is_vth_column, parse_column_name, schema_signature
+
+# "<lot>_<wafer>[_anything].csv" -> lot / wafer key, where the wafer is a number with an optional W prefix
+# ("LOT03_W07.csv", "A1234_12_vth.csv"). Other names (e.g. "total_result.csv") have no key.
+LOT_WAFER_PATTERN = re.compile(r"(?P<lot>[A-Za-z0-9.-]+)_(?P<wafer>[Ww]?\d+)(?:_.*)?")
+
+# Directory -> every *.csv in it, otherwise treat the source as a glob pattern
+def expand_source(source):
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.csv")
+    return sorted(glob.glob(source))
+
+# (lot, wafer) of a file, None when its name does not follow LOT_WAFER_PATTERN
+def lot_wafer_key(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = LOT_WAFER_PATTERN.fullmatch(stem)
+    if match is None:
+        return None
+    return match.group("lot"), match.group("wafer")
+
+# Cheap change detection without reading the file
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+# Runs in a worker process: parse one file and tag the rows with their lot / wafer.
+# The file name is the key, so Lot / Wafer columns already in the file are replaced; a file whose name has
+# no key keeps its own Lot / Wafer columns (missing values if it has none).
+def parse_file(path):
+    df = pd.read_csv(path)
+    key = lot_wafer_key(path)
+    if key is None:
+        lot = df.pop("Lot") if "Lot" in df else None
+        wafer = df.pop("Wafer") if "Wafer" in df else None
+    else:
+        df = df.drop(columns=["Lot", "Wafer"], errors="ignore")
+        lot, wafer = key
+    df.insert(0, "Lot", lot)
+    df.insert(1, "Wafer", wafer)
+    return df
+
+# Many per-lot / per-wafer result files loaded as one DataFrame.
+# Files are parsed in parallel across a process pool; reload() only re-parses
+# files that are new or whose mtime / size changed since the previous call.
+class LotDataset:
+
+    def __init__(self, source, max_workers=None):
+        self.source = source
+        self.max_workers = max_workers
+        self.schema = None
+        self.columns = None
+        self.frame = None
+        self._parsed = {}  # path -> (file_signature, DataFrame as parsed)
+        self._frame_paths = None  # files self.frame was built from
+
+    # paths: only these files of the dataset (e.g. the files of one lot), every file by default.
+    # Files left out are not parsed; those parsed by an earlier call are kept.
+    def reload(self, paths=None):
+        all_paths = expand_source(self.source)
+        if paths is None:
+            paths = all_paths
+        else:
+            wanted = set(paths)
+            paths = [path for path in all_paths if path in wanted]
+        if not paths:
+            raise FileNotFoundError(f"no CSV files match {self.source!r}")
+
+        signatures = {path: file_signature(path) for path in paths}
+        changed = [path for path in paths if self._parsed.get(path, (None,))[0] != signatures[path]]
+        removed = set(self._parsed) - set(all_paths)
+        if not changed and not removed and self.frame is not None and self._frame_paths == paths:
+            return self.frame
+
+        for path in removed:
+            del self._parsed[path]
+        for path, df in zip(changed, self._parse_all(changed)):
+            self._parsed[path] = (signatures[path], df)
+
+        # The schema comes from the current first file, so a dataset whose files were all replaced may change it
+        first = self._parsed[paths[0]][1]
+        self.schema = schema_signature(first.columns)
+        self.columns = list(first.columns)
+        frame = pd.concat([self._conform(path, self._parsed[path][1]) for path in paths], ignore_index=True)
+        frame["Lot"] = frame["Lot"].astype("category")
+        frame["Wafer"] = frame["Wafer"].astype("category")
+        self.frame = frame
+        self._frame_paths = paths
+        return frame
+
+    def _parse_all(self, paths):
+        # A single file isn't worth the pool start-up cost, and worker processes must not spawn pools of their own
+        if len(paths) < 2 or multiprocessing.parent_process() is not None:
+            return [parse_file(path) for path in paths]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(parse_file, paths))
+
+    # Check the file against the first file's schema and rename VTH columns to its spelling / order
+    def _conform(self, path, df):
+        if list(df.columns) == self.columns:
+            return df
+        signature = schema_signature(df.columns)
+        if signature != self.schema:
+            raise ValueError(f"{path}: schema does not match the dataset ({describe_schema_difference(self.schema, signature)})")
+
+        canonical = {parse_column_name(col): col for col in self.columns if is_vth_column(col)}
+        renames = {col: canonical[parse_column_name(col)] for col in df.columns if is_vth_column(col)}
+        return df.rename(columns=renames)[self.columns]
+
+def load_dataset(source, max_workers=None):
+    return LotDataset(source, max_workers).reload()
+
+if __name__ == "__main__":
+    dataset = LotDataset(sys.argv[1] if len(sys.argv) > 1 else ".")
+    df = dataset.reload()
+    print(f"{len(dataset._parsed)} files, {len(df)} rows, {df.shape[1]} columns")
+    print(df.groupby(["Lot", "Wafer"], observed=True).size().to_string())
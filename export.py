@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from flask import Response, abort, stream_with_context
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+
+EXPORT_CHUNK_ROWS = 50_000
+
+# One row per join key, so that joining never multiplies the rows of a chunk: numeric columns are averaged,
+# the others take their first value
+def one_row_per_key(frame, keys):
+    columns = [col for col in frame.columns if col not in keys]
+    aggregations = {col: "mean" if pd.api.types.is_numeric_dtype(frame[col].dtype) else "first" for col in columns}
+    if not aggregations:
+        return frame.drop_duplicates(keys)
+    return frame.groupby(keys, observed=True, sort=False, as_index=False).agg(aggregations)
+
+def _join(chunk, join_frame, join_on):
+    if join_frame is None:
+        return chunk
+    return chunk.merge(join_frame, on=join_on, how="left", suffixes=("", "_measured"))
+
+# Rows of frame at the given positions, chunk by chunk, optionally joined with join_frame (one row per key).
+# Only one chunk is materialized at a time.
+def iter_chunks(frame, positions, join_frame=None, join_on=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(positions), chunk_rows):
+        yield _join(frame.iloc[positions[start:start + chunk_rows]], join_frame, join_on)
+
+def stream_csv(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+# Write-only file object that hands written bytes back to the generator instead of keeping them
+class _StreamSink:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+# Arrow schema of the exported rows, from the dtypes of the frames rather than from the values of a chunk
+# (an object column that is all missing in the first chunk would otherwise become type null for the whole file)
+def parquet_schema(frame, join_frame=None, join_on=None):
+    schema = pa.Schema.from_pandas(_join(frame.iloc[:0], join_frame, join_on), preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+# One Parquet row group per chunk, yielded as soon as it is written
+def stream_parquet(chunks, schema):
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, preserve_index=False).cast(schema))
+            yield sink.take()
+    yield sink.take()
+
+# Selection value meaning "every row": a cleared selection exports everything, a missing one nothing
+ALL_ROWS = "all"
+
+# get_selection for register_export_route over one frame: the boolean row mask stored in the session,
+# ALL_ROWS once the selection was cleared (stored as None), None while the session or its selection does not exist
+def session_selection(session_store, get_frame, key="selection_mask"):
+    missing = object()
+
+    def get_selection(session_id):
+        mask = session_store.get(session_id, key, missing)
+        if mask is missing:
+            return None
+        return get_frame(), ALL_ROWS if mask is None else mask
+
+    return get_selection
+
+# Points of selectedData on the VTH vs Vg scatter plots as Type / Vg / Level / VTH rows. traces is the
+# (Type, Level) of each trace of the plot, indexed by the points' curveNumber; x is Vg and y the VTH.
+# The key columns get the dtypes of like (measured_df) so that they can be joined with it.
+# Points of other traces are skipped.
+def selected_points_frame(points, traces, like=None):
+    rows = [
+        (*traces[point["curveNumber"]], point["x"], point["y"]) for point in points
+        if isinstance(point.get("curveNumber"), int) and 0 <= point["curveNumber"] < len(traces)
+    ]
+    frame = pd.DataFrame({
+        "Type": [row[0] for row in rows],
+        "Vg": [row[2] for row in rows],
+        "Level": [row[1] for row in rows],
+        "VTH": [row[3] for row in rows],
+    })
+    if like is not None:
+        frame = frame.astype(like.dtypes[["Type", "Vg", "Level"]].to_dict())
+    return frame
+
+# GET /export/<session_id>.csv|.parquet streams the rows selected in that session.
+# get_selection(session_id) returns (frame, boolean row mask or ALL_ROWS), or None when the session or its
+# selection does not exist (404, rather than exporting everything). join_on must be columns of both frames;
+# join_frame is reduced to one row per key once, here.
+def register_export_route(server, get_selection, join_frame=None, join_on=None):
+    if join_frame is not None:
+        join_frame = one_row_per_key(join_frame, join_on)
+
+    @server.route("/export/<session_id>.<fmt>")
+    def export_selection(session_id, fmt):
+        if fmt not in ("csv", "parquet") or (fmt == "parquet" and pa is None):
+            abort(404)
+
+        selection = get_selection(session_id)
+        if selection is None:
+            abort(404, description="no such session or selection")
+        frame, mask = selection
+        if mask is ALL_ROWS:
+            positions = np.arange(len(frame))
+        elif len(mask) != len(frame):
+            abort(404, description="the selection was made on data that has since been reloaded")
+        else:
+            positions = np.flatnonzero(mask)
+        chunks = iter_chunks(frame, positions, join_frame, join_on)
+
+        if fmt == "csv":
+            body, mimetype = stream_csv(chunks), "text/csv"
+        else:
+            body, mimetype = stream_parquet(chunks, parquet_schema(frame, join_frame, join_on)), "application/vnd.apache.parquet"
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename=selection.{fmt}"},
+        )
+
+    return export_selection
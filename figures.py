@@ -0,0 +1,40 @@
+import plotly.express as px
+import plotly.graph_objs as go
+
+# Correlation heatmap of a (sub-)matrix
+def create_heatmap(heatmap_df):
+    fig = go.Figure(data=go.Heatmap(z=heatmap_df.values, x=heatmap_df.columns, y=heatmap_df.columns, colorscale="Viridis"))
+    fig.update_layout(margin={"l": 20, "r": 20, "b": 20, "t": 20})
+    return fig
+
+# Every row of df as one point (customdata: its index label); the selection is drawn through selectedpoints.
+# With labels each point shows its index, which only suits a few dozen devices; without them the points are
+# drawn with WebGL.
+def create_scatter_plot(df, x_col, y_col, selectedpoints=None, labels=True):
+    if labels:
+        fig = px.scatter(df, x=x_col, y=y_col, text=df.index)
+        fig.update_traces(
+            selectedpoints=selectedpoints,
+            customdata=df.index,
+            mode="markers+text",
+            marker={"color": "rgba(0, 116, 217, 0.7)", "size": 20},
+            unselected={
+                "marker": {"opacity": 0.3},
+                "textfont": {"color": "rgba(0, 0, 0, 0)"},
+            },
+        )
+    else:
+        fig = px.scatter(df, x=x_col, y=y_col, render_mode="webgl")
+        fig.update_traces(
+            selectedpoints=selectedpoints,
+            customdata=df.index,
+            marker={"color": "rgba(0, 116, 217, 0.7)", "size": 5},
+            unselected={"marker": {"opacity": 0.2}},
+        )
+    fig.update_layout(
+        margin={"l": 20, "r": 0, "b": 15, "t": 5},
+        dragmode="select",
+        hovermode=False if labels else "closest",
+        newselection_mode="gradual",
+    )
+    return fig
@@ -0,0 +1,230 @@
+import cProfile
+import functools
+import heapq
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, abort, g, has_request_context, request
+
+from compact_data import memory_report
+
+LOCAL_ADDRESSES = {"127.0.0.1", "::1", "localhost"}
+
+# Opt-in: keep cProfile output for the N slowest callback calls (adds profiler overhead to every call)
+PROFILE_SLOWEST = int(os.environ.get("DASH_PROFILE_SLOWEST", "0"))
+
+class CallbackStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.wall = 0.0
+        self.wall_max = 0.0
+        self.compute = 0.0
+        self.serialize = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+# Per-callback timings, payload sizes and cache hit rates for one Dash app.
+# With profile_slowest > 0 every callback runs under cProfile and the N slowest calls are kept.
+class CallbackMetrics:
+    def __init__(self, profile_slowest=0):
+        self.callbacks = defaultdict(CallbackStats)
+        self.caches = {}
+        self.structures = {}
+        self.profile_slowest = profile_slowest
+        self._profiles = []  # min-heap of (seconds, sequence, callback name, pstats text)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    # cache: an lru_cache-wrapped function (anything with cache_info()) or a callable returning (hits, misses)
+    def register_cache(self, name, cache):
+        self.caches[name] = cache
+
+    # structure: a zero-argument callable returning the current object (globals may be rebound on reload)
+    def register_structure(self, name, structure):
+        self.structures[name] = structure
+
+    def memory(self):
+        return memory_report(self.structures)
+
+    # compute: seconds spent in the callback function (None when it is not decorated with @timed);
+    # the rest of the request (Dash's dispatch and the JSON encoding of the figures) counts as serialization
+    def record_call(self, name, wall, compute=None, failed=False):
+        with self._lock:
+            stats = self.callbacks[name]
+            stats.calls += 1
+            stats.errors += failed
+            stats.wall += wall
+            stats.wall_max = max(stats.wall_max, wall)
+            if compute is not None:
+                stats.compute += compute
+                stats.serialize += max(wall - compute, 0.0)
+
+    def record_bytes(self, name, request_bytes, response_bytes):
+        with self._lock:
+            stats = self.callbacks[name]
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+
+    def record_profile(self, name, seconds, profile):
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(30)
+        with self._lock:
+            self._sequence += 1
+            entry = (seconds, self._sequence, name, text.getvalue())
+            if len(self._profiles) < self.profile_slowest:
+                heapq.heappush(self._profiles, entry)
+            elif seconds > self._profiles[0][0]:
+                heapq.heapreplace(self._profiles, entry)
+
+    def cache_stats(self):
+        result = {}
+        for name, cache in self.caches.items():
+            if hasattr(cache, "cache_info"):
+                info = cache.cache_info()
+                hits, misses = info.hits, info.misses
+            else:
+                hits, misses = cache()
+            total = hits + misses
+            result[name] = {"hits": hits, "misses": misses, "hit_rate": hits / total if total else None}
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            callbacks = {name: stats.as_dict() for name, stats in self.callbacks.items()}
+        return {"callbacks": callbacks, "caches": self.cache_stats()}
+
+    def slowest_profiles(self):
+        with self._lock:
+            return [
+                {"callback": name, "seconds": seconds, "profile": text}
+                for seconds, _, name, text in sorted(self._profiles, reverse=True)
+            ]
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{{{labels}}} {value}" for labels, value in samples)
+
+        callbacks = snapshot["callbacks"].items()
+        metric("dash_callback_calls_total", "counter", [(f'callback="{n}"', s["calls"]) for n, s in callbacks])
+        metric("dash_callback_errors_total", "counter", [(f'callback="{n}"', s["errors"]) for n, s in callbacks])
+        metric("dash_callback_seconds_total", "counter", [
+            (f'callback="{n}",phase="{phase}"', s[phase]) for n, s in callbacks for phase in ("wall", "compute", "serialize")
+        ])
+        metric("dash_callback_seconds_max", "gauge", [(f'callback="{n}"', s["wall_max"]) for n, s in callbacks])
+        metric("dash_callback_request_bytes_total", "counter", [(f'callback="{n}"', s["request_bytes"]) for n, s in callbacks])
+        metric("dash_callback_response_bytes_total", "counter", [(f'callback="{n}"', s["response_bytes"]) for n, s in callbacks])
+        caches = snapshot["caches"].items()
+        metric("dash_cache_hits_total", "counter", [(f'cache="{n}"', c["hits"]) for n, c in caches])
+        metric("dash_cache_misses_total", "counter", [(f'cache="{n}"', c["misses"]) for n, c in caches])
+        if self.structures:
+            memory = self.memory()
+            metric("dash_structure_bytes", "gauge", [(f'structure="{r.structure}"', r.bytes) for r in memory.itertuples()])
+        return "\n".join(lines) + "\n"
+
+# Decorator for callback functions, placed under @app.callback / @callback: while instrument_app is timing the
+# request it records the function's name and the time spent in it (under cProfile with profile_slowest).
+# Outside an instrumented request (tests, benchmark.py) the function is called as is.
+def timed(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call = g.get("metrics_call") if has_request_context() else None
+        if call is None:
+            return func(*args, **kwargs)
+        call["name"] = func.__name__
+        profile = cProfile.Profile() if call["metrics"].profile_slowest else None
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:  # another profiler is active in this process
+                profile = None
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            call["compute"] = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                call["profile"] = profile
+
+    return wrapper
+
+# Time and size every /_dash-update-component request of app and expose the results on the local-only endpoints
+# /metrics (Prometheus text), /metrics.json, /metrics/profiles and /metrics/memory. Only Flask request hooks are
+# used; callbacks decorated with @timed also report their compute time and cProfile output.
+# structures: {name: callable returning a data structure} to include in the memory report.
+def instrument_app(app, caches=None, structures=None, profile_slowest=PROFILE_SLOWEST):
+    metrics = CallbackMetrics(profile_slowest)
+    for name, cache in (caches or {}).items():
+        metrics.register_cache(name, cache)
+    for name, structure in (structures or {}).items():
+        metrics.register_structure(name, structure)
+
+    server = app.server
+
+    @server.before_request
+    def _start_callback():
+        if request.path.endswith("_dash-update-component"):
+            g.metrics_call = {"metrics": metrics, "start": time.perf_counter(), "name": None, "compute": None}
+
+    # Dash answers 204 for PreventUpdate and 500 when the callback raised
+    @server.after_request
+    def _record_callback(response):
+        call = g.pop("metrics_call", None)
+        if call is None:
+            return response
+        wall = time.perf_counter() - call["start"]
+        name = call["name"]
+        if name is None:
+            body = request.get_json(silent=True) or {}
+            name = body.get("output", request.path)
+        metrics.record_call(name, wall, call["compute"], failed=response.status_code >= 500)
+        if "profile" in call:
+            metrics.record_profile(name, call["compute"], call["profile"])
+        if not response.is_streamed:
+            metrics.record_bytes(name, request.content_length or 0, response.calculate_content_length() or 0)
+        return response
+
+    # after_request is skipped when the request fails outside the callback
+    @server.teardown_request
+    def _forget_callback(_):
+        g.pop("metrics_call", None)
+
+    def _local_only():
+        if request.remote_addr not in LOCAL_ADDRESSES:
+            abort(403)
+
+    @server.route("/metrics")
+    def prometheus_metrics():
+        _local_only()
+        return Response(metrics.prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+    @server.route("/metrics.json")
+    def json_metrics():
+        _local_only()
+        return Response(json.dumps(metrics.snapshot(), indent=2), mimetype="application/json")
+
+    @server.route("/metrics/profiles")
+    def profile_metrics():
+        _local_only()
+        return Response(json.dumps(metrics.slowest_profiles(), indent=2), mimetype="application/json")
+
+    @server.route("/metrics/memory")
+    def memory_metrics():
+        _local_only()
+        report = metrics.memory().astype({"shape": str})
+        return Response(report.to_json(orient="records", indent=2), mimetype="application/json")
+
+    return metrics
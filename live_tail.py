@@ -0,0 +1,121 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+# Follows a CSV file that is being appended to, returning only the rows added since the last call.
+# A trailing line without a newline is held back until the writer finishes it.
+class CsvTail:
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.header = None
+        self.restarted = False
+        self._pending = b""
+
+    def read_new(self):
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # Truncated or replaced by a new batch: start over from the top
+            self.restarted = size < self.offset
+            if self.restarted:
+                self.offset, self.header, self._pending = 0, None, b""
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+
+        data = self._pending + data
+        end = data.rfind(b"\n") + 1
+        data, self._pending = data[:end], data[end:]
+
+        if self.header is None:
+            if not data:
+                return pd.DataFrame()
+            first_line = data.index(b"\n") + 1
+            self.header = pd.read_csv(io.BytesIO(data[:first_line]), nrows=0).columns.tolist()
+            data = data[first_line:]
+        if not data:
+            return pd.DataFrame(columns=self.header)
+        return pd.read_csv(io.BytesIO(data), header=None, names=self.header)
+
+# The columns DataFrame.corr(numeric_only=True) correlates: numbers and booleans, not categoricals or strings
+def numeric_columns(df):
+    return df.columns[[pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes]]
+
+# Running pairwise statistics updated batch by batch (Welford / Chan et al. pairwise update),
+# so corr() after an append costs O(new rows x columns^2) instead of a full re-scan.
+# Like DataFrame.corr(), each pair of columns uses the rows where both are present: for every pair (a, b)
+# count[a, b] is the number of such rows, mean[a, b] / m2[a, b] the mean / sum of squared deviations of
+# column a over them, and comoment[a, b] the sum of the products of both columns' deviations.
+class OnlineCorrelation:
+    def __init__(self, columns):
+        self.columns = pd.Index(columns)
+        shape = (len(self.columns), len(self.columns))
+        self.count = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.comoment = np.zeros(shape)
+
+    # Pairwise statistics of one batch as matrix products over the missing-value mask. Each column is
+    # shifted by its first present value first (constant columns stay exactly constant), and missing
+    # values then contribute zeros.
+    def _batch(self, df):
+        values = df[self.columns].to_numpy(dtype=float, na_value=np.nan)
+        if len(values) == 0:
+            zeros = np.zeros((len(self.columns), len(self.columns)))
+            return zeros, zeros, zeros, zeros
+        present = ~np.isnan(values)
+        shift = np.where(present.any(axis=0), values[present.argmax(axis=0), np.arange(values.shape[1])], 0.0)
+        shifted = np.where(present, values - shift, 0.0)
+        weights = present.astype(float)
+
+        count = weights.T @ weights
+        sums = shifted.T @ weights  # sums[a, b]: column a summed over the rows where b is present too
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(count > 0, sums / count, 0.0)
+        m2 = (shifted ** 2).T @ weights - sums * mean
+        comoment = shifted.T @ shifted - sums * mean.T
+        return count, mean + shift[:, np.newaxis], m2, comoment
+
+    def update(self, df):
+        count, mean, m2, comoment = self._batch(df)
+        if not count.any():
+            return
+
+        total = self.count + count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(total > 0, self.count * count / total, 0.0)
+            delta = mean - self.mean
+            self.m2 += m2 + delta ** 2 * weight
+            self.comoment += comoment + delta * delta.T * weight
+            # A pair seen for the first time takes the batch mean as is, so constant columns keep an exact mean
+            self.mean = np.where(self.count > 0, self.mean + delta * (count / total), mean)
+        self.count = total
+
+    # Statistics of the tracked rows minus the rows of df (which must have been included), as a new object.
+    # Costs O(len(df) x columns^2), e.g. for excluding a few flagged devices without a full re-scan.
+    def without(self, df):
+        count, mean, m2, comoment = self._batch(df)
+        result = OnlineCorrelation(self.columns)
+        rest = self.count - count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result.mean = np.where(rest > 0, self.mean + (self.mean - mean) * (count / rest), 0.0)
+            weight = np.where(rest > 0, rest * count / self.count, 0.0)
+            delta = mean - result.mean
+            result.m2 = np.where(rest > 0, self.m2 - m2 - delta ** 2 * weight, 0.0)
+            result.comoment = np.where(rest > 0, self.comoment - comoment - delta * delta.T * weight, 0.0)
+        result.count = np.maximum(rest, 0.0)
+        return result
+
+    def cov(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = np.where(self.count > 1, self.comoment / (self.count - 1), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    # NaN where a pair has no variance (fewer than two shared rows or a constant column), as in DataFrame.corr()
+    def corr(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            divisor = np.sqrt(self.m2 * self.m2.T)
+            corr = np.where(divisor > 0, self.comoment / divisor, np.nan)
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=self.columns, columns=self.columns)
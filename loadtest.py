@@ -0,0 +1,366 @@
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from flask import request
+
+from benchmark import ROOT, load_script, rebind_sample_frame
+from synthetic_data import make_col_frame, make_vthe_vthw_frame
+
+UPDATE_PATH = "/_dash-update-component"
+LAYOUT_PATH = "/_dash-layout"
+SESSION_PLACEHOLDER = "__SESSION_ID__"
+SERVER_START_TIMEOUT = 120
+
+# Dash's string form of a pattern-matching id: sorted keys, no spaces
+def stringify_id(component_id):
+    return json.dumps(component_id, sort_keys=True, separators=(",", ":"))
+
+def _pattern(component_id):
+    if component_id.startswith("{"):
+        return json.loads(component_id)
+    return None
+
+# The callback (output key of app.callback_map) that has component_id.prop as an input; for a pattern-matching
+# input, component_id is the "type" of the pattern
+def find_callback(app, component_id, prop):
+    for output, spec in app.callback_map.items():
+        for dependency in spec["inputs"]:
+            pattern = _pattern(dependency["id"])
+            name = dependency["id"] if pattern is None else pattern.get("type")
+            if name == component_id and dependency["property"] == prop:
+                return output
+    return None
+
+# Request body of one callback call, as the renderer sends it. Inputs and states are taken from the callback's
+# spec; values maps (component id, property) to a value (None when missing), and matched maps the "type" of
+# each pattern-matching (ALL) dependency to the concrete ids on the page.
+def callback_request(app, output, values, changed, matched=None):
+    spec = app.callback_map[output]
+    matched = matched or {}
+
+    def entry(dependency):
+        pattern = _pattern(dependency["id"])
+        if pattern is None:
+            return {**dependency, "value": values.get((dependency["id"], dependency["property"]))}
+        return [{"id": component_id, "property": dependency["property"],
+                 "value": values.get((stringify_id(component_id), dependency["property"]))}
+                for component_id in matched.get(pattern.get("type"), [])]
+
+    def target(dependency):
+        component_id = dependency.component_id
+        if isinstance(component_id, dict):
+            return [{"id": concrete, "property": dependency.component_property}
+                    for concrete in matched.get(component_id.get("type"), [])]
+        return {"id": component_id, "property": dependency.component_property}
+
+    outputs = spec["output"]
+    return {
+        "output": output,
+        "outputs": [target(o) for o in outputs] if isinstance(outputs, list) else target(outputs),
+        "inputs": [entry(dependency) for dependency in spec["inputs"]],
+        "changedPropIds": changed,
+        "state": [entry(dependency) for dependency in spec["state"]],
+    }
+
+# heatmap click -> brush on the new scatter -> generate the VTH vs Vg graph, as 0721-0723 send them.
+# The callbacks are looked up in app.callback_map by their inputs; only the component ids come from the dashboards.
+def crossfilter_scenario(module, brush_step=2):
+    app = module.app
+    columns = list(module.df.columns)
+    x_col, y_col = columns[0], columns[1]
+    scatter_id = {"type": "scatter", "index": f"scatter-{x_col}-{y_col}"}
+    brushed = {"points": [{"customdata": int(i)} for i in module.df.index[::brush_step]]}
+    session = {("session-id", "data"): SESSION_PLACEHOLDER}
+
+    open_output = find_callback(app, "heatmap", "clickData")
+    brush_output = find_callback(app, "scatter", "selectedData")
+    if open_output is None or brush_output is None:
+        raise ValueError(f"{module.__name__} has no heatmap click / scatter brush callbacks")
+    click = {"points": [{"x": x_col, "y": y_col}]}
+    steps = [
+        callback_request(app, open_output, {**session, ("heatmap", "clickData"): click}, ["heatmap.clickData"]),
+        callback_request(
+            app, brush_output, {**session, (stringify_id(scatter_id), "selectedData"): brushed},
+            [stringify_id(scatter_id) + ".selectedData"], matched={"scatter": [scatter_id]},
+        ),
+    ]
+    graph_output = find_callback(app, "generate-graph", "n_clicks")
+    if graph_output is not None:
+        steps.append(callback_request(
+            app, graph_output,
+            {**session, ("generate-graph", "n_clicks"): 1, ("vth-view-mode", "value"): "auto"},
+            ["generate-graph.n_clicks"],
+        ))
+    return steps
+
+def load_scenario(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# Append every callback request body to path (one JSON per line), with the session id replaced by a placeholder
+def record_requests(server, path):
+    lock = threading.Lock()
+
+    @server.after_request
+    def _record(response):
+        if request.path.endswith(UPDATE_PATH):
+            body = request.get_json(silent=True)
+            for state in (body or {}).get("state", []):
+                if isinstance(state, dict) and state.get("id") == "session-id":
+                    state["value"] = SESSION_PLACEHOLDER
+            with lock, open(path, "a") as f:
+                f.write(json.dumps(body) + "\n")
+        return response
+
+# The session id that serve_layout put into the page (the data of the "session-id" store)
+def find_session_id(layout):
+    if isinstance(layout, dict):
+        props = layout.get("props", {})
+        if props.get("id") == "session-id":
+            return props.get("data")
+        children = [props.get("children"), *(v for k, v in layout.items() if k != "props")]
+    elif isinstance(layout, list):
+        children = layout
+    else:
+        return None
+    for child in children:
+        session_id = find_session_id(child)
+        if session_id is not None:
+            return session_id
+    return None
+
+# Sends callback requests to an app in this process through Flask's test client
+class InProcessTarget:
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+        self.names = {output: spec["callback"].__name__ for output, spec in app.callback_map.items()}
+        app.server.test_client().get("/")
+
+    @property
+    def client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.app.server.test_client()
+        return self._local.client
+
+    # One page load: the layout registers a new session
+    def new_session(self):
+        return find_session_id(self.client.get(LAYOUT_PATH).get_json())
+
+    def post(self, body):
+        return self.client.post(UPDATE_PATH, data=body, content_type="application/json").status_code
+
+# Sends callback requests to a running server over HTTP keep-alive connections
+class HttpTarget:
+    def __init__(self, url):
+        parsed = urllib.parse.urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.prefix = parsed.path.rstrip("/")
+        self.names = {}
+        self._local = threading.local()
+
+    def _request(self, method, path, body=None):
+        if not hasattr(self._local, "connection"):
+            self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        connection = self._local.connection
+        try:
+            connection.request(method, self.prefix + path, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            del self._local.connection
+            return 0, b""
+
+    def new_session(self):
+        status, data = self._request("GET", LAYOUT_PATH)
+        return find_session_id(json.loads(data)) if status == 200 else None
+
+    def post(self, body):
+        return self._request("POST", UPDATE_PATH, body)[0]
+
+# Virtual users spread over several servers (one per worker process) with session affinity: each thread
+# sends every request to the server it was given on its first one
+class PinnedTarget:
+    def __init__(self, targets):
+        self.targets = targets
+        self.names = {}
+        self._local = threading.local()
+        self._assigned = itertools.count()
+
+    @property
+    def target(self):
+        if not hasattr(self._local, "target"):
+            self._local.target = self.targets[next(self._assigned) % len(self.targets)]
+        return self._local.target
+
+    def new_session(self):
+        return self.target.new_session()
+
+    def post(self, body):
+        return self.target.post(body)
+
+# `concurrency` virtual users each load the page (for a session id) and replay the scenario, `iterations` times.
+# 204 (PreventUpdate) counts as success.
+def run_load(target, scenario, concurrency, iterations):
+    templates = [(step["output"], json.dumps(step)) for step in scenario]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def user():
+        for _ in range(iterations):
+            session_id = target.new_session() or ""
+            for output, template in templates:
+                body = template.replace(SESSION_PLACEHOLDER, session_id)
+                start = time.perf_counter()
+                status = target.post(body)
+                elapsed = time.perf_counter() - start
+                name = target.names.get(output, output)
+                with lock:
+                    latencies[name].append(elapsed)
+                    if status not in (200, 204):
+                        errors[name] += 1
+
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    callbacks = {}
+    for name, values in latencies.items():
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+        callbacks[name] = {"requests": len(values), "errors": errors[name], "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+    total = sum(len(values) for values in latencies.values())
+    return {"concurrency": concurrency, "requests": total, "seconds": wall, "requests_per_second": total / wall, "callbacks": callbacks}
+
+# The dashboard script as a module, with a synthetic frame of `rows` rows swapped into 0721-0723
+def load_dashboard(script, workdir=".", rows=None):
+    module = load_script(script, workdir)
+    if rows and script.startswith("072"):
+        frame = make_col_frame(rows) if script.startswith("0721") else make_vthe_vthw_frame(rows)
+        rebind_sample_frame(module, frame)
+    return module
+
+# WSGI app factory for gunicorn: "loadtest:create_server('0722_dashboard.py', '/data', 100000)"
+def create_server(script, workdir=".", rows=None):
+    return load_dashboard(script, workdir, rows).app.server
+
+# "2x4": 2 worker processes with 4 threads each
+def parse_server(spec):
+    workers, _, threads = spec.partition("x")
+    return int(workers), int(threads or 1)
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# One single-worker gunicorn server per worker process, each on its own free local port, stopped on exit.
+# Every server loads the dashboard (and its data) itself, as a worker of a deployment does. The sessions
+# live in the worker that issued them, so the workers are not put behind one port (where gunicorn would
+# hand a session's requests to any of them): PinnedTarget keeps each virtual user on one server instead.
+@contextmanager
+def spawn_servers(script, workdir, rows, workers, threads):
+    workdir = os.path.abspath(workdir)
+    servers = []
+    try:
+        for _ in range(workers):
+            port = _free_port()
+            command = [
+                sys.executable, "-m", "gunicorn", "--workers", "1", "--threads", str(threads),
+                "--bind", f"127.0.0.1:{port}", "--chdir", workdir, "--pythonpath", ROOT, "--timeout", "300",
+                "--log-level", "warning", f"loadtest:create_server({script!r}, {workdir!r}, {rows!r})",
+            ]
+            servers.append((subprocess.Popen(command), f"http://127.0.0.1:{port}"))
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        for process, url in servers:
+            while HttpTarget(url).new_session() is None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"gunicorn exited with status {process.returncode} (is it installed?)")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"gunicorn did not answer on {url} within {SERVER_START_TIMEOUT} s")
+                time.sleep(0.5)
+        yield [url for _, url in servers]
+    finally:
+        for process, _ in servers:
+            process.terminate()
+        for process, _ in servers:
+            process.wait()
+
+def print_report(report):
+    print(f"{report['server']}, concurrency {report['concurrency']}: {report['requests']} requests"
+          f" in {report['seconds']:.2f} s = {report['requests_per_second']:.1f} req/s")
+    for name, stats in report["callbacks"].items():
+        print(f"  {name:<45} n={stats['requests']:<6} errors={stats['errors']:<4}"
+              f" p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms")
+
+def run_concurrency(target, server, scenario, args):
+    reports = []
+    for concurrency in args.concurrency:
+        report = {"server": server, **run_load(target, scenario, concurrency, args.iterations)}
+        print_report(report)
+        reports.append(report)
+    return reports
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay dashboard interactions against the Dash callback endpoint")
+    parser.add_argument("--script", default="0722_dashboard.py", help="dashboard to load (and to build the default scenario from)")
+    parser.add_argument("--workdir", default=".", help="directory with the CSV / VTP files the dashboard reads")
+    parser.add_argument("--rows", type=int, help="swap a synthetic frame of this size into 0721-0723 (not with --url)")
+    parser.add_argument("--url", help="target a server that is already running instead of the in-process app")
+    parser.add_argument("--servers", nargs="+", metavar="WORKERSxTHREADS",
+                        help="start gunicorn servers per configuration (e.g. 1x1 1x4 2x4 4x1: one single-worker server per "
+                             "worker, each virtual user pinned to one of them) and load each configuration in turn")
+    parser.add_argument("--scenario", help="recorded interactions (JSON lines); default: heatmap click -> brush -> generate graph")
+    parser.add_argument("--record", help="run the dashboard and record its callback requests to this file")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--iterations", type=int, default=5, help="scenario replays per virtual user")
+    parser.add_argument("--output", help="write the reports as JSON")
+    args = parser.parse_args(argv)
+
+    module = load_dashboard(args.script, args.workdir, args.rows)
+    if args.record:
+        record_requests(module.app.server, args.record)
+        os.chdir(args.workdir)
+        module.app.run(debug=False)
+        return
+
+    scenario = load_scenario(args.scenario) if args.scenario else crossfilter_scenario(module)
+    names = {output: spec["callback"].__name__ for output, spec in module.app.callback_map.items()}
+
+    reports = []
+    if args.servers:
+        for spec in args.servers:
+            workers, threads = parse_server(spec)
+            with spawn_servers(args.script, args.workdir, args.rows, workers, threads) as urls:
+                target = PinnedTarget([HttpTarget(url) for url in urls])
+                target.names = names
+                reports += run_concurrency(target, f"gunicorn {spec}", scenario, args)
+    else:
+        target = HttpTarget(args.url) if args.url else InProcessTarget(module.app)
+        target.names = names
+        os.chdir(args.workdir)
+        reports += run_concurrency(target, args.url or "in-process", scenario, args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import numpy as np
+
+# A value is flagged when it is more than this many robust standard deviations (1.4826 x MAD) from its column median
+MAD_THRESHOLD = 5.0
+MAD_TO_SIGMA = 1.4826
+
+# Per-column median / MAD outlier flags for every row, computed once in a few vectorized passes
+# and kept as a packed bitmask (one bit per value, rows x ceil(columns / 8) bytes).
+# rows is the boolean mask of devices with at least one flagged value.
+class OutlierMask:
+    def __init__(self, df, threshold=MAD_THRESHOLD):
+        numeric = df.select_dtypes("number")
+        values = numeric.to_numpy()
+        self.columns = numeric.columns
+        self.positions = {col: i for i, col in enumerate(self.columns)}
+        self.threshold = threshold
+        self.median = np.nanmedian(values, axis=0)
+        deviation = np.abs(values - self.median)
+        self.mad = np.nanmedian(deviation, axis=0)
+
+        # Constant columns (MAD = 0) flag nothing; missing values are never flagged
+        scale = np.where(self.mad > 0, self.mad * MAD_TO_SIGMA * threshold, np.inf)
+        flags = deviation > scale
+        self.bits = np.packbits(flags, axis=1)
+        self.rows = flags.any(axis=1)
+        self.counts = flags.sum(axis=0)
+
+    # Boolean mask of the rows flagged in one column, unpacked from its bit
+    def column(self, column):
+        position = self.positions[column]
+        return (self.bits[:, position // 8] >> (7 - position % 8) & 1).astype(bool)
+
+    @property
+    def inliers(self):
+        return ~self.rows
+
+    # A row mask (None: every row) without the flagged rows
+    def exclude(self, mask=None):
+        return self.inliers if mask is None else mask & self.inliers
+
+    def __len__(self):
+        return int(self.rows.sum())
@@ -0,0 +1,169 @@
+import dash
+from dash import Input, Output, State, callback, ctx, dcc, html
+from dash.exceptions import PreventUpdate
+
+from column_filter import create_filter_bar, filter_inputs, sub_matrix
+from crossfilter import create_histogram_figure, histogram_selection_patch, selection_mask
+from data_layer import get_data_layer, session_store
+from figures import create_heatmap, create_scatter_plot
+from instrumentation import timed
+from session_store import no_update_outputs
+from vth_summary import DEVICE_CURVE_LIMIT, create_device_figure, create_summary_figure
+
+dash.register_page(__name__, path="/", name="Cross-filter", order=0)
+
+layer = get_data_layer()
+
+def layout():
+    columns = list(layer.bin_index.positions)
+    return html.Div([
+        html.Div([
+            create_filter_bar(layer.column_index, prefix="xf-"),
+            dcc.Checklist(
+                id="xf-exclude-outliers",
+                options=[{"label": f" Exclude outliers ({len(layer.outliers)} devices)", "value": "exclude"}],
+                value=[],
+            ),
+            dcc.Graph(id="xf-heatmap", config={"displayModeBar": False}),
+        ], className="six columns"),
+        html.Div(dcc.Graph(id="xf-scatter"), className="six columns"),
+        html.Div([
+            dcc.Dropdown(
+                id="xf-histogram-columns",
+                options=[{"label": col, "value": col} for col in columns],
+                value=columns[:8],
+                multi=True,
+            ),
+            dcc.Graph(id="xf-histograms"),
+        ], className="twelve columns"),
+        html.Div([
+            dcc.RadioItems(
+                id="xf-view-mode",
+                options=[
+                    {"label": "Auto", "value": "auto"},
+                    {"label": "Devices", "value": "devices"},
+                    {"label": "Summary", "value": "summary"},
+                    {"label": "Box", "value": "box"},
+                ],
+                value="auto",
+                inline=True,
+            ),
+            dcc.Graph(id="xf-vth-graph"),
+            html.A("Export CSV", id="xf-export-csv", target="_blank"),
+            html.A("Export Parquet", id="xf-export-parquet", target="_blank", style={"marginLeft": "1em"}),
+        ], className="twelve columns"),
+        dcc.Store(id="xf-selection-version", data=0),
+    ])
+
+# Brushed rows, minus the flagged devices when outliers are excluded (None: every row)
+def effective_mask(brush_mask, exclude_outliers):
+    return layer.outliers.exclude(brush_mask) if exclude_outliers else brush_mask
+
+# Only the filtered columns, sliced from the shared correlation matrix (with or without the outliers)
+@callback(
+    Output("xf-heatmap", "figure"),
+    *filter_inputs("xf-"),
+    Input("xf-exclude-outliers", "value"),
+)
+@timed
+def update_heatmap(types, vg_range, levels, pattern, exclude_outliers):
+    corr_df = layer.inlier_heatmap_df if exclude_outliers else layer.heatmap_df
+    fig = create_heatmap(sub_matrix(corr_df, layer.column_index, types, vg_range, levels, pattern))
+    fig.update_layout(height=600)
+    return fig
+
+@callback(
+    Output("xf-scatter", "figure"),
+    Input("xf-heatmap", "clickData"),
+    Input("xf-exclude-outliers", "value"),
+    State("session-id", "data"),
+)
+@timed
+def update_scatter(clickData, exclude_outliers, session_id):
+    if not clickData:
+        raise PreventUpdate
+    point = clickData["points"][0]
+    mask = effective_mask(session_store.get(session_id, "brush_mask"), exclude_outliers)
+    df = layer.total_df
+    # Every device as one point; the selection is drawn through selectedpoints (row positions)
+    fig = create_scatter_plot(df, point["x"], point["y"], None if mask is None else df.index.to_numpy()[mask], labels=False)
+    fig.update_layout(height=600)
+    return fig
+
+@callback(
+    Output("xf-selection-version", "data"),
+    Input("xf-scatter", "selectedData"),
+    Input("xf-exclude-outliers", "value"),
+    State("session-id", "data"),
+)
+@timed
+def update_selection(selectedData, exclude_outliers, session_id):
+    index = layer.total_df.index
+    # A dropped session (TTL or memory limit) starts over from the current brush
+    if session_id not in session_store:
+        session_store.new_session(session_id)
+    if ctx.triggered_id == "xf-exclude-outliers":
+        brush_mask = session_store.get(session_id, "brush_mask")
+    else:
+        brush_mask = selection_mask(index, [selectedData])
+        session_store.set(session_id, "brush_mask", brush_mask)
+    mask = effective_mask(brush_mask, exclude_outliers)
+    session_store.set(session_id, "selection_mask", mask)
+    session_store.set(session_id, "selectedpoints", None if mask is None else index.to_numpy()[mask])
+    version = session_store.get(session_id, "selection_version", 0) + 1
+    session_store.set(session_id, "selection_version", version)
+    return version
+
+@callback(
+    Output("xf-histograms", "figure"),
+    Input("xf-histogram-columns", "value"),
+    Input("xf-selection-version", "data"),
+    State("session-id", "data"),
+)
+@timed
+def update_histograms(histogram_columns, _, session_id):
+    if not histogram_columns:
+        raise PreventUpdate
+    if session_id not in session_store:
+        return no_update_outputs()
+    mask = session_store.get(session_id, "selection_mask")
+    # Same columns: only the selection bars change
+    if list(ctx.triggered_prop_ids) == ["xf-selection-version.data"]:
+        return histogram_selection_patch(layer.bin_index, histogram_columns, mask)
+    return create_histogram_figure(layer.bin_index, histogram_columns, mask)
+
+# Per-device curves for small selections, (Type, Vg) statistics otherwise
+@callback(
+    Output("xf-vth-graph", "figure"),
+    Input("xf-selection-version", "data"),
+    Input("xf-view-mode", "value"),
+    State("session-id", "data"),
+)
+@timed
+def update_vth_graph(_, view_mode, session_id):
+    if session_id not in session_store:
+        return no_update_outputs()
+    # None: nothing selected, the summary over every device comes from the data layer (and its snapshot)
+    selectedpoints = session_store.get(session_id, "selectedpoints")
+    if selectedpoints is not None and len(selectedpoints) == len(layer.total_df):
+        selectedpoints = None
+    count = len(layer.total_df) if selectedpoints is None else len(selectedpoints)
+    if count == 0:
+        raise PreventUpdate
+
+    if view_mode == "devices" or (view_mode == "auto" and count <= DEVICE_CURVE_LIMIT):
+        rows = layer.total_df.index.to_numpy() if selectedpoints is None else selectedpoints
+        fig = create_device_figure(layer.selection_long(rows))
+    else:
+        fig = create_summary_figure(layer.selection_summary(selectedpoints), "box" if view_mode == "box" else "summary")
+    fig.update_layout(title="VTH vs Vg", xaxis_title="Vg (V)", yaxis_title="VTH")
+    return fig
+
+@callback(
+    Output("xf-export-csv", "href"),
+    Output("xf-export-parquet", "href"),
+    Input("session-id", "data"),
+)
+@timed
+def update_export_links(session_id):
+    return f"/export/{session_id}.csv", f"/export/{session_id}.parquet"
@@ -0,0 +1,97 @@
+import dash
+import plotly.graph_objs as go
+from dash import Input, Output, State, callback, dcc, html
+from dash.exceptions import PreventUpdate
+
+from column_filter import create_filter_bar, filter_inputs, sub_matrix
+from column_schema import is_vth_column, parse_column_name
+from crossfilter import selection_mask
+from data_layer import get_data_layer
+from figures import create_heatmap, create_scatter_plot
+from instrumentation import timed
+from vth_summary import create_summary_figure
+
+dash.register_page(__name__, path="/measured", name="Measured vs simulated", order=1)
+
+layer = get_data_layer()
+
+def layout():
+    return html.Div([
+        html.Div([
+            create_filter_bar(layer.column_index, prefix="mv-"),
+            dcc.Checklist(
+                id="mv-exclude-outliers",
+                options=[{"label": f" Exclude outliers ({len(layer.outliers)} devices)", "value": "exclude"}],
+                value=[],
+            ),
+            dcc.Graph(id="mv-heatmap", config={"displayModeBar": False}),
+        ], className="six columns"),
+        html.Div(dcc.Graph(id="mv-scatter"), className="six columns"),
+        html.Div(dcc.Graph(id="mv-comparison"), className="twelve columns"),
+        dcc.Store(id="mv-columns"),
+    ])
+
+# Only the filtered columns, sliced from the shared correlation matrix (with or without the outliers)
+@callback(
+    Output("mv-heatmap", "figure"),
+    *filter_inputs("mv-"),
+    Input("mv-exclude-outliers", "value"),
+)
+@timed
+def update_measured_heatmap(types, vg_range, levels, pattern, exclude_outliers):
+    corr_df = layer.inlier_heatmap_df if exclude_outliers else layer.heatmap_df
+    fig = create_heatmap(sub_matrix(corr_df, layer.column_index, types, vg_range, levels, pattern))
+    fig.update_layout(title="Correlation Heatmap", xaxis_title="Parameters", yaxis_title="Parameters", height=600, margin_t=50)
+    return fig
+
+@callback(
+    Output("mv-scatter", "figure"),
+    Output("mv-columns", "data"),
+    Input("mv-heatmap", "clickData"),
+    Input("mv-exclude-outliers", "value"),
+)
+@timed
+def update_measured_scatter(clickData, exclude_outliers):
+    if not clickData:
+        raise PreventUpdate
+    x_col, y_col = clickData["points"][0]["x"], clickData["points"][0]["y"]
+    df = layer.total_df
+    # Flagged devices are drawn unselected when outliers are excluded
+    selectedpoints = df.index.to_numpy()[layer.outliers.inliers] if exclude_outliers else None
+    fig = create_scatter_plot(df, x_col, y_col, selectedpoints, labels=False)
+    fig.update_layout(title=f"{x_col} vs {y_col}", height=600, margin_t=50)
+    return fig, [x_col, y_col]
+
+# Simulated VTH vs Vg of the selected devices (at the Type / Level of the clicked VTH column)
+# against measured_data.csv for the same Type and Level, without the flagged devices when outliers are excluded
+@callback(
+    Output("mv-comparison", "figure"),
+    Input("mv-scatter", "selectedData"),
+    Input("mv-exclude-outliers", "value"),
+    State("mv-columns", "data"),
+)
+@timed
+def update_comparison(selectedData, exclude_outliers, columns):
+    vth_columns = [col for col in columns or [] if is_vth_column(col)]
+    if not vth_columns:
+        raise PreventUpdate
+    vth_type, _, level = parse_column_name(vth_columns[0])
+
+    index = layer.total_df.index
+    mask = selection_mask(index, [selectedData])
+    if exclude_outliers:
+        mask = layer.outliers.exclude(mask)
+    selectedpoints = index.to_numpy() if mask is None else index.to_numpy()[mask]
+    if len(selectedpoints) == 0:
+        raise PreventUpdate
+
+    summary = layer.selection_summary(None if mask is None else selectedpoints, level)
+    fig = create_summary_figure(summary[summary["Type"] == vth_type])
+
+    measured = layer.measured_vth(vth_type, level)
+    fig.add_trace(go.Scatter(
+        x=measured["Vg"], y=measured["VTH"], mode="markers",
+        name=f"{vth_type} - Level {level} (Measured)", marker={"size": 10, "symbol": "star"},
+    ))
+    fig.update_layout(title="Selected Data vs Measured Data", xaxis_title="Vg", yaxis_title="VTH", height=600)
+    return fig
@@ -0,0 +1,31 @@
+import dash
+import dash_vtk  # noqa: F401  component libraries must be imported before the first request, the mesh itself is loaded lazily
+from dash import Input, Output, callback, ctx
+
+from data_layer import get_data_layer
+from instrumentation import timed
+
+dash.register_page(__name__, path="/vtk", name="VTK viewer", order=2)
+
+layer = get_data_layer()
+
+# Same controls and filters as show_vtp.py (vtp_mesh.VtpMesh); the mesh is read once per process on the first visit
+def layout():
+    return layer.vtp.layout()
+
+# A new field also resets the threshold slider to its range, in the same callback, so that the mesh is never
+# filtered with the previous field's range
+@callback(
+    Output("vtk-view", "children"),
+    Output("threshold-slider", "min"),
+    Output("threshold-slider", "max"),
+    Output("threshold-slider", "value"),
+    Input("field-selector", "value"),
+    Input("threshold-slider", "value"),
+    Input("clip-axis", "value"),
+    Input("clip-position", "value"),
+)
+@timed
+def update_field(selected_field, threshold_value, clip_axis, clip_percent):
+    field_changed = "field-selector.value" in ctx.triggered_prop_ids
+    return layer.vtp.update_field(selected_field, threshold_value, clip_axis, clip_percent, field_changed)
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from session_store import estimate_size
+
+DEFAULT_MAX_BYTES = int(os.environ.get("DASH_RESULT_CACHE_MB", "128")) * 1024 * 1024
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "currsize", "maxsize"])
+
+# Short fixed-size key for a selection (row labels or positions), instead of hashing and storing a row-sized tuple
+def selection_key(rows):
+    rows = np.ascontiguousarray(rows)
+    return rows.dtype.str, len(rows), hashlib.blake2b(rows.tobytes(), digest_size=16).hexdigest()
+
+# Least recently used results, bounded by their estimated size in bytes rather than by a number of entries.
+# get(..., data=frame) ties the entries to the frame they were computed from: they are dropped as soon as
+# another frame is passed (the data was reloaded or rebound). clear() drops them explicitly.
+# cache_info() has the hits / misses of functools.lru_cache, for instrument_app(caches=...).
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, bytes)
+        self._bytes = 0
+        self._data = None
+        self._lock = threading.Lock()
+
+    def get(self, key, build, data=None):
+        with self._lock:
+            if data is not None and (self._data is None or self._data() is not data):
+                self._clear()
+                self._data = weakref.ref(data)
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = build()
+        size = estimate_size(value)
+        with self._lock:
+            if size <= self.max_bytes and (data is None or self._data() is data):
+                if key in self._entries:
+                    self._bytes -= self._entries[key][1]
+                self._entries[key] = (value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+        return value
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, len(self._entries), self.max_bytes)
@@ -0,0 +1,170 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from dash import ctx, no_update
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 60 * 60
+
+# Rough in-memory size of a session value
+def estimate_size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+class _Session:
+    def __init__(self):
+        self.values = {}
+        self.sizes = {}
+        self.last_access = time.monotonic()
+
+    @property
+    def size(self):
+        return sum(self.sizes.values())
+
+# A session id used in a process other than the one that issued it, while that process is still running
+class SessionOwnerError(RuntimeError):
+    pass
+
+# Process id in a session id issued by new_session_id, None for ids of another form
+def session_owner(session_id):
+    owner, sep, _ = str(session_id).partition("-")
+    return int(owner) if sep and owner.isdigit() else None
+
+def _process_running(pid):
+    if os.name == "nt":  # os.kill would terminate the process there
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Server-side per-session state (open plots, selection masks, derived frames) keyed by a session id.
+# The browser only keeps the id in a dcc.Store. Sessions idle for longer than ttl_seconds are dropped,
+# and the least recently used sessions are evicted while the total estimated size exceeds max_bytes.
+#
+# The store lives in the memory of one process: serve the app with a single worker process (threads are
+# fine), or with several behind a proxy that routes each session to the worker that issued it. Session ids
+# carry the id of that process, and a request that reaches another running worker on the same host raises
+# SessionOwnerError rather than silently starting the session over. An id whose process has exited (a
+# restarted server) is treated as a dropped session.
+class SessionStore:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def new_session_id():
+        return f"{os.getpid()}-{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _check_owner(session_id):
+        owner = session_owner(session_id)
+        if owner is not None and owner != os.getpid() and _process_running(owner):
+            raise SessionOwnerError(
+                f"session {session_id} belongs to worker process {owner}, not {os.getpid()}: sessions are kept per "
+                "process, so run a single worker or route each session to the worker that issued it"
+            )
+
+    # Registers an empty session; layouts call this, so a session that is missing later was dropped.
+    # With the id of a dropped session, starts it over empty.
+    def new_session(self, session_id=None):
+        session_id = session_id or self.new_session_id()
+        with self._lock:
+            self.delete(session_id)
+            self._session(session_id)
+            self._evict(keep=session_id)
+        return session_id
+
+    # The session, started over empty when it was evicted or has expired (its old values are not revived)
+    def _session(self, session_id):
+        session = self._live(session_id)
+        if session is None:
+            self.delete(session_id)
+            session = self._sessions[session_id] = _Session()
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_access = time.monotonic()
+        return session
+
+    # None for a session that was evicted or has been idle for longer than ttl_seconds
+    def _live(self, session_id):
+        self._check_owner(session_id)
+        session = self._sessions.get(session_id)
+        if session is None or time.monotonic() - session.last_access > self.ttl_seconds:
+            return None
+        return session
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return self._live(session_id) is not None
+
+    # Read-only: a missing (expired or evicted) session is not recreated, default is returned
+    def get(self, session_id, key, default=None):
+        with self._lock:
+            session = self._live(session_id)
+            if session is None:
+                return default
+            self._sessions.move_to_end(session_id)
+            session.last_access = time.monotonic()
+            return session.values.get(key, default)
+
+    def set(self, session_id, key, value):
+        with self._lock:
+            session = self._session(session_id)
+            size = estimate_size(value)
+            self._total_bytes += size - session.sizes.get(key, 0)
+            session.values[key] = value
+            session.sizes[key] = size
+            self._evict(keep=session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._total_bytes -= session.size
+
+    def _evict(self, keep):
+        now = time.monotonic()
+        for session_id in [sid for sid, s in self._sessions.items() if now - s.last_access > self.ttl_seconds]:
+            self.delete(session_id)
+        while self._total_bytes > self.max_bytes and len(self._sessions) > 1:
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self.delete(session_id)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._sessions)
+
+def _no_update_like(outputs):
+    if isinstance(outputs, dict):
+        return no_update
+    return [_no_update_like(output) for output in outputs]
+
+# Result of a callback whose session is gone: nothing changes. Sized from ctx.outputs_list, so a
+# pattern-matching (ALL) output gets one no_update per component it matched.
+def no_update_outputs():
+    return _no_update_like(ctx.outputs_list)
@@ -1,94 +1,36 @@
 import dash
-from dash import html
-import dash_vtk
-from vtk.util.numpy_support import vtk_to_numpy
-import vtk
+from instrumentation import instrument_app, timed
+from vtp_mesh import VtpMesh
 
-# VTPファイルを読み込む関数
-def read_vtp(filename):
-    reader = vtk.vtkXMLPolyDataReader()
-    reader.SetFileName(filename)
-    reader.Update()
-    polydata = reader.GetOutput()
-    
-    # ポイントデータを取得
-    points = vtk_to_numpy(polydata.GetPoints().GetData())
-    
-    # ポリゴンデータを取得
-    polys = vtk_to_numpy(polydata.GetPolys().GetData())
-    
-    # ポイントデータの物理量を取得
-    point_data = polydata.GetPointData()
-    fields = {}
-    for i in range(point_data.GetNumberOfArrays()):
-        array = point_data.GetArray(i)
-        name = point_data.GetArrayName(i)
-        data = vtk_to_numpy(array)
-        fields[name] = data
-    
-    return points, polys, fields
-
-# VTPファイルを読み込む
+# VTPファイルを読み込む（メッシュ・フィルタ・レイアウトは vtp_mesh.py）
 filename = "hoge.vtp"  # ここに実際のファイル名を指定してください
-points, polys, fields = read_vtp(filename)
+mesh = VtpMesh(filename)
 
 # Dashアプリケーションを作成
 app = dash.Dash(__name__)
 
 # レイアウトを定義
-app.layout = html.Div([
-    dash_vtk.View([
-        dash_vtk.GeometryRepresentation([
-            dash_vtk.Mesh(
-                state={
-                    "mesh": {
-                        "points": points,
-                        "polys": polys,
-                    },
-                    "field": {
-                        "location": "PointData",
-                        "name": list(fields.keys())[0],  # 最初のフィールドを表示
-                        "values": fields[list(fields.keys())[0]],
-                        "numberOfComponents": 1,
-                    },
-                }
-            )
-        ]),
-    ]),
-    html.Div([
-        html.Label("Select Field:"),
-        html.Select(
-            id='field-selector',
-            options=[{'label': k, 'value': k} for k in fields.keys()],
-            value=list(fields.keys())[0]
-        )
-    ])
-])
+app.layout = mesh.layout()
 
-# コールバックを定義してフィールドの選択を可能にする
+# コールバックを定義してフィールドの選択とフィルタを可能にする
+# フィールドを切り替えたら同じコールバックでしきい値スライダーの範囲もリセットする
 @app.callback(
-    dash.Output('vtk-view', 'children'),
-    [dash.Input('field-selector', 'value')]
+    [dash.Output('vtk-view', 'children'),
+     dash.Output('threshold-slider', 'min'),
+     dash.Output('threshold-slider', 'max'),
+     dash.Output('threshold-slider', 'value')],
+    [dash.Input('field-selector', 'value'),
+     dash.Input('threshold-slider', 'value'),
+     dash.Input('clip-axis', 'value'),
+     dash.Input('clip-position', 'value')]
 )
-def update_field(selected_field):
-    return [
-        dash_vtk.GeometryRepresentation([
-            dash_vtk.Mesh(
-                state={
-                    "mesh": {
-                        "points": points,
-                        "polys": polys,
-                    },
-                    "field": {
-                        "location": "PointData",
-                        "name": selected_field,
-                        "values": fields[selected_field],
-                        "numberOfComponents": 1,
-                    },
-                }
-            )
-        ])
-    ]
+@timed
+def update_field(selected_field, threshold_value, clip_axis, clip_percent):
+    field_changed = 'field-selector.value' in dash.ctx.triggered_prop_ids
+    return mesh.update_field(selected_field, threshold_value, clip_axis, clip_percent, field_changed)
+
+# コールバックの処理時間・転送量・キャッシュヒット率を計測する（/metrics, /metrics.json）
+metrics = instrument_app(app, caches={"filtered_mesh": mesh.filtered_mesh})
 
 if __name__ == '__main__':
     app.run_server(debug=True)
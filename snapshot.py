@@ -0,0 +1,269 @@
+import hashlib
+import importlib
+import importlib.util
+import json
+import re
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout changes; older snapshots are then ignored
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_DIR = os.environ.get("DASH_SNAPSHOT_DIR", ".snapshots")
+
+# Layout version directories under the snapshot root
+VERSION_DIR = re.compile(r"^v\d+$")
+
+CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Source file of a module, found without importing it (or relying on it having been imported)
+def module_file(module):
+    return importlib.util.find_spec(module).origin
+
+# Encodes a derived structure as JSON plus .npy files next to it. Arrays (and numeric frame columns,
+# stored as one 2-D block per dtype) come back memory-mapped, so attaching reads almost nothing.
+# Objects are stored by their attributes and rebuilt without calling __init__.
+class _Writer:
+    def __init__(self, directory):
+        self.directory = directory
+        self.count = 0
+        self.modules = set()
+
+    def array(self, values):
+        self.count += 1
+        name = f"{self.count}.npy"
+        np.save(os.path.join(self.directory, name), np.ascontiguousarray(values))
+        return name
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return {"value": value}
+        if isinstance(value, np.generic):
+            return {"value": value.item()}
+        if isinstance(value, np.ndarray):
+            if value.dtype == object:
+                return {"objects": [self.encode(v) for v in value.tolist()]}
+            return {"array": self.array(value)}
+        if isinstance(value, pd.DataFrame):
+            return {"frame": self.frame(value)}
+        if isinstance(value, pd.Series):
+            return {"series": self.frame(value.to_frame()), "name": self.encode(value.name)}
+        if isinstance(value, pd.Index):
+            return {"index": self.index(value)}
+        if isinstance(value, dict):
+            return {"dict": [[self.encode(k), self.encode(v)] for k, v in value.items()]}
+        if isinstance(value, (list, tuple)):
+            return {"list" if isinstance(value, list) else "tuple": [self.encode(v) for v in value]}
+        if hasattr(value, "__dict__"):
+            cls = type(value)
+            self.modules.add(cls.__module__)
+            return {"object": f"{cls.__module__}:{cls.__qualname__}", "attrs": self.encode(vars(value))}
+        raise TypeError(f"cannot snapshot {type(value).__name__}")
+
+    def index(self, index):
+        if isinstance(index, pd.RangeIndex):
+            return {"range": [index.start, index.stop, index.step], "name": index.name}
+        if pd.api.types.is_numeric_dtype(index.dtype) and not pd.api.types.is_bool_dtype(index.dtype):
+            return {"values": self.encode(index.to_numpy()), "name": index.name}
+        return {"values": {"objects": [self.encode(v) for v in index.tolist()]}, "name": index.name}
+
+    def frame(self, df):
+        columns, blocks = [], {}
+        for i, (name, dtype) in enumerate(zip(df.columns, df.dtypes)):
+            if isinstance(dtype, pd.CategoricalDtype):
+                series = df.iloc[:, i]
+                columns.append({"name": self.encode(name), "codes": self.array(series.cat.codes.to_numpy()),
+                                "categories": self.index(dtype.categories), "ordered": dtype.ordered})
+            elif isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+                blocks.setdefault(dtype.str, []).append(i)
+                columns.append({"name": self.encode(name), "block": dtype.str})
+            else:
+                columns.append({"name": self.encode(name), "objects": [self.encode(v) for v in df.iloc[:, i].tolist()]})
+        block_files = {dtype: self.array(df.iloc[:, positions].to_numpy().T) for dtype, positions in blocks.items()}
+        return {"index": self.index(df.index), "columns": columns, "blocks": block_files}
+
+class _Reader:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def array(self, name):
+        # Copy-on-write: pages stay shared with the file until something writes to them
+        return np.load(os.path.join(self.directory, name), mmap_mode="c")
+
+    def decode(self, spec):
+        if "value" in spec:
+            return spec["value"]
+        if "objects" in spec:
+            return np.array([self.decode(v) for v in spec["objects"]], dtype=object)
+        if "array" in spec:
+            return self.array(spec["array"])
+        if "frame" in spec:
+            return self.frame(spec["frame"])
+        if "series" in spec:
+            return self.frame(spec["series"]).iloc[:, 0].rename(self.decode(spec["name"]))
+        if "index" in spec:
+            return self.index(spec["index"])
+        if "dict" in spec:
+            return {self.decode(k): self.decode(v) for k, v in spec["dict"]}
+        if "list" in spec:
+            return [self.decode(v) for v in spec["list"]]
+        if "tuple" in spec:
+            return tuple(self.decode(v) for v in spec["tuple"])
+        module, qualname = spec["object"].split(":")
+        cls = importlib.import_module(module)
+        for part in qualname.split("."):
+            cls = getattr(cls, part)
+        value = cls.__new__(cls)
+        value.__dict__.update(self.decode(spec["attrs"]))
+        return value
+
+    def index(self, spec):
+        if "range" in spec:
+            return pd.RangeIndex(*spec["range"], name=spec["name"])
+        values = self.decode(spec["values"])
+        return pd.Index(values if values.dtype != object else values.tolist(), name=spec["name"])
+
+    def frame(self, spec):
+        index = self.index(spec["index"])
+        block_columns = {}
+        for column in spec["columns"]:
+            if "block" in column:
+                block_columns.setdefault(column["block"], []).append(self.decode(column["name"]))
+        # One DataFrame per memory-mapped block (no copy), then the remaining columns alongside
+        parts = [pd.DataFrame(self.array(spec["blocks"][dtype]).T, columns=names, index=index, copy=False)
+                 for dtype, names in block_columns.items()]
+        others = {}
+        for column in spec["columns"]:
+            name = self.decode(column["name"])
+            if "codes" in column:
+                categories = self.index(column["categories"])
+                others[name] = pd.Categorical.from_codes(self.array(column["codes"]), categories, column["ordered"])
+            elif "objects" in column:
+                others[name] = [self.decode(v) for v in column["objects"]]
+        if others:
+            parts.append(pd.DataFrame(others, index=index))
+        df = pd.concat(parts, axis=1) if parts else pd.DataFrame(index=index)
+        order = [self.decode(column["name"]) for column in spec["columns"]]
+        return df if list(df.columns) == order else df[order]
+
+# Derived structures stored under <root>/v<SNAPSHOT_VERSION>/<name>/. Each manifest records the SHA-256 of the
+# files the structure was built from, plus the modules of the classes it holds; a structure is attached only
+# while they all match. Hashes are remembered by (size, mtime), so an unchanged file is not read again.
+class Snapshot:
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.directory = os.path.join(root, f"v{SNAPSHOT_VERSION}")
+        self._lock = threading.Lock()
+        self._hashes_path = os.path.join(root, "sources.json")
+        try:
+            with open(self._hashes_path) as f:
+                self._hashes = json.load(f)
+        except (OSError, ValueError):
+            self._hashes = {}
+
+    def source_hash(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self._hashes.get(path)
+            if entry is not None and entry["signature"] == signature:
+                return entry["sha256"]
+        sha256 = file_sha256(path)
+        with self._lock:
+            self._hashes[path] = {"signature": signature, "sha256": sha256}
+            os.makedirs(self.root, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.root, delete=False) as f:
+                json.dump(self._hashes, f)
+            os.replace(f.name, self._hashes_path)
+        return sha256
+
+    def _source_hashes(self, sources):
+        return {os.path.abspath(path): self.source_hash(path) for path in sources}
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # The stored value, memory-mapped, or None when it is missing or was not built from exactly these sources.
+    # A structure that cannot be read back (corrupt or truncated files, a class that was renamed or moved)
+    # is a miss too, and its directory is removed so that the next save starts clean.
+    def load(self, name, sources):
+        path = os.path.join(self._path(name), "structure.json")
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self._discard(name)
+            return None
+        try:
+            if manifest["inputs"] != sorted(os.path.abspath(path) for path in sources):
+                return None
+            if self._source_hashes(manifest["sources"]) != manifest["sources"]:
+                return None
+        except OSError:  # a source file is gone
+            return None
+        except (KeyError, TypeError):
+            self._discard(name)
+            return None
+        try:
+            return _Reader(self._path(name)).decode(manifest["value"])
+        except (OSError, KeyError, ValueError, TypeError, AttributeError, ImportError):
+            self._discard(name)
+            return None
+
+    def _discard(self, name):
+        with self._lock:
+            shutil.rmtree(self._path(name), ignore_errors=True)
+
+    # Written to a temporary directory and renamed, so a half-written structure is never attached
+    def save(self, name, value, sources):
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=f".{name}-")
+        try:
+            writer = _Writer(staging)
+            spec = writer.encode(value)
+            modules = [module_file(module) for module in sorted(writer.modules)]
+            manifest = {
+                "inputs": sorted(os.path.abspath(path) for path in sources),
+                "sources": self._source_hashes([*sources, *modules]),
+                "value": spec,
+            }
+            with open(os.path.join(staging, "structure.json"), "w") as f:
+                json.dump(manifest, f)
+            with self._lock:
+                shutil.rmtree(self._path(name), ignore_errors=True)
+                try:
+                    os.rename(staging, self._path(name))
+                except OSError:
+                    # Another process saved the same structure first
+                    shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    # Snapshots written by other layout versions: v<N> directories holding at least one of our structures.
+    # Anything else under the root is left alone.
+    def remove_stale(self):
+        if not os.path.isdir(self.root):
+            return
+        current = os.path.basename(self.directory)
+        for entry in os.listdir(self.root):
+            path = os.path.join(self.root, entry)
+            if entry == current or not VERSION_DIR.match(entry) or not os.path.isdir(path):
+                continue
+            if any(os.path.isfile(os.path.join(path, name, "structure.json")) for name in os.listdir(path)):
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,81 @@
+import base64
+import struct
+import zlib
+import numpy as np
+from dash import html
+
+THUMBNAIL_SIZE = "80px"
+
+# White -> scatter blue, indexed by density 0..255
+_COLOR_LUT = np.linspace([255, 255, 255], [0, 116, 217], 256).astype(np.uint8)
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+# Minimal RGB PNG encoder so thumbnails need nothing beyond NumPy and the standard library
+def encode_png(rgb):
+    height, width, _ = rgb.shape
+    scanlines = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, -1)])
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 9))
+        + _png_chunk(b"IEND", b"")
+    )
+
+# 2D histogram of a column pair from the precomputed bin numbers: one bincount over x_bin * stride + y_bin
+def pair_density(bin_index, x_col, y_col):
+    stride = bin_index.bins + 1
+    x_codes = bin_index.codes[bin_index.positions[x_col]].astype(np.intp)
+    y_codes = bin_index.codes[bin_index.positions[y_col]]
+    counts = np.bincount(x_codes * stride + y_codes, minlength=stride * stride)
+    return counts.reshape(stride, stride)[:bin_index.bins, :bin_index.bins]
+
+# Thumbnails kept per BinIndex: they are dropped with the index when the data is reloaded
+THUMBNAILS_PER_INDEX = 1024
+
+_thumbnail_stats = [0, 0]  # hits, misses
+
+# Density thumbnail as a data URI, stored on the BinIndex it was drawn from (oldest first out)
+def pair_thumbnail(bin_index, x_col, y_col):
+    thumbnails = bin_index.thumbnails
+    key = (x_col, y_col)
+    if key in thumbnails:
+        _thumbnail_stats[0] += 1
+        return thumbnails[key]
+    _thumbnail_stats[1] += 1
+    density = np.log1p(pair_density(bin_index, x_col, y_col).T[::-1])
+    if density.max() > 0:
+        density = density / density.max()
+    rgb = _COLOR_LUT[(density * 255).astype(np.uint8)]
+    uri = "data:image/png;base64," + base64.b64encode(encode_png(rgb)).decode("ascii")
+    while len(thumbnails) >= THUMBNAILS_PER_INDEX:
+        thumbnails.pop(next(iter(thumbnails)), None)
+    thumbnails[key] = uri
+    return uri
+
+# For instrument_app(caches=...)
+def thumbnail_stats():
+    return tuple(_thumbnail_stats)
+
+# Grid of clickable thumbnails; the diagonal shows the column name
+def create_splom(bin_index, columns):
+    columns = [col for col in columns if col in bin_index]
+    cells = []
+    for y_col in columns:
+        for x_col in columns:
+            if x_col == y_col:
+                cells.append(html.Div(x_col, style={"fontSize": "10px", "overflow": "hidden", "alignSelf": "center"}))
+                continue
+            cells.append(html.Img(
+                id={"type": "splom-cell", "index": f"{x_col}|{y_col}"},
+                src=pair_thumbnail(bin_index, x_col, y_col),
+                title=f"{x_col} vs {y_col}",
+                n_clicks=0,
+                style={"width": THUMBNAIL_SIZE, "height": THUMBNAIL_SIZE, "imageRendering": "pixelated", "cursor": "pointer"},
+            ))
+    return html.Div(cells, style={
+        "display": "grid",
+        "gridTemplateColumns": f"repeat({len(columns)}, {THUMBNAIL_SIZE})",
+        "gap": "2px",
+    })
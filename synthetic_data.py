@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+VTH_TYPES = ("VTH_W", "VTH_E")
+
+# Sample frame of the 0721 dashboard: "Col 1" ... "Col n"
+def make_col_frame(rows, columns=6, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.random((rows, columns)), columns=[f"Col {i + 1}" for i in range(columns)])
+
+# Sample frame of the 0722/0723 dashboards: VTHE_<vg> / VTHW_<vg>, one row per device
+def make_vthe_vthw_frame(rows, vg_points=18, seed=0):
+    rng = np.random.default_rng(seed)
+    vgs = np.arange(10, 10 + vg_points)
+    columns = [f"VTHE_{vg}" for vg in vgs] + [f"VTHW_{vg}" for vg in vgs]
+    base = 0.3 + 0.01 * np.concatenate([vgs, vgs])
+    return pd.DataFrame(base + rng.normal(scale=0.02, size=(rows, len(columns))), columns=columns)
+
+# Wide total_result.csv of 0830_*: VTH_<type>_<vg>.<level> columns, one row per device
+def make_total_result(rows, vg_points=18, levels=2, seed=0):
+    rng = np.random.default_rng(seed)
+    columns, slopes = [], []
+    for vth_type in VTH_TYPES:
+        for level in range(1, levels + 1):
+            for vg in range(10, 10 + vg_points):
+                columns.append(f"{vth_type}_{vg}.{level}")
+                slopes.append(0.3 + 0.01 * vg + 0.05 * level)
+    device_offset = rng.normal(scale=0.02, size=(rows, 1))
+    values = np.array(slopes) + device_offset + rng.normal(scale=0.005, size=(rows, len(columns)))
+    return pd.DataFrame(values, columns=columns)
+
+# Long total_result.csv of 0723: Type / Vg / VTH rows
+def make_total_result_long(rows, vg_points=18, seed=0):
+    rng = np.random.default_rng(seed)
+    types = rng.choice(["VTHE", "VTHW"], size=rows)
+    vg = rng.integers(10, 10 + vg_points, size=rows).astype(float)
+    return pd.DataFrame({"Type": types, "Vg": vg, "VTH": 0.3 + 0.01 * vg + rng.normal(scale=0.02, size=rows)})
+
+# measured_data.csv: a few measured VTH values per (Type, Vg, Level)
+def make_measured(vg_points=18, levels=2, samples=3, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = [
+        (vth_type, float(vg), level, 0.3 + 0.01 * vg + 0.05 * level + rng.normal(scale=0.01))
+        for vth_type in VTH_TYPES
+        for level in range(1, levels + 1)
+        for vg in range(10, 10 + vg_points)
+        for _ in range(samples)
+    ]
+    return pd.DataFrame(rows, columns=["Type", "Vg", "Level", "VTH"])
+
+# Sphere mesh with a scalar point field, a vector point field and a scalar cell field
+def write_vtp(path, resolution=100):
+    import vtk
+    from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+
+    source = vtk.vtkSphereSource()
+    source.SetThetaResolution(resolution)
+    source.SetPhiResolution(resolution)
+    source.Update()
+    polydata = source.GetOutput()
+
+    points = vtk_to_numpy(polydata.GetPoints().GetData())
+    fields = {
+        "pressure": points[:, 2].copy(),
+        "velocity": np.column_stack([-points[:, 1], points[:, 0], np.zeros(len(points))]),
+    }
+    for name, values in fields.items():
+        array = numpy_to_vtk(values, deep=True)
+        array.SetName(name)
+        polydata.GetPointData().AddArray(array)
+    cell_ids = numpy_to_vtk(np.arange(polydata.GetNumberOfPolys(), dtype=float), deep=True)
+    cell_ids.SetName("cell_id")
+    polydata.GetCellData().AddArray(cell_ids)
+
+    writer = vtk.vtkXMLPolyDataWriter()
+    writer.SetFileName(path)
+    writer.SetInputData(polydata)
+    writer.Write()
+
+# Files the dashboards read from their working directory.
+# layout="wide" matches 0830_*, layout="long" matches 0723's total_result.csv.
+def write_dataset(directory, rows, vg_points=18, levels=2, layout="wide", vtp_resolution=None, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    if layout == "wide":
+        total = make_total_result(rows, vg_points, levels, seed)
+    else:
+        total = make_total_result_long(rows, vg_points, seed)
+    total.to_csv(os.path.join(directory, "total_result.csv"), index=False)
+    make_measured(vg_points, levels, seed=seed).to_csv(os.path.join(directory, "measured_data.csv"), index=False)
+    if vtp_resolution:
+        write_vtp(os.path.join(directory, "hoge.vtp"), vtp_resolution)
+    return directory
+
+# Results database of the unified app's data sources: total_result (tagged with Lot / Wafer) and measured_data tables
+def write_database(path, rows, vg_points=18, levels=2, lots=4, seed=0):
+    import sqlite3
+
+    total = make_total_result(rows, vg_points, levels, seed)
+    total.insert(0, "Lot", [f"LOT{i % lots:02d}" for i in range(rows)])
+    total.insert(1, "Wafer", [f"W{i % 25:02d}" for i in range(rows)])
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    with connection:
+        total.to_sql("total_result", connection, index=False)
+        make_measured(vg_points, levels, seed=seed).to_sql("measured_data", connection, index=False)
+        connection.execute('CREATE INDEX total_result_lot ON total_result ("Lot")')
+    connection.close()
+    return path
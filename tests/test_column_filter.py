@@ -0,0 +1,10 @@
+from column_filter import ColumnIndex, filter_options
+
+def test_filter_options_follow_the_columns():
+    before = ColumnIndex(["VTH_W_10.1", "VTH_W_12.1"])
+    after = ColumnIndex(["VTH_W_10.1", "VTH_W_14.1", "VTH_E_10.2"])
+    types, vg_min, vg_max, vg_value, levels = filter_options(after, [10.0, 12.0], before.vg_bounds())
+    assert (types, vg_min, vg_max, levels) == (["VTH_E", "VTH_W"], 10.0, 14.0, [1, 2])
+    # The full range grows with the data, a narrowed one is kept
+    assert vg_value == [10.0, 14.0]
+    assert filter_options(after, [10.0, 11.0], before.vg_bounds())[3] == [10.0, 11.0]
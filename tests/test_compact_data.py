@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from compact_data import compact_frame, share_categories
+
+def test_key_columns_keep_float64():
+    df = compact_frame(pd.DataFrame({"Type": ["VTH_W"] * 4, "Vg": [0.1, 0.2, 0.1, 0.2], "Level": [1, 1, 2, 2],
+                                     "VTH": [0.45, 0.46, 0.47, 0.48]}))
+    assert df["Vg"].dtype == np.float64 and df["VTH"].dtype == np.float32
+    assert df["Vg"].tolist() == [0.1, 0.2, 0.1, 0.2]
+    assert len(df[df["Vg"] == 0.1]) == 2
+
+def test_batches_concatenate_as_categoricals():
+    first = compact_frame(pd.DataFrame({"Lot": ["A", "A", "B", "B"], "VTH": [0.1, 0.2, 0.3, 0.4]}))
+    second = compact_frame(pd.DataFrame({"Lot": ["C", "C", "A", "A"], "VTH": [0.5, 0.6, 0.7, 0.8]}))
+    third = compact_frame(pd.DataFrame({"Lot": ["D", "E"], "VTH": [0.9, 1.0]}), category_ratio=0.1)  # stays str
+    batches = [first]
+    for new in (second, third):
+        batches, new = share_categories(batches, new)
+        batches.append(new)
+    total = pd.concat(batches, ignore_index=True)
+    assert isinstance(total["Lot"].dtype, pd.CategoricalDtype)
+    assert list(total["Lot"].dtype.categories) == ["A", "B", "C", "D", "E"]
+    assert total["Lot"].tolist() == ["A", "A", "B", "B", "C", "C", "A", "A", "D", "E"]
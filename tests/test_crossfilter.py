@@ -0,0 +1,58 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from crossfilter import BinIndex, create_histogram_figure, histogram_selection_patch, selection_mask
+from splom import pair_thumbnail, thumbnail_stats
+
+# Applies the Assign operations of a Patch to a figure dict, as the renderer does
+def apply_patch(figure, patch):
+    for operation in patch.to_plotly_json()["operations"]:
+        assert operation["operation"] == "Assign"
+        *path, last = operation["location"]
+        target = figure
+        for key in path:
+            target = target[key]
+        target[last] = operation["params"]["value"]
+    return figure
+
+def traces(figure):
+    return {"data": [{"visible": trace.visible, "y": np.asarray(trace.y)} for trace in figure.data]}
+
+def test_selection_patch_matches_a_rebuilt_figure():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(500, 5)), columns=list("abcde"))
+    bin_index = BinIndex(df)
+    columns = ["a", "c", "missing", "e"]
+    figure = traces(create_histogram_figure(bin_index, columns))
+    for mask in (rng.random(500) < 0.3, None):
+        patched = apply_patch(figure, histogram_selection_patch(bin_index, columns, mask))
+        rebuilt = traces(create_histogram_figure(bin_index, columns, mask))
+        for ours, theirs in zip(patched["data"], rebuilt["data"], strict=True):
+            assert ours["visible"] == theirs["visible"]
+            if theirs["visible"] is not False:
+                np.testing.assert_array_equal(ours["y"], theirs["y"])
+
+def test_thumbnails_live_on_their_bin_index():
+    df = pd.DataFrame(np.random.default_rng(0).normal(size=(200, 3)), columns=list("abc"))
+    old, new = BinIndex(df), BinIndex(df * 2)
+    hits = thumbnail_stats()[0]
+    uri = pair_thumbnail(old, "a", "b")
+    assert pair_thumbnail(old, "a", "b") is uri and thumbnail_stats()[0] == hits + 1
+    assert old.thumbnails == {("a", "b"): uri} and new.thumbnails == {}
+    # Nothing outside the index refers to it any more
+    ref = weakref.ref(old)
+    del old
+    gc.collect()
+    assert ref() is None
+
+def test_selection_mask_ignores_unknown_ids():
+    index = pd.Index([10, 11, 12, 13])
+    brush = {"points": [{"customdata": 11}, {"customdata": 99}, {"x": 0}]}
+    assert selection_mask(index, [brush]).tolist() == [False, True, False, False]
+    lasso = {"points": [{"customdata": 11}, {"customdata": 12}]}
+    assert selection_mask(index, [brush, None, lasso]).tolist() == [False, True, False, False]
+    assert selection_mask(index, [{"points": [{"customdata": 99}]}]).tolist() == [False] * 4
+    assert selection_mask(index, [None, {"points": []}]) is None
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_layer import DataLayer
+from synthetic_data import write_dataset
+
+# Synthetic results plus missing values, a label column and a boolean one
+@pytest.fixture
+def layer(tmp_path):
+    directory = write_dataset(str(tmp_path), rows=60, vg_points=4)
+    path = f"{directory}/total_result.csv"
+    df = pd.read_csv(path)
+    rng = np.random.default_rng(0)
+    vth = [col for col in df.columns if col.startswith("VTH_")]
+    df[vth] = df[vth].mask(rng.random((len(df), len(vth))) < 0.1)
+    df["Lot"] = np.where(np.arange(len(df)) < 30, "L1", "L2")
+    df["Pass"] = rng.random(len(df)) < 0.8
+    df.to_csv(path, index=False)
+    return DataLayer(path, f"{directory}/measured_data.csv", snapshot_dir="")
+
+def test_heatmap_matches_dataframe_corr(layer):
+    df = layer.total_df
+    expected = df.corr(numeric_only=True)
+    pd.testing.assert_frame_equal(layer.heatmap_df, expected, check_exact=False, rtol=1e-6, atol=1e-9)
+    inliers = df[~layer.outliers.rows]
+    pd.testing.assert_frame_equal(layer.inlier_heatmap_df, inliers.corr(numeric_only=True),
+                                  check_exact=False, rtol=1e-6, atol=1e-9)
+
+def test_selection_results_are_cached_per_total_df(layer):
+    rows = layer.total_df.index.to_numpy()[:10]
+    summary = layer.selection_summary(rows)
+    assert layer.selection_summary(rows.copy()) is summary
+    assert layer.selection_summary(rows, level=1) is not summary
+    # Nothing selected: the summary over every device the layer already keeps
+    assert layer.selection_summary() is layer.vth_summary
+
+    # A reloaded frame drops the entries built from the previous one
+    del layer._values["total_df"]
+    assert layer.selection_summary(rows) is not summary
+    assert len(layer.selection_cache) == 2  # the summary and the long table it was built from
+
+def test_excluding_outliers_from_a_selection(layer):
+    df = layer.total_df
+    vth = next(col for col in df.columns if col.startswith("VTH_"))
+    df.loc[df.index[[3, 7]], vth] = 100.0
+    outliers = layer.outliers
+    assert outliers.rows[[3, 7]].all()
+    np.testing.assert_array_equal(outliers.exclude(), outliers.inliers)
+    brush = np.zeros(len(df), dtype=bool)
+    brush[:5] = True
+    assert np.flatnonzero(outliers.exclude(brush)).tolist() == [i for i in range(5) if not outliers.rows[i]]
@@ -0,0 +1,68 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from data_source import ConnectionPool, CsvSource, DataSource, SqlSource
+
+@pytest.fixture
+def lot_dir(tmp_path):
+    for lot in ("L1", "L2", "L3"):
+        for wafer in ("W1", "W2"):
+            pd.DataFrame({"VTH_W_10.1": [0.4, 0.5], "X": [1, 2]}).to_csv(tmp_path / f"{lot}_{wafer}.csv", index=False)
+    return str(tmp_path)
+
+def test_lot_predicates_prune_files(lot_dir):
+    source = CsvSource(lot_dir)
+    df = source.read(["Lot", "Wafer", "X"], [("Lot", "==", "L2"), ("Wafer", "in", ["W2"]), ("X", ">", 1)])
+    assert df.to_dict("records") == [{"Lot": "L2", "Wafer": "W2", "X": 2}]
+    # Only the file of that lot / wafer was parsed
+    assert [path.rsplit("/", 1)[1] for path in source.dataset._parsed] == ["L2_W2.csv"]
+
+    assert len(source.read(filters=[("Lot", "!=", "L2")])) == 8
+    empty = source.read(filters=[("Lot", "==", "L9")])
+    assert empty.empty and list(empty.columns) == ["Lot", "Wafer", "VTH_W_10.1", "X"]
+
+def test_files_without_a_key_are_not_pruned(lot_dir):
+    pd.DataFrame({"Lot": ["L2", "L9"], "VTH_W_10.1": [0.6, 0.7], "X": [3, 4]}).to_csv(f"{lot_dir}/total_result.csv", index=False)
+    source = CsvSource(lot_dir)
+    df = source.read(["Lot", "X"], [("Lot", "==", "L2")])
+    assert sorted(df["X"].tolist()) == [1, 1, 2, 2, 3]
+    parsed = sorted(path.rsplit("/", 1)[1] for path in source.dataset._parsed)
+    assert parsed == ["L2_W1.csv", "L2_W2.csv", "total_result.csv"]
+
+def test_sources_must_implement_the_interface():
+    with pytest.raises(TypeError):
+        DataSource()
+    with pytest.raises(TypeError):
+        SqlSource(__file__, "total_result")
+
+def test_single_csv_rejects_columns_it_does_not_have(tmp_path):
+    path = tmp_path / "total_result.csv"
+    pd.DataFrame({"VTH_W_10.1": [0.4, 0.5], "X": [1, 2]}).to_csv(path, index=False)
+    source = CsvSource(str(path))
+    with pytest.raises(KeyError, match="'Lot'"):
+        source.read(["X"], [("Lot", "==", "L1")])
+    with pytest.raises(KeyError, match="'Lot'"):
+        source.read(filters=[("Lot", "==", "L1")])
+    assert source.read(["X"], [("X", ">", 1)]).to_dict("records") == [{"X": 2}]
+    assert asyncio.run(source.read_async(["X"])).equals(source.read(["X"]))
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_pool_closes_connections_released_after_close():
+    pool = ConnectionPool(FakeConnection, size=2)
+    with pool.connection() as checked_out:
+        with pool.connection() as idle:
+            pass
+        pool.close()
+        assert idle.closed and not checked_out.closed
+    assert checked_out.closed
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            pass
@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+import pytest
+
+from dataset_loader import LotDataset, lot_wafer_key
+
+def write(directory, name, **columns):
+    path = os.path.join(directory, name)
+    pd.DataFrame({"VTH_W_10.1": [0.4, 0.5], "X": [1, 2], **columns}).to_csv(path, index=False)
+    return path
+
+@pytest.fixture
+def lot_dir(tmp_path):
+    for lot in ("L1", "L2"):
+        for wafer in ("W1", "W2"):
+            write(str(tmp_path), f"{lot}_{wafer}.csv")
+    return str(tmp_path)
+
+def test_lot_wafer_key():
+    assert lot_wafer_key("/data/L1_W1.csv") == ("L1", "W1")
+    assert lot_wafer_key("LOT03_07_vth.csv") == ("LOT03", "07")
+    assert lot_wafer_key("total_result.csv") is None
+    assert lot_wafer_key("L1.csv") is None
+
+def test_reload_parses_only_changed_files(lot_dir):
+    dataset = LotDataset(lot_dir)
+    frame = dataset.reload()
+    assert len(frame) == 8 and frame["Lot"].cat.categories.tolist() == ["L1", "L2"]
+    assert dataset.reload() is frame
+    parsed = {path: df for path, (_, df) in dataset._parsed.items()}
+
+    changed = os.path.join(lot_dir, "L2_W1.csv")
+    pd.DataFrame({"VTH_W_10.1": [0.7, 0.8, 0.9], "X": [1, 2, 3]}).to_csv(changed, index=False)
+    frame = dataset.reload()
+    assert len(frame) == 9
+    for path, df in parsed.items():
+        assert (dataset._parsed[path][1] is df) == (path != changed)
+
+    os.remove(changed)
+    assert len(dataset.reload()) == 6 and changed not in dataset._parsed
+
+def test_reload_a_subset_keeps_the_other_files(lot_dir):
+    dataset = LotDataset(lot_dir)
+    subset = [os.path.join(lot_dir, "L1_W2.csv"), os.path.join(lot_dir, "L2_W2.csv")]
+    frame = dataset.reload(paths=subset[::-1])
+    assert frame[["Lot", "Wafer"]].drop_duplicates().astype(str).values.tolist() == [["L1", "W2"], ["L2", "W2"]]
+    assert sorted(dataset._parsed) == subset
+    assert len(dataset.reload()) == 8
+    assert len(dataset.reload(paths=subset)) == 4
+
+def test_schema_mismatch_names_the_file(lot_dir):
+    bad = write(lot_dir, "L3_W1.csv", Y=[0, 1])
+    with pytest.raises(ValueError, match="L3_W1.csv: schema does not match"):
+        LotDataset(lot_dir).reload()
+    # Same columns in another order and spelling are conformed to the first file's
+    pd.DataFrame({"X": [3], "VTH_W_10.01": [0.6]}).to_csv(bad, index=False)
+    frame = LotDataset(lot_dir).reload()
+    assert list(frame.columns) == ["Lot", "Wafer", "VTH_W_10.1", "X"]
+    assert frame.iloc[-1][["VTH_W_10.1", "X"]].tolist() == [0.6, 3]
+
+def test_file_without_key_keeps_its_lot_column(lot_dir):
+    write(lot_dir, "total_result.csv", Lot=["L9", "L9"])
+    frame = LotDataset(lot_dir).reload()
+    rows = frame[frame["Lot"] == "L9"]
+    assert len(rows) == 2 and rows["Wafer"].isna().all()
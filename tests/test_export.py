@@ -0,0 +1,85 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+from export import iter_chunks, parquet_schema, register_export_route, selected_points_frame, session_selection, stream_parquet
+from session_store import SessionStore
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"Device": range(6), "VTH_W_10.1": np.linspace(0.4, 0.5, 6)})
+
+@pytest.fixture
+def store():
+    return SessionStore()
+
+@pytest.fixture
+def client(frame, store):
+    server = Flask(__name__)
+    register_export_route(server, session_selection(store, lambda: frame))
+    return server.test_client()
+
+def read(response):
+    assert response.status_code == 200
+    return pd.read_csv(io.BytesIO(response.data))
+
+def test_missing_session_or_selection_is_404(client, store):
+    assert client.get("/export/unknown.csv").status_code == 404
+    session_id = store.new_session()
+    assert client.get(f"/export/{session_id}.csv").status_code == 404
+    store.delete(session_id)
+    assert client.get(f"/export/{session_id}.csv").status_code == 404
+
+def test_exports_the_selection_or_everything_once_cleared(client, store, frame):
+    session_id = store.new_session()
+    store.set(session_id, "selection_mask", np.array([True, False, True, False, False, True]))
+    assert read(client.get(f"/export/{session_id}.csv"))["Device"].tolist() == [0, 2, 5]
+    store.set(session_id, "selection_mask", None)
+    pd.testing.assert_frame_equal(read(client.get(f"/export/{session_id}.csv")), frame)
+    # A mask of an earlier version of the data
+    store.set(session_id, "selection_mask", np.ones(4, dtype=bool))
+    assert client.get(f"/export/{session_id}.csv").status_code == 404
+
+def test_plotly_selected_data_joins_one_measured_row_per_key():
+    measured = pd.DataFrame({
+        "Type": pd.Categorical(["VTH_W", "VTH_W", "VTH_E"]),
+        "Vg": np.array([10, 10, 11], dtype=np.float32),
+        "Level": np.array([1, 1, 2], dtype=np.int8),
+        "VTH": [0.45, 0.47, 0.5],
+    })
+    traces = [("VTH_E", 2), ("VTH_W", 1)]
+    # selectedData as Plotly sends it: curveNumber is the trace number, x the Vg
+    selected_data = {
+        "points": [
+            {"curveNumber": 1, "pointNumber": 3, "pointIndex": 3, "x": 10, "y": 0.44},
+            {"curveNumber": 0, "pointNumber": 0, "pointIndex": 0, "x": 11, "y": 0.52},
+            {"curveNumber": 5, "pointNumber": 0, "pointIndex": 0, "x": 12, "y": 0.0},
+        ],
+        "range": {"x": [9.5, 11.5], "y": [0.4, 0.6]},
+    }
+    store = SessionStore()
+    session_id = store.new_session()
+    store.set(session_id, "points", selected_points_frame(selected_data["points"], traces, like=measured))
+    server = Flask(__name__)
+    register_export_route(
+        server,
+        lambda session_id: (store.get(session_id, "points"), "all"),
+        join_frame=measured, join_on=["Type", "Vg", "Level"],
+    )
+    result = read(server.test_client().get(f"/export/{session_id}.csv"))
+    assert result[["Type", "Vg", "Level"]].values.tolist() == [["VTH_W", 10, 1], ["VTH_E", 11, 2]]
+    assert result["VTH"].tolist() == [0.44, 0.52]
+    assert result["VTH_measured"].tolist() == pytest.approx([0.46, 0.5])
+
+def test_parquet_keeps_columns_missing_from_the_first_chunk():
+    pytest.importorskip("pyarrow")
+    frame = pd.DataFrame({"Device": range(6), "Note": pd.Series([None, None, None, "a", None, "b"], dtype=object)})
+    chunks = iter_chunks(frame, np.arange(6), chunk_rows=2)
+    data = b"".join(stream_parquet(chunks, parquet_schema(frame)))
+    result = pd.read_parquet(io.BytesIO(data))
+    assert result["Device"].tolist() == list(range(6))
+    assert result["Note"].isna().tolist() == [True, True, True, False, True, False]
+    assert result["Note"].dropna().tolist() == ["a", "b"]
@@ -0,0 +1,67 @@
+import json
+
+from dash import Dash, Input, Output, dcc, html
+from dash.exceptions import PreventUpdate
+
+from instrumentation import instrument_app, timed
+
+def make_app():
+    app = Dash(__name__)
+    app.layout = html.Div([dcc.Input(id="text"), html.Div(id="upper"), html.Div(id="length")])
+
+    @app.callback(Output("upper", "children"), Input("text", "value"))
+    @timed
+    def to_upper(value):
+        if value is None:
+            raise PreventUpdate
+        return value.upper()
+
+    # Not decorated: timed by the request hooks only, under its output id
+    @app.callback(Output("length", "children"), Input("text", "value"))
+    def count(value):
+        return len(value)
+
+    return app
+
+def update(client, output, value):
+    component, prop = output.split(".")
+    return client.post("/_dash-update-component", json={
+        "output": output,
+        "outputs": {"id": component, "property": prop},
+        "inputs": [{"id": "text", "property": "value", "value": value}],
+        "changedPropIds": ["text.value"],
+        "state": [],
+    })
+
+def test_instrumented_app_still_serves_callbacks():
+    app = make_app()
+    metrics = instrument_app(app)
+    client = app.server.test_client()
+
+    response = update(client, "upper.children", "abc")
+    assert response.status_code == 200
+    assert response.get_json()["response"]["upper"]["children"] == "ABC"
+    assert update(client, "upper.children", None).status_code == 204
+    assert update(client, "length.children", "abcd").get_json()["response"]["length"]["children"] == 4
+
+    callbacks = json.loads(client.get("/metrics.json").data)["callbacks"]
+    assert callbacks["to_upper"]["calls"] == 2 and callbacks["to_upper"]["errors"] == 0
+    assert 0 < callbacks["to_upper"]["compute"] <= callbacks["to_upper"]["wall"]
+    assert callbacks["to_upper"]["response_bytes"] > 0
+    assert callbacks["length.children"]["calls"] == 1 and callbacks["length.children"]["compute"] == 0
+    assert 'dash_callback_calls_total{callback="to_upper"} 2' in client.get("/metrics").get_data(as_text=True)
+    assert metrics.callbacks["to_upper"].calls == 2
+
+def test_failed_callback_is_counted_as_an_error():
+    app = make_app()
+    metrics = instrument_app(app)
+    app.server.config["PROPAGATE_EXCEPTIONS"] = False
+    assert update(app.server.test_client(), "length.children", None).status_code == 500
+    assert metrics.callbacks["length.children"].errors == 1
+
+def test_timed_functions_run_unchanged_outside_requests():
+    @timed
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3 and add.__name__ == "add"
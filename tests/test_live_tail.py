@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from compact_data import compact_frame, share_categories
+from live_tail import OnlineCorrelation, numeric_columns
+
+# Correlated columns with scattered NaNs, two columns that never overlap and a constant column
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 2000
+    shared = rng.normal(size=(rows, 1))
+    df = pd.DataFrame(shared + rng.normal(size=(rows, 8)) * np.linspace(0.1, 2.0, 8) + 5.0,
+                      columns=[f"VTH_W_{vg}.1" for vg in range(10, 18)])
+    df = df.mask(rng.random(df.shape) < 0.2)
+    df["VTH_E_10.2"] = np.where(np.arange(rows) < rows // 2, rng.normal(size=rows), np.nan)
+    df["VTH_E_11.2"] = np.where(np.arange(rows) >= rows // 2, rng.normal(size=rows), np.nan)
+    df["constant"] = 0.1
+    return df
+
+def assert_matches(result, expected):
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-9, atol=1e-12)
+
+def test_corr_matches_pairwise_dataframe_corr(frame):
+    correlation = OnlineCorrelation(frame.columns)
+    correlation.update(frame)
+    assert_matches(correlation.corr(), frame.corr())
+
+def test_batched_updates_match_dataframe_corr(frame):
+    correlation = OnlineCorrelation(frame.columns)
+    for rows in np.array_split(np.arange(len(frame)), 7):
+        correlation.update(frame.iloc[rows])
+    assert_matches(correlation.corr(), frame.corr())
+    assert_matches(correlation.cov(), frame.cov())
+
+def test_without_matches_dataframe_corr_of_the_rest(frame):
+    correlation = OnlineCorrelation(frame.columns)
+    correlation.update(frame)
+    excluded = np.random.default_rng(1).random(len(frame)) < 0.05
+    assert_matches(correlation.without(frame[excluded]).corr(), frame[~excluded].corr())
+
+def test_small_frames_give_nan_like_dataframe_corr():
+    df = pd.DataFrame({
+        "a": [0.1, 0.1, 0.1, np.nan],
+        "b": [1.0, 2.0, 3.0, 4.0],
+        "c": [np.nan] * 4,
+        "d": [1.0, np.nan, np.nan, 2.0],
+    })
+    correlation = OnlineCorrelation(df.columns)
+    correlation.update(df)
+    assert_matches(correlation.corr(), df.corr())
+
+def test_empty_batches_change_nothing(frame):
+    correlation = OnlineCorrelation(frame.columns)
+    correlation.update(frame)
+    correlation.update(frame.iloc[:0])
+    assert_matches(correlation.corr(), frame.corr())
+    assert_matches(correlation.without(frame.iloc[:0]).corr(), frame.corr())
+
+# The 0830_2 pipeline: compacted batches with shared categoricals, correlated as they arrive
+def test_compacted_batches_match_corr_of_their_concatenation(frame):
+    frame = frame.assign(Lot=np.where(np.arange(len(frame)) % 3 == 0, "L1", "L2"), Pass=frame["constant"] > 0)
+    batches = []
+    correlation = None
+    for rows in np.array_split(np.arange(len(frame)), 5):
+        new = compact_frame(frame.iloc[rows])
+        if correlation is None:
+            correlation = OnlineCorrelation(numeric_columns(new))
+        else:
+            batches, new = share_categories(batches, new)
+        batches.append(new)
+        correlation.update(new)
+    total = pd.concat(batches)
+    assert "Pass" in correlation.columns and "Lot" not in correlation.columns
+    assert_matches(correlation.corr(), total.corr(numeric_only=True))
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from result_cache import ResultCache, selection_key
+
+def test_selection_key_depends_on_content_not_identity():
+    assert selection_key([3, 1, 2]) == selection_key(np.array([3, 1, 2]))
+    assert selection_key([1, 2, 3]) != selection_key([3, 2, 1])
+    assert len(selection_key(np.arange(1_000_000))[2]) == 32
+
+def test_entries_are_dropped_when_the_data_changes():
+    cache = ResultCache()
+    old, new = pd.DataFrame({"a": [1, 2]}), pd.DataFrame({"a": [1, 2]})
+    assert cache.get("k", lambda: 1, data=old) == 1
+    assert cache.get("k", lambda: 2, data=old) == 1
+    assert cache.get("k", lambda: 3, data=new) == 3
+    assert cache.cache_info().hits == 1 and len(cache) == 1
+
+def test_bounded_by_bytes():
+    cache = ResultCache(max_bytes=3 * 8000 + 100)
+    for i in range(5):
+        cache.get(i, lambda: np.zeros(1000))
+    assert len(cache) == 3 and cache.total_bytes <= cache.max_bytes
+    # Oldest entries went first; a result larger than the bound is returned but not kept
+    assert 0 not in cache._entries and 4 in cache._entries
+    assert cache.get("big", lambda: np.zeros(10_000)).shape == (10_000,)
+    assert "big" not in cache._entries
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+from dash import no_update
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+
+from session_store import SessionOwnerError, SessionStore, no_update_outputs, session_owner
+
+def test_get_does_not_recreate_a_dropped_session():
+    store = SessionStore(max_bytes=1000)
+    first, second = store.new_session(), store.new_session()
+    store.set(first, "mask", np.zeros(800, dtype=bool))
+    store.set(second, "mask", np.zeros(800, dtype=bool))  # evicts the first session
+    assert first not in store and second in store
+    assert store.get(first, "mask", "default") == "default"
+    assert first not in store and len(store) == 1
+
+def test_expired_session_is_missing():
+    store = SessionStore(ttl_seconds=60)
+    session_id = store.new_session()
+    store._sessions[session_id].last_access -= 61
+    assert session_id not in store
+    assert store.get(session_id, "mask") is None
+
+def test_set_on_an_expired_session_starts_it_over():
+    store = SessionStore(ttl_seconds=60)
+    session_id = store.new_session()
+    store.set(session_id, "plots", ["a"])
+    store.set(session_id, "mask", np.zeros(10, dtype=bool))
+    store._sessions[session_id].last_access -= 61
+    store.set(session_id, "mask", np.ones(10, dtype=bool))
+    assert store.get(session_id, "plots") is None
+    assert store.get(session_id, "mask").all()
+    assert store.total_bytes == store._sessions[session_id].size
+
+def test_session_of_another_running_process_raises():
+    store = SessionStore()
+    assert session_owner(store.new_session()) == os.getpid()
+    other = f"{os.getppid()}-{uuid.uuid4().hex}"
+    with pytest.raises(SessionOwnerError):
+        other in store
+    with pytest.raises(SessionOwnerError):
+        store.set(other, "mask", None)
+    # The issuing process has exited (a restarted server): a dropped session
+    process = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    exited = f"{process.stdout.strip()}-{uuid.uuid4().hex}"
+    assert exited not in store
+    assert store.new_session(exited) == exited and exited in store
+
+def test_no_update_outputs_matches_pattern_matching_outputs():
+    scatter = {"id": {"type": "scatter", "index": "a"}, "property": "figure"}
+    context_value.set(AttributeDict(outputs_list=[
+        {"id": "container", "property": "children"}, [scatter, scatter, scatter], [],
+    ]))
+    assert no_update_outputs() == [no_update, [no_update] * 3, []]
+    context_value.set(AttributeDict(outputs_list={"id": "graph", "property": "figure"}))
+    assert no_update_outputs() is no_update
@@ -0,0 +1,69 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from column_filter import ColumnIndex
+from snapshot import Snapshot, file_sha256
+
+def test_file_sha256_matches_hashlib(tmp_path):
+    path = tmp_path / "data.bin"
+    data = np.random.default_rng(0).bytes(3 * 1024 * 1024 + 17)
+    path.write_bytes(data)
+    assert file_sha256(path) == hashlib.sha256(data).hexdigest()
+
+def test_structures_round_trip_until_a_source_changes(tmp_path):
+    source = tmp_path / "total_result.csv"
+    source.write_text("a,b\n1,2\n")
+    snapshot = Snapshot(str(tmp_path / "snapshots"))
+    df = pd.DataFrame({"a": np.arange(5, dtype=np.float32), "Type": pd.Categorical(list("xxyyx"))})
+    snapshot.save("frame", {"df": df, "index": ColumnIndex(["VTH_W_10.1"])}, [str(source)])
+
+    value = snapshot.load("frame", [str(source)])
+    pd.testing.assert_frame_equal(value["df"], df)
+    assert value["index"].types.tolist() == ["VTH_W"]
+
+    source.write_text("a,b\n1,3\n")
+    assert snapshot.load("frame", [str(source)]) is None
+
+def test_remove_stale_only_removes_older_snapshot_versions(tmp_path):
+    root = tmp_path / "snapshots"
+    snapshot = Snapshot(str(root))
+    snapshot.save("value", [1, 2], [])
+    (root / "v0" / "value").mkdir(parents=True)
+    (root / "v0" / "value" / "structure.json").write_text("{}")
+    for unrelated in ("v0-notes", "vendor", "v9"):  # not a version, or no structure in it
+        (root / unrelated).mkdir()
+    Snapshot(str(root)).remove_stale()
+    assert sorted(os.listdir(root)) == ["v0-notes", "v1", "v9", "vendor"]
+    assert snapshot.load("value", []) == [1, 2]
+
+def test_unreadable_structures_are_a_miss_and_removed(tmp_path):
+    root = tmp_path / "snapshots"
+    snapshot = Snapshot(str(root))
+    value = {"values": np.arange(100, dtype=np.float64), "index": ColumnIndex(["VTH_W_10.1"])}
+    directory = root / "v1" / "value"
+
+    # A truncated .npy file
+    snapshot.save("value", value, [])
+    array = next(directory.glob("*.npy"))
+    array.write_bytes(array.read_bytes()[:40])
+    assert snapshot.load("value", []) is None
+    assert not directory.exists()
+
+    # A stored class that no longer exists under its name
+    snapshot.save("value", value, [])
+    manifest = (directory / "structure.json").read_text().replace("column_filter:ColumnIndex", "column_filter:Renamed")
+    (directory / "structure.json").write_text(manifest)
+    assert snapshot.load("value", []) is None
+    assert not directory.exists()
+
+    # A corrupt manifest
+    snapshot.save("value", value, [])
+    (directory / "structure.json").write_text('{"inputs": [')
+    assert snapshot.load("value", []) is None
+    assert not directory.exists()
+
+    snapshot.save("value", value, [])
+    np.testing.assert_array_equal(snapshot.load("value", [])["values"], value["values"])
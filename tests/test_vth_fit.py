@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from vth_fit import batched_polyfit, fit_vth_curves, looped_polyfit
+
+X = np.arange(10.0, 18.0)  # integer Vg, as in the VTH_<type>_<vg>.<level> column names
+
+@pytest.fixture
+def vth():
+    rng = np.random.default_rng(0)
+    return 0.3 + 0.01 * X + 0.002 * X ** 2 + rng.normal(scale=0.01, size=(20, len(X)))
+
+@pytest.mark.parametrize("degree", [1, 2])
+def test_batched_polyfit_matches_np_polyfit(vth, degree):
+    np.testing.assert_allclose(batched_polyfit(X, vth, degree), looped_polyfit(X, vth, degree), rtol=1e-8, atol=1e-10)
+
+@pytest.mark.parametrize("degree", [1, 2])
+def test_missing_values_match_np_polyfit_on_the_valid_points(vth, degree):
+    vth = vth.copy()
+    vth[np.random.default_rng(1).random(vth.shape) < 0.2] = np.nan
+    vth[3, :-degree] = np.nan  # too few points left for a fit
+    coefs = batched_polyfit(X, vth, degree)
+    for device, y in enumerate(vth):
+        valid = ~np.isnan(y)
+        if valid.sum() <= degree:
+            assert np.isnan(coefs[device]).all()
+        else:
+            expected = np.polyfit(X[valid], y[valid], degree)[::-1]
+            np.testing.assert_allclose(coefs[device], expected, rtol=1e-7, atol=1e-9)
+    assert np.isnan(coefs[3]).all()
+
+def test_fit_vth_curves_per_type_and_level(vth):
+    # Columns out of Vg order, two (Type, Level) groups
+    columns = {f"VTH_W_{x:g}.1": vth[:, i] for i, x in enumerate(X)}
+    columns.update({f"VTH_E_{x:g}.2": 2 * vth[:, i] for i, x in reversed(list(enumerate(X))) if i % 2 == 0})
+    df = pd.DataFrame(columns, index=pd.RangeIndex(100, 120))
+    fits = fit_vth_curves(df)
+    assert list(fits.columns) == ["FIT_VTH_E.2_intercept", "FIT_VTH_E.2_slope", "FIT_VTH_W.1_intercept", "FIT_VTH_W.1_slope"]
+    assert fits.index.equals(df.index)
+    expected = looped_polyfit(X, vth)
+    np.testing.assert_allclose(fits[["FIT_VTH_W.1_intercept", "FIT_VTH_W.1_slope"]].to_numpy(), expected, rtol=1e-8)
+    expected = looped_polyfit(X[::2], 2 * vth[:, ::2])
+    np.testing.assert_allclose(fits[["FIT_VTH_E.2_intercept", "FIT_VTH_E.2_slope"]].to_numpy(), expected, rtol=1e-8)
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from dash import no_update
+
+vtk = pytest.importorskip("vtk")
+from vtk.util.numpy_support import numpy_to_vtk
+
+from vtp_mesh import VtpMesh, read_vtp
+
+POINTS = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [2, 0, 0]], dtype=float)
+TRIANGLES = [(0, 1, 2), (0, 2, 3), (1, 4, 2)]
+
+def _add_array(data_attributes, name, values):
+    array = numpy_to_vtk(values, deep=True)
+    array.SetName(name)
+    data_attributes.AddArray(array)
+
+VELOCITY = np.column_stack([np.arange(5.0), np.zeros(5), np.full(5, 2.0)])
+
+# Three triangles over five points, after one vertex cell (cell data covers verts, then polys),
+# with a scalar and a 3-component point field and a cell field
+@pytest.fixture
+def vtp_file(tmp_path):
+    polydata = vtk.vtkPolyData()
+    points = vtk.vtkPoints()
+    points.SetData(numpy_to_vtk(POINTS, deep=True))
+    polydata.SetPoints(points)
+    polys = vtk.vtkCellArray()
+    for triangle in TRIANGLES:
+        polys.InsertNextCell(len(triangle), triangle)
+    polydata.SetPolys(polys)
+    verts = vtk.vtkCellArray()
+    verts.InsertNextCell(1, (4,))
+    polydata.SetVerts(verts)
+    _add_array(polydata.GetPointData(), "temperature", np.arange(5, dtype=float))
+    _add_array(polydata.GetPointData(), "velocity", VELOCITY)
+    _add_array(polydata.GetCellData(), "cell_id", np.array([-1.0, 0.0, 10.0, 20.0]))
+
+    path = str(tmp_path / "mesh.vtp")
+    writer = vtk.vtkXMLPolyDataWriter()
+    writer.SetFileName(path)
+    writer.SetInputData(polydata)
+    writer.Write()
+    return path
+
+@pytest.fixture
+def mesh(vtp_file):
+    return VtpMesh(vtp_file)
+
+def test_read_vtp(vtp_file):
+    points, polys, (offsets, connectivity), fields = read_vtp(vtp_file)
+    np.testing.assert_array_equal(points, POINTS)
+    assert polys.tolist() == [3, 0, 1, 2, 3, 0, 2, 3, 3, 1, 4, 2]
+    assert offsets.tolist() == [0, 3, 6, 9]
+    assert connectivity.tolist() == [0, 1, 2, 0, 2, 3, 1, 4, 2]
+    assert fields["PointData"]["velocity"].shape == (5, 3)
+    # The vertex cell's value is not part of the polys' cell data
+    assert fields["CellData"]["cell_id"].tolist() == [0.0, 10.0, 20.0]
+
+def test_field_views_of_a_vector(mesh):
+    values, number_of_components = mesh.get_field_view("PointData", "velocity")
+    assert number_of_components == 3
+    np.testing.assert_array_equal(values, VELOCITY.ravel())
+    magnitude, number_of_components = mesh.get_field_view("PointData", "velocity", "magnitude")
+    assert number_of_components == 1
+    np.testing.assert_allclose(magnitude, np.hypot(np.arange(5.0), 2.0))
+    x, _ = mesh.get_field_view("PointData", "velocity", "0")
+    assert x.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert mesh.get_field_view("PointData", "velocity", "0") is mesh.get_field_view("PointData", "velocity", "0")
+    # The threshold of a vector field is on its magnitude
+    np.testing.assert_array_equal(mesh.get_scalar_values("PointData", "velocity", ""), magnitude)
+
+    values = [option["value"] for option in mesh.options]
+    assert values == [
+        "PointData|temperature|", "PointData|velocity|", "PointData|velocity|magnitude",
+        "PointData|velocity|0", "PointData|velocity|1", "PointData|velocity|2", "CellData|cell_id|",
+    ]
+    assert mesh.options[3]["label"] == "velocity (X)"
+
+def test_cells_with_all_points(mesh):
+    point_mask = np.array([True, True, True, False, True])
+    assert mesh.cells_with_all_points(point_mask).tolist() == [True, False, True]
+    assert mesh.cells_with_all_points(np.ones(5, dtype=bool)).all()
+
+def test_extract_cells_rebuilds_the_polys_array(mesh):
+    sub_points, sub_polys, point_ids, cell_ids = mesh.extract_cells(np.array([True, False, True]))
+    assert cell_ids.tolist() == [0, 2]
+    assert point_ids.tolist() == [0, 1, 2, 4]
+    np.testing.assert_array_equal(sub_points, POINTS[[0, 1, 2, 4]])
+    # [n, i0, ..., n, j0, ...] with the point numbers of the sub-mesh
+    assert sub_polys.tolist() == [3, 0, 1, 2, 3, 1, 3, 2]
+
+def test_clip_mask_keeps_cells_on_the_normal_side(mesh):
+    assert mesh.clip_mask((0.5, 0, 0), (1, 0, 0)).tolist() == [False, False, True]
+    assert mesh.clip_mask((0.5, 0, 0), (-1, 0, 0)).tolist() == [False, False, False]
+    assert mesh.clip_mask((0, 0, 0), (0, 1, 0)).all()
+
+def test_filtered_mesh_is_cached(mesh):
+    first = mesh.filtered_mesh("PointData|temperature|", (0.0, 2.0))
+    points, polys, values, number_of_components = first
+    assert polys.tolist() == [3, 0, 1, 2]
+    assert values.tolist() == [0.0, 1.0, 2.0]
+    assert mesh.filtered_mesh("PointData|temperature|", (0.0, 2.0)) is first
+    assert mesh.filtered_mesh.cache_info().hits == 1
+    # Cell values follow the kept cells
+    _, _, cell_values, _ = mesh.filtered_mesh("CellData|cell_id|", (15.0, 20.0))
+    assert cell_values.tolist() == [20.0]
+
+def test_field_change_resets_the_threshold(mesh):
+    # The slider still holds the range picked on the previous field
+    _, lower, upper, value = mesh.update_field("CellData|cell_id|", [1.0, 2.0], "none", 0, field_changed=True)
+    assert (lower, upper, value) == (0.0, 20.0, [0.0, 20.0])
+    # Only the unfiltered mesh of the new field was built (and cached)
+    assert mesh.filtered_mesh.cache_info().currsize == 1
+    assert mesh.filtered_mesh("CellData|cell_id|", None, None, None)[2].tolist() == [0.0, 10.0, 20.0]
+    assert mesh.filtered_mesh.cache_info().hits == 1
+
+    _, *slider = mesh.update_field("CellData|cell_id|", [5.0, 20.0], "none", 0)
+    assert slider == [no_update] * 3
+    assert mesh.filtered_mesh("CellData|cell_id|", (5.0, 20.0), None, None)[2].tolist() == [10.0, 20.0]
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from column_schema import column_metadata
+
+COEFFICIENT_NAMES = ["intercept", "slope"]
+
+def coefficient_name(power):
+    return COEFFICIENT_NAMES[power] if power < len(COEFFICIENT_NAMES) else f"c{power}"
+
+# Fit VTH = c0 + c1*Vg + ... for every row of Y (one row per device) in one batched solve.
+# x: (m,) Vg values, Y: (n, m) VTH values. Returns (n, degree + 1) coefficients, lowest power first.
+# Missing values are handled by per-device weighted normal equations; devices with fewer than
+# degree + 1 valid points get NaN coefficients.
+def batched_polyfit(x, Y, degree=1):
+    vander = np.vander(x, degree + 1, increasing=True)
+    valid = ~np.isnan(Y)
+    if valid.all():
+        coefs, *_ = np.linalg.lstsq(vander, Y.T, rcond=None)
+        return coefs.T
+
+    weights = valid.astype(float)
+    lhs = np.einsum("nm,mi,mj->nij", weights, vander, vander)
+    rhs = np.einsum("nm,mi->ni", np.where(valid, Y, 0.0), vander)
+    enough = valid.sum(axis=1) > degree
+    lhs[~enough] = np.eye(degree + 1)
+    coefs = np.linalg.solve(lhs, rhs[..., np.newaxis])[..., 0]
+    coefs[~enough] = np.nan
+    return coefs
+
+# Per-device fit coefficients for every (Type, Level) group of VTH_<type>_<vg>.<level> columns,
+# as columns named "FIT_<type>.<level>_<coefficient>" aligned with df's index
+def fit_vth_curves(df, degree=1):
+    meta = column_metadata(df.columns)
+    fits = {}
+    for (vth_type, level), group in meta.groupby(["Type", "Level"], sort=True):
+        if group["Vg"].nunique() <= degree:
+            continue
+        group = group.sort_values("Vg")
+        coefs = batched_polyfit(group["Vg"].to_numpy(), df[group["column"]].to_numpy(dtype=float), degree)
+        for power in range(degree + 1):
+            fits[f"FIT_{vth_type}.{level}_{coefficient_name(power)}"] = coefs[:, power]
+    return pd.DataFrame(fits, index=df.index)
+
+# Reference implementation: one np.polyfit per device, used to check batched_polyfit (tests) and time it (benchmark.py)
+def looped_polyfit(x, Y, degree=1):
+    return np.array([np.polyfit(x, y, degree)[::-1] for y in Y])
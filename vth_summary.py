@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objs as go
+
+from column_schema import column_metadata
+from compact_data import device_codes
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# Above this many selected devices the VTH vs Vg graph switches from per-device curves to the summary
+DEVICE_CURVE_LIMIT = 50
+
+# Wide (one VTH column per Type/Vg) -> long (one row per device and column), without a per-column concat loop.
+# rows: index labels of a selection; only those cells are gathered, instead of copying df.loc[rows] first.
+# Device is an int32 code, Type a categorical, Vg float64 (exact axis values) and Level int8.
+def wide_to_long(df, rows=None):
+    meta = column_metadata(df.columns)
+    columns = [df.columns.get_loc(col) for col in meta["column"]]
+    positions = slice(None) if rows is None else df.index.get_indexer(rows)
+    values = df.iloc[positions, columns].to_numpy()
+    n_rows = len(values)
+    types, type_names = pd.factorize(meta["Type"])
+    return pd.DataFrame({
+        "Device": np.tile(device_codes(df.index[positions]), len(meta)),
+        "VTH": values.T.ravel(),
+        "Vg": np.repeat(meta["Vg"].to_numpy(np.float64), n_rows),
+        "Type": pd.Categorical.from_codes(np.repeat(types, n_rows), type_names),
+        "Level": np.repeat(meta["Level"].to_numpy(np.int8), n_rows),
+    })
+
+# Per-(Type, Vg) mean, std, count and quantiles in one grouped reduction
+def summarize_vth_vs_vg(long_df):
+    grouped = long_df.groupby(["Type", "Vg"], sort=True, observed=True)["VTH"]
+    stats = grouped.agg(["mean", "std", "count"])
+    quantiles = grouped.quantile(QUANTILES).unstack()
+    quantiles.columns = [f"q{round(q * 100):02d}" for q in QUANTILES]
+    return stats.join(quantiles).reset_index()
+
+def _rgba(hex_color, alpha):
+    r, g, b = (int(hex_color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({r}, {g}, {b}, {alpha})"
+
+def _band(x, upper, lower, color, name):
+    return go.Scatter(
+        x=np.concatenate([x, x[::-1]]),
+        y=np.concatenate([upper, lower[::-1]]),
+        fill="toself",
+        fillcolor=color,
+        line={"width": 0},
+        hoverinfo="skip",
+        name=name,
+        legendgroup=name.split(" ")[0],
+    )
+
+# Summary figure: 5-95% and mean ± σ bands with the median line, or box statistics per Vg
+def create_summary_figure(summary, mode="summary"):
+    fig = go.Figure()
+    palette = px.colors.qualitative.Plotly
+    for i, (vth_type, group) in enumerate(summary.groupby("Type", sort=False, observed=True)):
+        color = palette[i % len(palette)]
+        x = group["Vg"].to_numpy()
+        if mode == "box":
+            fig.add_trace(go.Box(
+                x=x,
+                q1=group["q25"], median=group["q50"], q3=group["q75"],
+                lowerfence=group["q05"], upperfence=group["q95"],
+                mean=group["mean"], sd=group["std"].fillna(0),
+                name=vth_type,
+                marker_color=color,
+            ))
+            continue
+
+        mean = group["mean"].to_numpy()
+        std = group["std"].fillna(0).to_numpy()
+        fig.add_trace(_band(x, group["q95"].to_numpy(), group["q05"].to_numpy(), _rgba(color, 0.15), f"{vth_type} 5-95%"))
+        fig.add_trace(_band(x, mean + std, mean - std, _rgba(color, 0.3), f"{vth_type} mean ± σ"))
+        fig.add_trace(go.Scatter(
+            x=x, y=group["q50"], mode="lines+markers",
+            line={"color": color}, name=f"{vth_type} median", legendgroup=vth_type,
+            customdata=group["count"], hovertemplate="Vg=%{x}<br>median=%{y}<br>n=%{customdata}",
+        ))
+    if mode == "box":
+        fig.update_layout(boxmode="group")
+    return fig
+
+# Per-device curves, only used when the selection is small
+def create_device_figure(long_df):
+    fig = px.line(long_df, x="Vg", y="VTH", color="Type", symbol="Type", line_group="Device", markers=True)
+    fig.update_traces(showlegend=False)
+    seen = set()
+    for trace in fig.data:
+        if trace.legendgroup not in seen:
+            trace.showlegend = True
+            seen.add(trace.legendgroup)
+    return fig
@@ -0,0 +1,267 @@
+from dash import dcc, html, no_update
+import dash_vtk
+from functools import lru_cache
+import numpy as np
+from vtk.util.numpy_support import vtk_to_numpy
+import vtk
+
+# VTPファイルを読み込む関数
+def read_vtp(filename):
+    reader = vtk.vtkXMLPolyDataReader()
+    reader.SetFileName(filename)
+    reader.Update()
+    polydata = reader.GetOutput()
+
+    # ポイントデータを取得
+    points = vtk_to_numpy(polydata.GetPoints().GetData())
+
+    # ポリゴンデータを取得（フィルタ用に offsets / connectivity 形式も保持）
+    cell_array = polydata.GetPolys()
+    legacy = vtk.vtkIdTypeArray()
+    cell_array.ExportLegacyFormat(legacy)
+    polys = vtk_to_numpy(legacy)
+    offsets = vtk_to_numpy(cell_array.GetOffsetsArray())
+    connectivity = vtk_to_numpy(cell_array.GetConnectivityArray())
+
+    # ポイントデータ・セルデータの物理量を取得（多成分配列は (n, 成分数) のまま保持）
+    fields = {
+        "PointData": read_arrays(polydata.GetPointData()),
+        "CellData": read_arrays(polydata.GetCellData()),
+    }
+
+    # セルデータは verts, lines, polys, strips の順に並ぶので polys の範囲だけ切り出す
+    start = polydata.GetNumberOfVerts() + polydata.GetNumberOfLines()
+    stop = start + polydata.GetNumberOfPolys()
+    fields["CellData"] = {name: data[start:stop] for name, data in fields["CellData"].items()}
+
+    return points, polys, (offsets, connectivity), fields
+
+# vtkDataSetAttributes から名前付き配列を取り出す関数
+def read_arrays(data_attributes):
+    arrays = {}
+    for i in range(data_attributes.GetNumberOfArrays()):
+        array = data_attributes.GetArray(i)
+        if array is None:  # 文字列配列などは表示できないのでスキップ
+            continue
+        name = data_attributes.GetArrayName(i)
+        arrays[name] = vtk_to_numpy(array)
+    return arrays
+
+COMPONENT_LABELS = ["X", "Y", "Z"]
+
+# ドロップダウンの値 "location|name|component" を分解する関数
+# 配列名に "|" が含まれていても良いように、location は先頭、component は末尾から切り出す
+def parse_field(selected_field):
+    location, rest = selected_field.split("|", 1)
+    name, component = rest.rsplit("|", 1)
+    return location, name, component
+
+# 1つのVTPファイルのメッシュ・フィルタ・レイアウト。Dashアプリは作らないので、show_vtp.py と
+# 統合アプリの /vtk ページ（data_layer.DataLayer.vtp）の両方から使える
+class VtpMesh:
+    def __init__(self, filename):
+        self.points, self.polys, (self.offsets, self.connectivity), self.fields = read_vtp(filename)
+        self.cell_sizes = np.diff(self.offsets)
+        self.bounds_min = self.points.min(axis=0)
+        self.bounds_max = self.points.max(axis=0)
+        # 派生スカラー（大きさ・各成分）のキャッシュ。同じフィールドを再選択しても再計算しない
+        self.field_view_cache = {}
+        # スライダーを往復しても再計算しないようにメッシュごとにLRUキャッシュする
+        self.filtered_mesh = lru_cache(maxsize=32)(self._filtered_mesh)
+        self.options = self.field_options()
+        self.default_field = self.options[0]["value"]  # 最初のフィールドを表示
+
+    # 表示用の値を取得する関数
+    # component: "" はそのままの配列、"magnitude" はベクトルの大きさ、"0", "1", ... は各成分
+    def get_field_view(self, location, name, component=""):
+        key = (location, name, component)
+        if key not in self.field_view_cache:
+            data = self.fields[location][name]
+            if component == "":
+                values = data.reshape(len(data), -1)
+            elif component == "magnitude":
+                values = np.linalg.norm(data, axis=1)[:, np.newaxis]
+            else:
+                values = data[:, int(component)][:, np.newaxis]
+            self.field_view_cache[key] = (np.ascontiguousarray(values).ravel(), values.shape[1])
+        return self.field_view_cache[key]
+
+    # ドロップダウンの選択肢を作成する関数
+    def field_options(self):
+        options = []
+        for location, arrays in self.fields.items():
+            suffix = "" if location == "PointData" else " [Cell]"
+            for name, data in arrays.items():
+                options.append({"label": f"{name}{suffix}", "value": f"{location}|{name}|"})
+                if data.ndim == 2 and data.shape[1] > 1:
+                    options.append({"label": f"{name} (Magnitude){suffix}", "value": f"{location}|{name}|magnitude"})
+                    for i in range(data.shape[1]):
+                        label = COMPONENT_LABELS[i] if data.shape[1] <= 3 else str(i)
+                        options.append({"label": f"{name} ({label}){suffix}", "value": f"{location}|{name}|{i}"})
+        return options
+
+    # しきい値判定に使うスカラー値を取得する関数（ベクトルは大きさで判定する）
+    def get_scalar_values(self, location, name, component):
+        values, number_of_components = self.get_field_view(location, name, component)
+        if number_of_components > 1:
+            values, _ = self.get_field_view(location, name, "magnitude")
+        return values
+
+    # 点ごとの判定結果から「全ての点が条件を満たすセル」のマスクを作る関数
+    # 条件を満たさない点の累積個数の差でセルごとに数える（reduceat と違い、点を持たないセルも True になる）
+    def cells_with_all_points(self, point_mask):
+        failing = np.concatenate(([0], np.cumsum(~point_mask[self.connectivity])))
+        return failing[self.offsets[1:]] == failing[self.offsets[:-1]]
+
+    # しきい値フィルタ: 値が [lower, upper] に入るセルのマスク
+    def threshold_mask(self, selected_field, lower, upper):
+        location, name, component = parse_field(selected_field)
+        values = self.get_scalar_values(location, name, component)
+        inside = (values >= lower) & (values <= upper)
+        if location == "CellData":
+            return inside
+        return self.cells_with_all_points(inside)
+
+    # 平面クリップ: origin を通り normal 側にあるセルのマスク
+    def clip_mask(self, origin, normal):
+        side = (self.points - np.asarray(origin)) @ np.asarray(normal) >= 0
+        return self.cells_with_all_points(side)
+
+    # マスクで残したセルだけのサブメッシュを作る関数
+    # 戻り値: (points, polys, 元の点番号, 元のセル番号)
+    def extract_cells(self, cell_mask):
+        cell_ids = np.flatnonzero(cell_mask)
+        sizes = self.cell_sizes[cell_ids]
+        kept = self.connectivity[np.repeat(cell_mask, self.cell_sizes)]
+        point_ids, local_ids = np.unique(kept, return_inverse=True)
+
+        # VTK のレガシー形式 [n, i0, ..., n, j0, ...] に組み立て直す
+        sub_polys = np.empty(len(sizes) + len(local_ids), dtype=self.polys.dtype)
+        starts = np.concatenate(([0], np.cumsum(sizes + 1)[:-1])).astype(np.int64)
+        is_size = np.zeros(len(sub_polys), dtype=bool)
+        is_size[starts] = True
+        sub_polys[is_size] = sizes
+        sub_polys[~is_size] = local_ids
+        return self.points[point_ids], sub_polys, point_ids, cell_ids
+
+    # フィルタ後のメッシュと値を返す関数（self.filtered_mesh としてキャッシュされる）
+    def _filtered_mesh(self, selected_field, threshold_range=None, clip_axis=None, clip_position=None):
+        location, name, component = parse_field(selected_field)
+        values, number_of_components = self.get_field_view(location, name, component)
+
+        cell_mask = np.ones(len(self.cell_sizes), dtype=bool)
+        if threshold_range is not None:
+            cell_mask &= self.threshold_mask(selected_field, *threshold_range)
+        if clip_axis is not None:
+            axis = "xyz".index(clip_axis)
+            normal = np.eye(3)[axis]
+            origin = normal * clip_position
+            cell_mask &= self.clip_mask(origin, normal)
+
+        if cell_mask.all():
+            return self.points, self.polys, values, number_of_components
+        if not cell_mask.any():
+            return self.points[:0], self.polys[:0], values[:0], number_of_components
+
+        sub_points, sub_polys, point_ids, cell_ids = self.extract_cells(cell_mask)
+        ids = point_ids if location == "PointData" else cell_ids
+        sub_values = values.reshape(-1, number_of_components)[ids].ravel()
+        return sub_points, sub_polys, sub_values, number_of_components
+
+    # メッシュを作成する関数
+    def create_mesh(self, selected_field, threshold_range=None, clip_axis=None, clip_position=None):
+        location, name, _ = parse_field(selected_field)
+        mesh_points, mesh_polys, values, number_of_components = self.filtered_mesh(
+            selected_field, threshold_range, clip_axis, clip_position
+        )
+        return dash_vtk.GeometryRepresentation([
+            dash_vtk.Mesh(
+                state={
+                    "mesh": {
+                        "points": mesh_points,
+                        "polys": mesh_polys,
+                    },
+                    "field": {
+                        "location": location,
+                        "name": name,
+                        "values": values,
+                        "numberOfComponents": number_of_components,
+                    },
+                }
+            )
+        ])
+
+    # フィールドの値の範囲を取得する関数
+    def field_range(self, selected_field):
+        location, name, component = parse_field(selected_field)
+        values = self.get_scalar_values(location, name, component)
+        return float(values.min()), float(values.max())
+
+    # レイアウトを定義
+    def layout(self):
+        field_min, field_max = self.field_range(self.default_field)
+        return html.Div([
+            dash_vtk.View(id='vtk-view', children=[self.create_mesh(self.default_field)]),
+            html.Div([
+                html.Label("Select Field:"),
+                dcc.Dropdown(
+                    id='field-selector',
+                    options=self.options,
+                    value=self.default_field,
+                    clearable=False,
+                ),
+                html.Label("Threshold:"),
+                dcc.RangeSlider(
+                    id='threshold-slider',
+                    min=field_min,
+                    max=field_max,
+                    value=[field_min, field_max],
+                    marks=None,
+                    tooltip={"placement": "bottom"},
+                ),
+                html.Label("Clip Plane:"),
+                dcc.RadioItems(
+                    id='clip-axis',
+                    options=[{'label': 'None', 'value': 'none'}] + [{'label': a.upper(), 'value': a} for a in "xyz"],
+                    value='none',
+                    inline=True,
+                ),
+                dcc.Slider(
+                    id='clip-position',
+                    min=0,
+                    max=100,
+                    value=0,
+                    marks=None,
+                    tooltip={"placement": "bottom"},
+                ),
+            ])
+        ])
+
+    # フィールドを切り替えたらしきい値スライダーの範囲をリセットする
+    def reset_threshold(self, selected_field):
+        lower, upper = self.field_range(selected_field)
+        return lower, upper, [lower, upper]
+
+    # フィールドの選択とフィルタを反映したメッシュと、しきい値スライダーの (min, max, value)
+    # フィールドを切り替えたとき (field_changed) は前のフィールドのしきい値を使わず、スライダーも
+    # 新しいフィールドの範囲にリセットする（別のコールバックでリセットすると、古い範囲で絞ったメッシュが
+    # 一度描画されキャッシュされてしまう）。それ以外ではスライダーは変更しない
+    # clip-position は選択した軸方向のバウンディングボックスに対する割合(%)
+    def update_field(self, selected_field, threshold_value, clip_axis, clip_percent, field_changed=False):
+        lower, upper = self.field_range(selected_field)
+        threshold_range = None
+        if field_changed:
+            slider = self.reset_threshold(selected_field)
+        else:
+            slider = (no_update, no_update, no_update)
+            if threshold_value and (threshold_value[0] > lower or threshold_value[1] < upper):
+                threshold_range = tuple(threshold_value)
+
+        clip_position = None
+        if clip_axis == 'none' or not clip_percent:
+            clip_axis = None
+        else:
+            axis = "xyz".index(clip_axis)
+            clip_position = float(self.bounds_min[axis] + (self.bounds_max[axis] - self.bounds_min[axis]) * clip_percent / 100)
+
+        return ([self.create_mesh(selected_field, threshold_range, clip_axis, clip_position)], *slider)